@@ -0,0 +1,93 @@
+from typing import Awaitable, Callable, Optional
+
+import anyio.from_thread
+from fastapi import Depends, HTTPException, Request
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.models.user import AuthenticatedUser
+from app.services.admission import AdmissionRejected, Ticket, rate_limiter, render_pool
+from app.services.auth_service import AuthError, token_verifier
+
+bearer = HTTPBearer(auto_error=False)
+
+
+def client_id(request: Request) -> str:
+    """Who a request counts against: the address our trusted proxies saw, else the peer address.
+
+    Proxies append to X-Forwarded-For, so only the last `admission_trusted_proxy_hops`
+    entries were written by them; anything further left came from the client.
+    """
+    hops = settings.admission_trusted_proxy_hops
+    if hops > 0:
+        forwarded = [entry.strip() for entry in ','.join(request.headers.getlist('x-forwarded-for')).split(',') if entry.strip()]
+        if len(forwarded) >= hops:
+            return forwarded[-hops]
+    return request.client.host if request.client else 'unknown'
+
+
+def rejection(e: AdmissionRejected) -> HTTPException:
+    return HTTPException(status_code=e.status_code, detail=e.reason, headers={'Retry-After': str(e.retry_after)})
+
+
+class Admission:
+    """Per-request handle; the route asks for a render slot only when it actually has to render"""
+
+    def __init__(self, route: str, client: str):
+        self.route = route
+        self.client = client
+
+    async def render_slot(self) -> Ticket:
+        if not settings.admission_enabled:
+            return Ticket(None, self.client)
+        try:
+            return await render_pool.acquire(self.client)
+        except AdmissionRejected as e:
+            raise rejection(e)
+
+    def render_slot_blocking(self) -> Ticket:
+        """render_slot() for sync routes (they run in the threadpool); release with anyio.from_thread.run_sync"""
+        return anyio.from_thread.run(self.render_slot)
+
+
+def admit(route: str) -> Callable[[Request], Awaitable[Admission]]:
+    """Dependency applying the route's rate limit; answers 429 with Retry-After when the bucket is empty"""
+    async def dependency(request: Request) -> Admission:
+        client = client_id(request)
+        if settings.admission_enabled:
+            try:
+                rate_limiter.check(route, client)
+            except AdmissionRejected as e:
+                raise rejection(e)
+        return Admission(route, client)
+    return dependency
+
+
+async def get_optional_user(credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer)) -> Optional[AuthenticatedUser]:
+    """The verified caller, None without a bearer token, 401 for a bad one"""
+    if credentials is None:
+        return None
+    token = credentials.credentials
+    claims = token_verifier.cached(token)
+    if claims is None:
+        # Signature check (and on key rotation a JWKS fetch) off the event loop
+        try:
+            claims = await run_in_threadpool(token_verifier.verify, token)
+        except AuthError as e:
+            raise HTTPException(status_code=401, detail=f"Invalid token: {str(e)}", headers={'WWW-Authenticate': 'Bearer'})
+    return AuthenticatedUser.from_claims(claims)
+
+
+async def get_current_user(user: Optional[AuthenticatedUser] = Depends(get_optional_user)) -> AuthenticatedUser:
+    """Like get_optional_user, but a request without a token gets 401"""
+    if user is None:
+        raise HTTPException(status_code=401, detail="Not authenticated", headers={'WWW-Authenticate': 'Bearer'})
+    return user
+
+
+async def get_admin_user(user: AuthenticatedUser = Depends(get_current_user)) -> AuthenticatedUser:
+    """Callers allowed to write the catalog: app_metadata.role in auth_admin_roles, or the service role"""
+    if user.role != 'service_role' and user.app_role not in settings.auth_admin_roles:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return user
@@ -0,0 +1,59 @@
+from fastapi import APIRouter, Depends, HTTPException, File, UploadFile
+from typing import Optional
+import os
+from app.api.deps import get_admin_user
+from app.core.config import settings
+from app.models.user import AuthenticatedUser
+from app.services.supabase_client import supabase_admin
+from app.services.excel_importer import ExcelCatalogImporter
+from app.services.asset_ingest import AssetIngest
+from app.services.asset_storage import get_asset_storage
+
+router = APIRouter()
+
+EXCEL_EXTENSIONS = ('.xlsx', '.xlsm')
+
+@router.post("/excel")
+def import_excel_catalog(file: UploadFile = File(...), dry_run: bool = False, delete_missing: bool = False,
+                         admin: AuthenticatedUser = Depends(get_admin_user)):
+    """Import a product workbook into the catalog tables; only changed rows are written.
+
+    Returns the import report: per-sheet diff (inserted/changed/unchanged/deleted) and rejected rows.
+    Admins only. With delete_missing (off unless asked for), entities of an imported sheet that are no longer in the workbook are removed.
+    """
+    if not (file.filename or '').lower().endswith(EXCEL_EXTENSIONS):
+        raise HTTPException(status_code=400, detail=f"Expected an Excel workbook ({', '.join(EXCEL_EXTENSIONS)})")
+    try:
+        return ExcelCatalogImporter(supabase_admin, dry_run=dry_run, delete_missing=delete_missing).run(file.file)
+    except Exception as e:
+        print(f"ERROR in import_excel_catalog: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Import error: {str(e)}")
+
+@router.post("/assets")
+def import_assets(file: Optional[UploadFile] = File(None), directory: Optional[str] = None,
+                  admin: AuthenticatedUser = Depends(get_admin_user)):
+    """Bulk-ingest static assets from a ZIP upload or a server directory (under asset_ingest_allowed_root).
+
+    Identical files are stored once; files are linked to products by name (see asset_ingest).
+    Re-sending the same archive after a failure resumes the upload. Admins only.
+    """
+    if (file is None) == (directory is None):
+        raise HTTPException(status_code=400, detail="Send either a ZIP file or a directory")
+    if directory is not None:
+        allowed_root = os.path.realpath(settings.asset_ingest_allowed_root) if settings.asset_ingest_allowed_root else None
+        path = os.path.realpath(directory)
+        if allowed_root is None or os.path.commonpath([allowed_root, path]) != allowed_root:
+            raise HTTPException(status_code=400, detail="Directory ingest is not allowed for this path")
+        if not os.path.isdir(path):
+            raise HTTPException(status_code=404, detail="Directory not found")
+    elif not (file.filename or '').lower().endswith('.zip'):
+        raise HTTPException(status_code=400, detail="Expected a .zip archive")
+
+    try:
+        ingest = AssetIngest(supabase_admin, get_asset_storage())
+        if directory is not None:
+            return ingest.ingest_directory(path)
+        return ingest.ingest_zip(file.file)
+    except Exception as e:
+        print(f"ERROR in import_assets: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Asset import error: {str(e)}")
@@ -1,12 +1,36 @@
 # At the top of your products.py file, make sure you have these imports:
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import StreamingResponse
-from typing import List, Optional
-from pydantic import BaseModel
+from fastapi import APIRouter, Depends, HTTPException, Header, WebSocket, WebSocketDisconnect
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
+from fastapi.responses import Response, StreamingResponse
+from typing import Dict, List, Optional, Union
+from pydantic import BaseModel, ValidationError
+from app.api.deps import Admission, admit, get_admin_user, get_current_user, get_optional_user
+from app.models.user import AuthenticatedUser
 from app.services.supabase_client import supabase
+from app.core.config import settings
 from app.services.pdf_generator import DatasheetGenerator  # Make sure this import works
-from io import BytesIO
+from app.services.template_stamper import template_stamper
+from app.services.catalog_service import fetch_visual_assets, build_default_datasheet_request, get_product_details_cached, sign_asset_urls, catalog_invalidations
+from app.services.catalog_pdf import CatalogPdfBuilder
+from app.services.pdf_optimizer import optimize_pdf
+from app.services.render_cache import configuration_key, pdf_cache, pdf_cache_key
+from app.services.preview import datasheet_previewer, PREVIEW_FORMATS
+from app.services.live_preview import LivePreviewSession
+from app.services.single_flight import FlightAbandoned, pdf_flights
+from app.services.speculative import speculative_renderer
+from app.services.cache_warmer import cache_warmer
+from app.services.config_matrix import configuration_matrix
+from app.services.catalog_search import catalog_search
+from app.services.facets import facet_engine
+from app.services import saved_configurations
+from datetime import datetime
+from io import BytesIO, StringIO
+import anyio.from_thread
+import csv
 import json
+import uuid
+import numpy as np
 
 router = APIRouter()
 
@@ -23,6 +47,8 @@ class PDFGenerationRequest(BaseModel):
     accessories: Optional[List[dict]] = []
     visual_assets: Optional[dict] = {}  # This should receive the visual assets
     product: Optional[dict] = {}        # This should receive the product info
+    render_mode: Optional[str] = "full"  # "full" (Flying Saucer every time) or "stamped" (cached base page + overlay)
+    optimize_level: Optional[int] = None  # 0-3, None uses settings.pdf_optimize_level
 
 class Category(BaseModel):
     id: int
@@ -84,6 +110,29 @@ class Accessory(BaseModel):
     price: float
     accessory_category: str
 
+class MatrixQuery(BaseModel):
+    product_id: Optional[int] = None
+    part_code_prefix: Optional[str] = None
+    variant_ids: Optional[List[int]] = None
+    options: Dict[str, List[Optional[int]]] = {}  # category_name -> allowed option ids (None = left empty)
+    offset: int = 0
+    limit: int = 100
+
+class NumericRange(BaseModel):
+    min: Optional[float] = None
+    max: Optional[float] = None
+
+class FacetQuery(BaseModel):
+    filters: Dict[str, List[Union[int, float, str]]] = {}  # facet -> accepted values, e.g. {"ip_rating": [65], "cct": ["2700K"]}
+    ranges: Dict[str, NumericRange] = {}  # wattage / lumens / efficacy
+    offset: int = 0
+    limit: int = 50
+
+class SelectionState(BaseModel):
+    product_id: int
+    variant_id: Optional[int] = None
+    selected_options: Dict[str, Optional[int]] = {}  # category_name -> option id (None = left empty)
+
 class UserConfiguration(BaseModel):
     product_id: int
     variant_id: int
@@ -267,124 +316,99 @@ async def get_products_by_category(category_slug: str):
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 
+@router.get("/search")
+def search_products(q: str, limit: int = 20):
+    """Ranked product search over names, part codes, variant specs and option labels"""
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="q must not be empty")
+    try:
+        return {"query": q, "results": catalog_search.search(supabase, q, max(1, min(limit, 100)))}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Search error: {str(e)}")
+
+@router.post("/facets/query")
+def query_facets(query: FacetQuery):
+    """Products matching the facet filters, with the counts of every facet value under the other filters"""
+    try:
+        index = facet_engine.get(supabase)
+        return index.query(query.filters, {facet: (r.min, r.max) for facet, r in query.ranges.items()},
+                           limit=max(0, min(query.limit, 500)), offset=max(0, query.offset))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Facet error: {str(e)}")
+
+@router.get("/facets")
+def get_facets():
+    """Every facet with its values and product counts over the whole catalog"""
+    try:
+        return facet_engine.get(supabase).query({}, {}, limit=0)['facets']
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Facet error: {str(e)}")
+
+@router.get("/search/suggest")
+def suggest_products(q: str, limit: int = 8):
+    """Autocomplete for the search box: completions of the last word and the best-matching products"""
+    try:
+        return catalog_search.suggest(supabase, q, max(1, min(limit, 20)))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Search error: {str(e)}")
+
+@router.get("/categories/{category_slug}/catalog")
+def generate_category_catalog(category_slug: str, admission: Admission = Depends(admit("category-catalog"))):
+    """Render every active product in a category (default configuration) into one PDF with a table of contents"""
+    try:
+        category_result = supabase.table('categories').select('id, name').eq('slug', category_slug).execute()
+        if not category_result.data:
+            raise HTTPException(status_code=404, detail="Category not found")
+        category = category_result.data[0]
+
+        products_result = supabase.table('products').select('id, name').eq('category_id', category['id']).eq('is_active', True).order('name').execute()
+        if not products_result.data:
+            raise HTTPException(status_code=404, detail="No active products in this category")
+        if len(products_result.data) > settings.catalog_max_products:
+            raise HTTPException(status_code=413, detail=f"Category has {len(products_result.data)} products; "
+                                                        f"catalogs are limited to {settings.catalog_max_products}")
+
+        def load_request(row):
+            details = get_product_details_cached(supabase, row['id'])
+            return build_default_datasheet_request(details, category['name']) if details else None
+
+        ticket = admission.render_slot_blocking()
+        try:
+            catalog_file = CatalogPdfBuilder().build(category['name'], products_result.data, load_request)
+        finally:
+            anyio.from_thread.run_sync(ticket.release)  # The pool belongs to the event loop
+
+        def stream():
+            try:
+                while chunk := catalog_file.read(64 * 1024):
+                    yield chunk
+            finally:
+                catalog_file.close()
+
+        filename = f"{category['name'].replace(' ', '_')}_catalog.pdf"
+        return StreamingResponse(
+            stream(),
+            media_type="application/pdf",
+            headers={"Content-Disposition": f"attachment; filename={filename}"}
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"ERROR in generate_category_catalog: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error generating catalog: {str(e)}")
+
 @router.get("/product-details/{product_id}")
 async def get_product_details_new(product_id: int):
     """Get detailed product information including configurable features"""
     try:
-        # Get product basic info
-        product_result = supabase.table('products').select('id, category_id, name, base_part_code, description, product_image_url, dimension_image_url, d1_mm, h_mm, d2_mm, cutout_mm, is_active, created_at').eq('id', product_id).execute()
-        if not product_result.data:
+        details = get_product_details_cached(supabase, product_id)
+        if details is None:
             raise HTTPException(status_code=404, detail="Product not found")
-        
-        product = product_result.data[0]
-        
-        print(f"=== BACKEND PRODUCT DEBUG ===")
-        print(f"Product keys from database: {list(product.keys())}")
-        print(f"D1 from DB: {product.get('d1_mm', 'NOT_FOUND')}")
-        print(f"H from DB: {product.get('h_mm', 'NOT_FOUND')}")
-        print(f"D2 from DB: {product.get('d2_mm', 'NOT_FOUND')}")
-        print(f"Cutout from DB: {product.get('cutout_mm', 'NOT_FOUND')}")
-        
-        # Get product variants
-        variants_result = supabase.table('product_variants').select('*').eq('product_id', product_id).eq('is_active', True).order('display_order').execute()
-        
-        # Get configuration categories with options
-        config_cats_result = supabase.table('configuration_categories').select('*').eq('product_id', product_id).order('display_order').execute()
-        
-        configuration_categories = []
-        for cat in config_cats_result.data:
-            # Get options for this category - make sure to include option_image_url
-            options_result = supabase.table('configuration_options').select('id, category_id, option_value, option_label, part_code_suffix, price_modifier, is_default, display_order, option_image_url').eq('category_id', cat['id']).order('display_order').execute()
-            cat['options'] = options_result.data if options_result.data else []
-            configuration_categories.append(cat)
-        
-        # SAFE: Get ALL accessories columns to see what exists
-        try:
-            accessories_result = supabase.table('accessories').select('*').eq('product_id', product_id).execute()
-            
-            # Add missing fields for compatibility with frontend/PDF
-            for accessory in accessories_result.data:
-                if 'image_url' not in accessory:
-                    accessory['image_url'] = None
-                if 'price' not in accessory:
-                    accessory['price'] = 0.0
-                if 'is_active' not in accessory:
-                    accessory['is_active'] = True
-                if 'display_order' not in accessory:
-                    accessory['display_order'] = 0
-                if 'accessory_category' not in accessory:
-                    accessory['accessory_category'] = 'General'
-            
-            # Filter active accessories if the field exists
-            if accessories_result.data and 'is_active' in accessories_result.data[0]:
-                accessories_result.data = [acc for acc in accessories_result.data if acc.get('is_active', True)]
-                
-        except Exception as e:
-            print(f"Error getting accessories: {e}")
-            accessories_result = type('MockResult', (), {'data': []})()
-        
-        # Get product features INCLUDING configurable color features
-        try:
-            features_result = supabase.table('product_features').select('*').eq('product_id', product_id).order('display_order').execute()
-        except Exception as e:
-            print(f"Error getting features: {e}")
-            features_result = type('MockResult', (), {'data': []})()
-        
-        # Extract configurable color features
-        configurable_features = {
-            'housing_color': {'configurable': False, 'default_value': 'N/A'},
-            'reflector_color': {'configurable': False, 'default_value': 'N/A'},
-            'finish': {'configurable': False, 'default_value': 'N/A'}  # NEW: Add finish
-        }
-        
-        for feature in features_result.data:
-            if feature['feature_type'] == 'housing_color':
-                configurable_features['housing_color'] = {
-                    'configurable': feature.get('is_configurable', False),
-                    'default_value': feature.get('feature_value', 'N/A')
-                }
-            elif feature['feature_type'] == 'reflector_color':
-                configurable_features['reflector_color'] = {
-                    'configurable': feature.get('is_configurable', False),
-                    'default_value': feature.get('feature_value', 'N/A')
-                }
-            elif feature['feature_type'] == 'finish':  # NEW: Add finish handling
-                configurable_features['finish'] = {
-                    'configurable': feature.get('is_configurable', False),
-                    'default_value': feature.get('feature_value', 'N/A')
-                }
-        # Get visual assets - BOTH product-specific AND global assets
-        try:
-            assets_result = supabase.table('visual_assets').select('*').or_(f'product_id.eq.{product_id},is_global.eq.true').order('display_order').execute()
-        except Exception as e:
-            print(f"Error getting visual assets: {e}")
-            assets_result = type('MockResult', (), {'data': []})()
-        
-        # Organize visual assets by type
-        visual_assets = {
-            'certifications': [],
-            'product_images': [],
-            'dimension_images': [],
-            'all_assets': assets_result.data
-        }
-        
-        for asset in assets_result.data:
-            if asset['asset_type'] == 'certification':
-                visual_assets['certifications'].append(asset)
-            elif 'product' in asset.get('asset_category', '').lower():
-                visual_assets['product_images'].append(asset)
-            elif 'dimension' in asset.get('asset_category', '').lower():
-                visual_assets['dimension_images'].append(asset)
-        
-        return {
-            "product": product,
-            "variants": variants_result.data,
-            "configuration_categories": configuration_categories,
-            "accessories": accessories_result.data,
-            "features": features_result.data,
-            "configurable_features": configurable_features,  # NEW: Add this line
-            "visual_assets": visual_assets
-        }
+        return sign_asset_urls(details)
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error in get_product_details_new: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
@@ -522,8 +546,113 @@ async def generate_part_code(config: UserConfiguration):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
+@router.post("/configure/matrix/query")
+def query_configuration_matrix(query: MatrixQuery):
+    """Precomputed combinations (part code + price) by product, part-code prefix and/or option filters"""
+    limit = max(1, min(query.limit, 1000))
+    try:
+        if query.product_id is None:
+            if not query.part_code_prefix:
+                raise HTTPException(status_code=400, detail="Give a product_id or a part_code_prefix")
+            if query.variant_ids or query.options:
+                raise HTTPException(status_code=400, detail="Option filters need a product_id")
+            rows = configuration_matrix.search_part_codes(supabase, query.part_code_prefix, query.offset + limit)
+            return {"total": None, "rows": rows[query.offset:]}
+
+        matrix = configuration_matrix.get(supabase, query.product_id)
+        try:
+            indices = matrix.matching_indices(query.variant_ids, query.options)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if query.part_code_prefix:
+            low, high = matrix.prefix_range(query.part_code_prefix)
+            indices = np.intersect1d(indices, matrix.order[low:high], assume_unique=True)
+        page = indices[query.offset:query.offset + limit]
+        return {"total": int(len(indices)), "rows": list(configuration_matrix.iter_rows(matrix, page))}
+    except HTTPException:
+        raise
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Product not found")
+    except Exception as e:
+        print(f"ERROR in query_configuration_matrix: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Configuration matrix error: {str(e)}")
+
+@router.post("/configure/valid-options")
+def get_valid_options(selection: SelectionState):
+    """Variants and options that can still be combined into a buildable product, given the current selection"""
+    try:
+        matrix = configuration_matrix.get(supabase, selection.product_id)
+        try:
+            valid = matrix.valid_options(selection.variant_id, selection.selected_options)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        first = next(matrix.iter_valid_indices(selection.variant_id, selection.selected_options), None)
+        valid['first_match'] = matrix.row(first) if first is not None else None
+        return valid
+    except HTTPException:
+        raise
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Product not found")
+    except Exception as e:
+        print(f"ERROR in get_valid_options: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Configuration matrix error: {str(e)}")
+
+@router.get("/configure/matrix/part-code/{part_code}")
+def lookup_part_code(part_code: str):
+    """The configuration (product, variant, options) and price behind a full part code"""
+    try:
+        row = configuration_matrix.find_part_code(supabase, part_code)
+    except Exception as e:
+        print(f"ERROR in lookup_part_code: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Configuration matrix error: {str(e)}")
+    if row is None:
+        raise HTTPException(status_code=404, detail="Unknown part code")
+    return row
+
+@router.get("/configure/matrix/{product_id}/export")
+def export_configuration_matrix(product_id: int):
+    """Every combination of a product as CSV (price lists, ERP import)"""
+    try:
+        matrix = configuration_matrix.get(supabase, product_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Product not found")
+    except Exception as e:
+        print(f"ERROR in export_configuration_matrix: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Configuration matrix error: {str(e)}")
+
+    categories = [axis.name for axis in matrix.axes[1:]]
+
+    def rows():
+        buffer = StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(['part_code', 'price', 'variant_id'] + categories)
+        # Part-code order, straight from the sorted index
+        for start in range(0, matrix.size, 5000):
+            for index in matrix.order[start:start + 5000]:
+                row = matrix.row(int(index))
+                writer.writerow([row['part_code'], f"{row['price']:.2f}", row['variant_id']]
+                                + [row['selected_options'][name] for name in categories])
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    return StreamingResponse(rows(), media_type="text/csv", headers={
+        "Content-Disposition": f'attachment; filename="configuration-matrix-{product_id}.csv"'})
+
+@router.post("/configure/matrix/refresh")
+def refresh_configuration_matrix(product_ids: Optional[List[int]] = None, admin: AuthenticatedUser = Depends(get_admin_user)):
+    """Rebuild the matrix for the given products (default: all active products); admins only"""
+    try:
+        if product_ids:
+            catalog_invalidations.publish(product_ids)  # Other workers rebuild them on their next read
+        built = configuration_matrix.load(supabase, product_ids or None)
+        return {"rebuilt": sorted(built), **configuration_matrix.stats()}
+    except Exception as e:
+        print(f"ERROR in refresh_configuration_matrix: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Configuration matrix error: {str(e)}")
+
 @router.post("/generate-datasheet")
-async def generate_datasheet(request: PDFGenerationRequest):
+async def generate_datasheet(request: PDFGenerationRequest, admission: Admission = Depends(admit("generate-datasheet"))):
     """Generate and return a PDF datasheet with enhanced debugging"""
     try:
         print("=== BACKEND PDF GENERATION DEBUG ===")
@@ -549,23 +678,7 @@ async def generate_datasheet(request: PDFGenerationRequest):
             
             # Fetch visual assets from database (same logic as get_product_details_new)
             try:
-                assets_result = supabase.table('visual_assets').select('*').or_(f'product_id.eq.{product_id},is_global.eq.true').order('display_order').execute()
-                
-                # Organize visual assets by type
-                visual_assets = {
-                    'certifications': [],
-                    'product_images': [],
-                    'dimension_images': [],
-                    'all_assets': assets_result.data
-                }
-                
-                for asset in assets_result.data:
-                    if asset['asset_type'] == 'certification':
-                        visual_assets['certifications'].append(asset)
-                    elif 'product' in asset.get('asset_category', '').lower():
-                        visual_assets['product_images'].append(asset)
-                    elif 'dimension' in asset.get('asset_category', '').lower():
-                        visual_assets['dimension_images'].append(asset)
+                visual_assets = fetch_visual_assets(supabase, product_id)
                 
                 # Update product_data with fetched visual assets
                 product_data['visual_assets'] = visual_assets
@@ -593,27 +706,213 @@ async def generate_datasheet(request: PDFGenerationRequest):
         else:
             print("ERROR: No visual assets in final product_data!")
         
-        # Generate PDF
-        generator = DatasheetGenerator()
-        pdf_buffer = generator.generate_datasheet(product_data)
-        
-        # Return as streaming response
         filename = f"{request.product_name.replace(' ', '_')}_datasheet.pdf"
+        optimize_level = settings.pdf_optimize_level if request.optimize_level is None else request.optimize_level
+        generator = DatasheetGenerator()
+        cache_key = pdf_cache_key(configuration_key(generator._extract_datasheet_fields(product_data)), optimize_level)
+        
+        cached_pdf = pdf_cache.get(cache_key)
+        cache_status = "hit"
+        flight = None
+        while cached_pdf is None:
+            flight, leader = pdf_flights.join(cache_key)
+            if leader:
+                break
+            # The same configuration is already rendering (another download or a speculative
+            # render) - share its bytes; if that render is abandoned, join again
+            try:
+                cached_pdf = await pdf_flights.wait(flight)
+                cache_status = "coalesced"
+            except FlightAbandoned:
+                continue
+        if cached_pdf is None:
+            # Leading a render: wait for a render slot (or get 429/503), then check again - whoever
+            # held the slot before us may have rendered the same configuration
+            try:
+                ticket = await admission.render_slot()
+            except BaseException:
+                pdf_flights.abandon(cache_key, flight)
+                raise
+            cached_pdf = pdf_cache.get(cache_key)
+            if cached_pdf is not None:
+                ticket.release()
+                pdf_flights.finish(cache_key, flight, cached_pdf)
+        if cached_pdf is not None:
+            print(f"✓ Datasheet served from cache ({len(cached_pdf)} bytes, {cache_status})")
+            return Response(
+                content=cached_pdf,
+                media_type="application/pdf",
+                headers={"Content-Disposition": f"attachment; filename={filename}", "X-Datasheet-Cache": cache_status}
+            )
+        
+        async def settle():
+            # Async so BackgroundTask runs it on the event loop, which owns the render pool
+            ticket.release()
+            pdf_flights.abandon(cache_key, flight)  # No-op once the flight has finished
+        
+        # Full render without optimization: stream PDF bytes straight from the renderer to the client
+        if request.render_mode != "stamped" and not optimize_level:
+            try:
+                html_content = await run_in_threadpool(generator._create_phos_style_html, product_data)  # Signs image URLs
+                pdf_stream = await generator.open_pdf_stream(html_content)
+            except Exception as e:
+                ticket.release()
+                pdf_flights.finish(cache_key, flight, error=e)
+                raise
+            except BaseException:
+                await settle()
+                raise
+            
+            async def stream_and_cache():
+                # The render slot and the flight are held until the renderer has finished, not just until
+                # the handler returns; a client disconnect abandons the flight for the followers to retry
+                try:
+                    chunks = []
+                    with speculative_renderer.foreground():
+                        # Raises if the renderer exits non-zero, even after some chunks were sent
+                        async for chunk in pdf_stream:
+                            chunks.append(chunk)
+                            yield chunk
+                    pdf_data = b''.join(chunks)
+                    if not pdf_data.rstrip().endswith(b'%%EOF'):
+                        raise Exception("PDF stream ended before the end of the document")
+                    # Only a stream that completed with exit code 0 is cached and handed to followers
+                    pdf_cache.put(cache_key, pdf_data)
+                    pdf_flights.finish(cache_key, flight, pdf_data)
+                except Exception as e:
+                    pdf_flights.finish(cache_key, flight, error=e)
+                    raise
+                finally:
+                    await settle()
+            
+            return StreamingResponse(
+                stream_and_cache(),
+                media_type="application/pdf",
+                headers={"Content-Disposition": f"attachment; filename={filename}", "X-Datasheet-Cache": "miss"},
+                background=BackgroundTask(settle)  # In case the stream never starts
+            )
+        
+        def render():
+            with speculative_renderer.foreground():
+                if request.render_mode == "stamped":
+                    pdf_buffer = template_stamper.generate_datasheet(product_data)
+                else:
+                    pdf_buffer = generator.generate_datasheet(product_data)
+            return optimize_pdf(pdf_buffer.getvalue(), optimize_level)
+        
+        # Generate PDF - in the threadpool, so the event loop keeps serving (and timing out) queued requests
+        try:
+            pdf_data, optimize_report = await run_in_threadpool(render)
+            pdf_cache.put(cache_key, pdf_data)
+            pdf_flights.finish(cache_key, flight, pdf_data)
+        except Exception as e:
+            pdf_flights.finish(cache_key, flight, error=e)
+            raise
+        finally:
+            await settle()
         
-        return StreamingResponse(
-            BytesIO(pdf_buffer.read()),
+        return Response(
+            content=pdf_data,
             media_type="application/pdf",
-            headers={"Content-Disposition": f"attachment; filename={filename}"}
+            headers={
+                "Content-Disposition": f"attachment; filename={filename}",
+                "X-Datasheet-Cache": "miss",
+                "X-PDF-Bytes-Saved": str(optimize_report['bytes_saved']),
+                "X-PDF-Optimize-Ms": str(optimize_report['elapsed_ms']),
+            }
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"ERROR in generate_datasheet: {str(e)}")
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Error generating PDF: {str(e)}")
 
+@router.post("/preview")
+async def preview_datasheet(request: PDFGenerationRequest, format: str = "webp", width: Optional[int] = None, if_none_match: Optional[str] = Header(None),
+                           admission: Admission = Depends(admit("preview"))):
+    """Screen-resolution image of datasheet page one, cached by configuration key"""
+    if format.lower() not in PREVIEW_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(PREVIEW_FORMATS)}")
+    try:
+        # Rate limit only: previews are mostly cache hits or stamper renders, so they take no render slot
+        image_bytes, info = await run_in_threadpool(datasheet_previewer.render_preview, request.dict(), format, width)
+        etag = f'"{info["configuration_key"]}-{format.lower()}-{width or settings.preview_default_width}"'
+        headers = {
+            "ETag": etag,
+            "Cache-Control": "private, max-age=300",
+            "X-Configuration-Key": info['configuration_key'],
+            "X-Preview-Source": info['source'],
+            "X-Render-Ms": str(info['render_ms']),
+        }
+        if if_none_match == etag:
+            return Response(status_code=304, headers=headers)
+        return Response(content=image_bytes, media_type=info['media_type'], headers=headers)
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"ERROR in preview_datasheet: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error generating preview: {str(e)}")
+
+@router.post("/speculate", status_code=202)
+async def speculate_datasheet(request: PDFGenerationRequest, x_session_id: Optional[str] = Header(None)):
+    """Tell the server the configurator state changed; it may pre-render the datasheet once the session goes idle"""
+    if not x_session_id:
+        raise HTTPException(status_code=400, detail="X-Session-Id header is required")
+    speculative_renderer.schedule(x_session_id, request.dict())
+    return {"scheduled": settings.speculative_enabled, "debounce_ms": settings.speculative_debounce_ms}
+
+@router.post("/cache-warm", status_code=202)
+async def start_cache_warm(admin: AuthenticatedUser = Depends(get_admin_user)):
+    """Warm the catalog and PDF caches for every active product's default configuration in the background; admins only"""
+    if not cache_warmer.start(supabase):
+        raise HTTPException(status_code=409, detail="Cache warming is already running")
+    return {"started": True, "status_url": "/api/products/cache-warm/status"}
+
+@router.get("/cache-warm/status")
+async def cache_warm_status():
+    """Progress of the current (or last) cache warming run"""
+    return {**cache_warmer.state, "running": cache_warmer.running}
+
+@router.websocket("/ws/preview")
+async def live_preview(websocket: WebSocket):
+    """Live HTML datasheet preview.
+
+    Client sends {"type": "init", "payload": <generate-datasheet body>} once,
+    then {"type": "delta", "changes": {...}} per configurator change; the server
+    answers with the full document once and afterwards only changed sections.
+    """
+    await websocket.accept()
+    session = LivePreviewSession()
+    session_id = f"ws-{uuid.uuid4().hex}"
+    try:
+        while True:
+            message = await websocket.receive_json()
+            try:
+                if message.get('type') == 'init':
+                    payload = PDFGenerationRequest(**message.get('payload', {})).dict()
+                    await websocket.send_json(await run_in_threadpool(session.start, payload))
+                elif message.get('type') == 'delta':
+                    changes = message.get('changes') or {}
+                    unknown = [key for key in changes if key not in PDFGenerationRequest.__fields__]
+                    if unknown:
+                        raise ValueError(f"Unknown fields in delta: {unknown}")
+                    await websocket.send_json(await run_in_threadpool(session.apply, changes))
+                else:
+                    raise ValueError(f"Unknown message type: {message.get('type')}")
+                speculative_renderer.schedule(session_id, session.payload)
+            except (ValueError, ValidationError) as e:
+                await websocket.send_json({"type": "error", "detail": str(e)})
+            except Exception as e:
+                print(f"ERROR in live_preview: {str(e)}")
+                await websocket.send_json({"type": "error", "detail": f"Preview error: {str(e)}"})
+    except WebSocketDisconnect:
+        speculative_renderer.cancel(session_id)
+
 @router.post("/configure/save")
-async def save_user_configuration(config: UserConfiguration):
+async def save_user_configuration(config: UserConfiguration, user: Optional[AuthenticatedUser] = Depends(get_optional_user)):
     """Save user configuration"""
     try:
         # Calculate price and generate part code first
@@ -622,7 +921,7 @@ async def save_user_configuration(config: UserConfiguration):
         
         # Save configuration
         insert_data = {
-            "user_id": None,  # You'll need to implement authentication to get actual user_id
+            "user_id": user.id if user else None,  # Anonymous saves stay possible
             "product_id": config.product_id,
             "variant_id": config.variant_id,
             "selected_options": config.selected_options,
@@ -644,10 +943,46 @@ async def save_user_configuration(config: UserConfiguration):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
     
+@router.get("/configure/saved")
+def list_saved_configurations(product_id: Optional[int] = None, part_code_prefix: Optional[str] = None,
+                              created_from: Optional[datetime] = None, created_to: Optional[datetime] = None,
+                              cursor: Optional[str] = None, limit: Optional[int] = None,
+                              user: AuthenticatedUser = Depends(get_current_user)):
+    """The caller's saved configurations, newest first; pass `next_cursor` back as `cursor` for the next page"""
+    if user.id is None:
+        raise HTTPException(status_code=403, detail="Saved configurations belong to a user account")
+    if user.id is None:
+        raise HTTPException(status_code=403, detail="Saved configurations belong to a user account")
+    try:
+        return saved_configurations.list_saved_configurations(
+            supabase, user.id, product_id, part_code_prefix,
+            created_from.isoformat() if created_from else None, created_to.isoformat() if created_to else None,
+            cursor=cursor, limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+@router.get("/configure/saved/search")
+def search_saved_configurations(q: str, product_id: Optional[int] = None, cursor: Optional[str] = None,
+                                limit: Optional[int] = None, user: AuthenticatedUser = Depends(get_current_user)):
+    """The caller's saved configurations whose name, notes or part code contain `q`, newest first"""
+    if user.id is None:
+        raise HTTPException(status_code=403, detail="Saved configurations belong to a user account")
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="q must not be empty")
+    try:
+        return saved_configurations.list_saved_configurations(
+            supabase, user.id, product_id, search=q, cursor=cursor, limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    
 # Add these endpoints to the end of your products.py file
 
 @router.post("/generate-html-datasheet")
-async def generate_html_datasheet(request: PDFGenerationRequest):
+async def generate_html_datasheet(request: PDFGenerationRequest, admission: Admission = Depends(admit("generate-html-datasheet"))):
     """Generate HTML datasheet - uses same logic as PDF generator for now"""
     try:
         print("=== HTML DATASHEET GENERATION ===")
@@ -655,14 +990,16 @@ async def generate_html_datasheet(request: PDFGenerationRequest):
         
         # For now, redirect to the existing PDF generator
         # Later you can implement HTML-specific logic here
-        return await generate_datasheet(request)
+        return await generate_datasheet(request, admission)
         
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"ERROR in generate_html_datasheet: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error generating HTML datasheet: {str(e)}")
 
 @router.post("/generate-professional-datasheet") 
-async def generate_professional_datasheet(request: PDFGenerationRequest):
+async def generate_professional_datasheet(request: PDFGenerationRequest, admission: Admission = Depends(admit("generate-professional-datasheet"))):
     """Generate professional datasheet - uses enhanced formatting"""
     try:
         print("=== PROFESSIONAL DATASHEET GENERATION ===")
@@ -670,8 +1007,10 @@ async def generate_professional_datasheet(request: PDFGenerationRequest):
         
         # For now, redirect to the existing PDF generator
         # Later you can add professional-specific formatting here
-        return await generate_datasheet(request)
+        return await generate_datasheet(request, admission)
         
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"ERROR in generate_professional_datasheet: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error generating professional datasheet: {str(e)}")
\ No newline at end of file
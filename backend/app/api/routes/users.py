@@ -1,5 +1,7 @@
 from fastapi import APIRouter, HTTPException, Depends
 from fastapi.security import HTTPBearer
+from app.api.deps import get_current_user
+from app.models.user import AuthenticatedUser
 from app.services.supabase_client import supabase
 from pydantic import BaseModel
 
@@ -12,9 +14,9 @@ class UserResponse(BaseModel):
     created_at: str
 
 @router.get("/me")
-async def get_current_user():
-    """Get current user info"""
-    return {"message": "User endpoint working"}
+async def get_me(user: AuthenticatedUser = Depends(get_current_user)):
+    """Get current user info (from the verified access token, no auth round trip)"""
+    return {"id": user.id, "email": user.email, "role": user.role, "expires_at": user.expires_at}
 
 @router.get("/")
 async def get_users():
@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings
 import os
+import tempfile
 
 class Settings(BaseSettings):
     # Database settings
@@ -13,6 +14,16 @@ class Settings(BaseSettings):
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 30
     
+    # Access tokens: verified locally against the Supabase JWT secret (HS256) or the project JWKS (RS256/ES256)
+    supabase_jwt_secret: str = ""
+    supabase_jwks_url: str = ""  # Default: <supabase_url>/auth/v1/.well-known/jwks.json
+    auth_jwt_audience: str = "authenticated"
+    auth_leeway_s: int = 30
+    auth_jwks_cache_s: int = 600
+    auth_jwks_min_refresh_s: int = 30  # Refetch at most this often when a token names an unknown key
+    auth_claims_cache_size: int = 10000
+    auth_admin_roles: list = ["admin"]  # app_metadata.role values allowed to call the import and maintenance routes
+    
     # Environment
     environment: str = "development"
     
@@ -20,6 +31,103 @@ class Settings(BaseSettings):
     api_title: str = "Lylux Product Configurator API"
     api_version: str = "1.0.0"
     
+    # Datasheet stamping: number of cached base pages (one per product layout), and how long a layout that
+    # can't be stamped goes straight to the full render before the base is tried again
+    stamp_base_cache_size: int = 128
+    stamp_failure_retry_s: int = 600
+    
+    # Category catalog PDFs: products rendered per Flying Saucer run, in-memory size before spooling to disk, and the
+    # largest category rendered (the merged pages are held in memory until the file is written)
+    catalog_chunk_size: int = 10
+    catalog_spool_max_bytes: int = 32 * 1024 * 1024
+    catalog_max_products: int = 200
+    
+    # Post-render PDF optimization: 0 off, 1 recompress + dedupe, 2 + strip unused resources, 3 + object streams
+    pdf_optimize_level: int = 0
+    pdf_optimize_verify: bool = True
+    
+    # Render caches (keyed by configuration key) and datasheet preview thumbnails
+    pdf_cache_max_mb: int = 64
+    preview_cache_max_mb: int = 32
+    catalog_cache_max_mb: int = 16
+    catalog_cache_ttl_s: int = 300
+    preview_default_width: int = 600
+    preview_max_width: int = 1600
+    preview_latency_target_ms: float = 150.0
+    
+    # Speculative pre-rendering of the configuration a session is likely to download
+    speculative_enabled: bool = True
+    speculative_debounce_ms: int = 2000
+    speculative_max_concurrency: int = 1
+    speculative_max_queue: int = 4
+    speculative_max_per_session: int = 5
+    speculative_session_window_s: int = 600
+    speculative_max_foreground: int = 2
+    speculative_max_load: float = 0.75
+    
+    # Cache warming: default configuration of every active product, on startup and/or every N seconds (0 = off)
+    cache_warm_on_startup: bool = False
+    cache_warm_interval_s: int = 0
+    cache_warm_concurrency: int = 2
+    cache_warm_products_per_second: float = 2.0
+    cache_warm_render_pdfs: bool = True
+    
+    # Excel catalog import: rows per bulk upsert, and rejected rows listed in the report
+    import_chunk_size: int = 500
+    import_max_reported_rejections: int = 1000
+    
+    # Configuration matrix: every variant × option combination per product, held in memory
+    config_matrix_max_combinations: int = 2_000_000
+    
+    # Saved configurations listing (keyset pages)
+    saved_configurations_page_size: int = 50
+    saved_configurations_max_page_size: int = 200
+    
+    # Static assets: storage backend ("supabase" or "local"), content-addressed paths and bulk ingest
+    asset_storage_backend: str = "supabase"
+    asset_bucket: str = "product-images"
+    asset_storage_prefix: str = "visual-assets/sha256"
+    asset_local_root: str = "static/assets"
+    asset_local_base_url: str = ""
+    asset_upload_concurrency: int = 4
+    asset_ingest_chunk_files: int = 50
+    asset_ingest_journal_dir: str = os.path.join(tempfile.gettempdir(), "lylux-asset-ingest")
+    asset_ingest_allowed_root: str = ""  # Server directory ingest is disabled unless set
+    
+    # Signed asset URLs: lifetime, re-signed in the background inside the refresh margin, signed before use below the minimum
+    asset_url_expiry_s: int = 7 * 24 * 3600
+    asset_url_refresh_margin_s: int = 24 * 3600
+    asset_url_min_validity_s: int = 600
+    asset_url_retry_s: int = 60
+    asset_url_cache_size: int = 10000
+    
+    # Multi-worker mode: host-wide cache tier shared by all worker processes (e.g. "/dev/shm/lylux-cache"; empty = off)
+    shared_cache_dir: str = ""
+    shared_cache_max_mb: int = 256  # Per namespace (pdf, preview, catalog)
+    
+    # Start-up warm-up gating /ready: test render through the PDF engine, then the configuration matrix, search and facet indexes in the background
+    warmup_render_check: bool = True
+    warmup_load_matrix: bool = True
+    warmup_build_search_index: bool = True  # Also builds the facet index
+    warmup_retry_s: int = 15
+    
+    # Admission control for the rendering endpoints (per worker process)
+    admission_enabled: bool = True
+    admission_max_concurrent_renders: int = os.cpu_count() or 2
+    admission_max_per_client: int = 2
+    admission_max_queue: int = 16
+    admission_queue_timeout_s: float = 10.0
+    # Reverse proxies in front of the app that append to X-Forwarded-For (0: ignore the header, use the peer address)
+    admission_trusted_proxy_hops: int = 0
+    # Token bucket per route and client: [requests per second, burst]
+    admission_rate_limits: dict = {
+        "generate-datasheet": [1.0, 5],
+        "generate-html-datasheet": [1.0, 5],
+        "generate-professional-datasheet": [1.0, 5],
+        "preview": [5.0, 20],
+        "category-catalog": [0.1, 2],
+    }
+    
     # CORS settings
     allowed_origins: list = ["http://localhost:3000", "http://localhost:5173"]
     
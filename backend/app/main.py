@@ -1,12 +1,38 @@
+import time
+IMPORT_STARTED = time.perf_counter()  # Start of the import-to-ready measurement
+
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.api.routes import auth, products  # Make sure products is imported
+from fastapi.responses import JSONResponse
+from app.api.routes import auth, products, imports, users  # Make sure products is imported
 from app.core.config import settings
+from app.services.warmup import Warmup
+
+warmup = Warmup(started_at=IMPORT_STARTED)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Warm clients and the renderer in the background; cache warming per the cache_warm_* settings"""
+    warmup.start()
+    warming = None
+    if settings.cache_warm_interval_s > 0:
+        from app.services.cache_warmer import cache_warmer
+        warming = asyncio.ensure_future(cache_warmer.run_forever(settings.cache_warm_interval_s))
+    elif settings.cache_warm_on_startup:
+        from app.services.cache_warmer import cache_warmer
+        cache_warmer.start()
+    yield
+    if warming is not None:
+        warming.cancel()
+    await warmup.stop()
 
 app = FastAPI(
     title="Lylux Product Configurator API",
     description="FastAPI backend for Lylux lighting product configurator",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
 # CORS middleware
@@ -20,7 +46,9 @@ app.add_middleware(
 
 # Include routers
 app.include_router(auth.router, prefix="/api/auth", tags=["authentication"])
+app.include_router(users.router, prefix="/api/users", tags=["users"])
 app.include_router(products.router, prefix="/api/products", tags=["products"])  # This line
+app.include_router(imports.router, prefix="/api/import", tags=["import"])
 
 @app.get("/")
 async def root():
@@ -28,8 +56,25 @@ async def root():
 
 @app.get("/health")
 async def health_check():
+    """Liveness: the process is up (it may still be warming; see /ready)"""
     return {"status": "healthy"}
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness: 200 once clients and the renderer are warm, 503 with the warm-up state before that"""
+    state = warmup.snapshot()
+    return JSONResponse(state, status_code=200 if state['ready'] else 503)
+
+@app.get("/metrics")
+async def get_metrics():
+    """Counters, latency percentiles (with targets), cache hit rates, render slots, render coalescing and signed asset URLs for this process"""
+    from app.services.admission import render_pool
+    from app.services.asset_urls import asset_urls
+    from app.services.metrics import metrics
+    from app.services.single_flight import pdf_flights
+    return {**metrics.snapshot(), 'admission': render_pool.stats(), 'single_flight': {'pdf': pdf_flights.stats()},
+            'asset_urls': asset_urls.stats()}
+
 @app.get("/test-supabase-import")
 async def test_supabase_import():
     try:
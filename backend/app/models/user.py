@@ -0,0 +1,23 @@
+from typing import Any, Dict, Optional
+
+from pydantic import BaseModel
+
+
+class AuthenticatedUser(BaseModel):
+    """The caller, as described by a verified Supabase access token (no id for the service role)"""
+    id: Optional[str] = None
+    email: Optional[str] = None
+    role: Optional[str] = None
+    expires_at: int
+    claims: Dict[str, Any] = {}
+
+    @property
+    def app_role(self) -> Optional[str]:
+        """Role set in app_metadata (only the service role can write it, unlike user_metadata)"""
+        app_metadata = self.claims.get('app_metadata') or {}
+        return app_metadata.get('role') if isinstance(app_metadata, dict) else None
+
+    @classmethod
+    def from_claims(cls, claims: Dict[str, Any]) -> "AuthenticatedUser":
+        return cls(id=claims.get('sub'), email=claims.get('email'), role=claims.get('role'),
+                   expires_at=int(claims['exp']), claims=claims)
@@ -0,0 +1,203 @@
+# backend/app/services/admission.py
+"""Admission control for the expensive (Java-rendering) endpoints.
+
+Two layers, checked in this order:
+
+1. A token bucket per (route, client), so each route has its own rate and
+   burst (`admission_rate_limits`). An empty bucket is answered with 429 and a
+   Retry-After of exactly when the next token arrives.
+2. One render pool for the whole process: at most
+   `admission_max_concurrent_renders` requests render at once, and each
+   client holds at most `admission_max_per_client` of those slots. Beyond
+   that, requests wait in a bounded queue. When a slot frees up it goes to
+   the next *client* in round-robin order rather than the oldest request,
+   so a script with a full queue can't starve the other users. A full queue
+   gives 503; a client over its share gives 429; a wait longer than
+   `admission_queue_timeout_s` gives 503. Each of these carries a Retry-After
+   estimated from the recent render time.
+"""
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.services.metrics import metrics
+
+MAX_TRACKED_CLIENTS = 10000
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, status_code: int, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """0 if a token was taken, otherwise seconds until one is available"""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate if self.rate > 0 else 60.0
+
+
+class RateLimiter:
+    """Token buckets per (route, client); routes without a configured limit are unlimited"""
+
+    def __init__(self, limits: Dict[str, Tuple[float, float]]):
+        self.limits = limits
+        self._buckets: "OrderedDict[Tuple[str, str], TokenBucket]" = OrderedDict()
+
+    def check(self, route: str, client: str):
+        limit = self.limits.get(route)
+        if limit is None:
+            return
+        key = (route, client)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(*limit)
+            if len(self._buckets) > MAX_TRACKED_CLIENTS:
+                self._buckets.popitem(last=False)  # Least recently seen client starts afresh
+        self._buckets.move_to_end(key)
+        wait = bucket.take()
+        if wait > 0:
+            metrics.increment(f"admission.{route}.rate_limited")
+            raise AdmissionRejected(429, f"Rate limit exceeded for {route}", wait)
+
+
+class Ticket:
+    """A held render slot; released exactly once (a ticket without a pool is admission switched off)"""
+
+    def __init__(self, pool: Optional["RenderPool"], client: str):
+        self.pool = pool
+        self.client = client
+        self.started = time.monotonic()
+        self.released = False
+
+    def release(self):
+        """Call on the event loop: the pool and its waiters' futures aren't thread-safe"""
+        if not self.released:
+            self.released = True
+            if self.pool is not None:
+                self.pool._release(self)
+
+
+class RenderPool:
+    def __init__(self, max_concurrent: int, max_per_client: int, max_queue: int, queue_timeout_s: float):
+        self.max_concurrent = max_concurrent
+        self.max_per_client = max_per_client
+        self.max_queue = max_queue
+        self.queue_timeout_s = queue_timeout_s
+        self.active = 0
+        self._active_by_client: Dict[str, int] = {}
+        self._waiting: "OrderedDict[str, Deque[asyncio.Future]]" = OrderedDict()
+        self._queued = 0
+        self._service_s = 2.0  # EWMA of slot hold time, seeds the Retry-After estimate
+
+    async def acquire(self, client: str) -> Ticket:
+        running = self._active_by_client.get(client, 0)
+        waiting = len(self._waiting.get(client, ()))
+        if running + waiting >= 2 * self.max_per_client:
+            metrics.increment('admission.render.client_limited')
+            raise AdmissionRejected(429, "Too many concurrent requests from this client", self._service_s)
+
+        if self.active < self.max_concurrent and running < self.max_per_client and not self._queued:
+            return self._grant(client)
+
+        if self._queued >= self.max_queue:
+            metrics.increment('admission.render.queue_full')
+            raise AdmissionRejected(503, "Render capacity exhausted", self._retry_estimate())
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiting.setdefault(client, deque()).append(future)
+        self._queued += 1
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), self.queue_timeout_s)
+        except asyncio.TimeoutError:
+            if not self._withdraw(client, future):
+                return future.result()  # Granted just as the deadline passed
+            metrics.increment('admission.render.timed_out')
+            raise AdmissionRejected(503, "Timed out waiting for render capacity", self._retry_estimate())
+        except BaseException:
+            # Client went away while queued: give back a slot we may just have been granted
+            if not self._withdraw(client, future) and not future.cancelled():
+                future.result().release()
+            raise
+        finally:
+            metrics.observe('admission.render.queue_wait', time.monotonic() - start)
+        return future.result()
+
+    def stats(self) -> Dict[str, object]:
+        return {'active': self.active, 'queued': self._queued, 'max_concurrent': self.max_concurrent,
+                'clients_active': len(self._active_by_client), 'service_s': round(self._service_s, 2)}
+
+    def _grant(self, client: str) -> Ticket:
+        self.active += 1
+        self._active_by_client[client] = self._active_by_client.get(client, 0) + 1
+        metrics.increment('admission.render.admitted')
+        return Ticket(self, client)
+
+    def _release(self, ticket: Ticket):
+        self.active -= 1
+        remaining = self._active_by_client.get(ticket.client, 1) - 1
+        if remaining:
+            self._active_by_client[ticket.client] = remaining
+        else:
+            self._active_by_client.pop(ticket.client, None)
+        self._service_s = 0.8 * self._service_s + 0.2 * (time.monotonic() - ticket.started)
+        self._dispatch()
+
+    def _dispatch(self):
+        """Hand free slots to waiting clients, one client at a time in round-robin order"""
+        skipped = 0
+        while self.active < self.max_concurrent and self._waiting and skipped < len(self._waiting):
+            client, queue = next(iter(self._waiting.items()))
+            self._waiting.move_to_end(client)
+            if self._active_by_client.get(client, 0) >= self.max_per_client:
+                skipped += 1
+                continue
+            future = queue.popleft()
+            self._queued -= 1
+            if not queue:
+                del self._waiting[client]
+            if not future.done():
+                future.set_result(self._grant(client))
+            skipped = 0
+
+    def _withdraw(self, client: str, future: asyncio.Future) -> bool:
+        """Remove a still-waiting request; False if it had already been granted"""
+        queue = self._waiting.get(client)
+        if queue is None or future not in queue:
+            return False
+        queue.remove(future)
+        self._queued -= 1
+        if not queue:
+            del self._waiting[client]
+        return True
+
+    def _retry_estimate(self) -> float:
+        return self._service_s * (self._queued + 1) / max(1, self.max_concurrent)
+
+
+rate_limiter = RateLimiter({route: tuple(limit) for route, limit in settings.admission_rate_limits.items()})
+render_pool = RenderPool(
+    settings.admission_max_concurrent_renders,
+    settings.admission_max_per_client,
+    settings.admission_max_queue,
+    settings.admission_queue_timeout_s,
+)
+metrics.set_target('admission.render.queue_wait', settings.admission_queue_timeout_s * 1000)
@@ -0,0 +1,269 @@
+# backend/app/services/asset_ingest.py
+"""Bulk ingest of static assets from a ZIP archive or a directory.
+
+Every file is hashed (SHA-256) and stored once at a content-addressed path,
+`{asset_storage_prefix}/{hash[:2]}/{hash}{ext}`, so the same CE/RoHS logo
+sent fifty times is uploaded once and existing objects are never rewritten.
+Uploads run in a bounded thread pool, `asset_ingest_chunk_files` files at a
+time; finished files are appended to a journal named after the source's
+listing, so re-sending the same archive after a failure resumes where it
+stopped instead of starting over.
+
+Files are linked to `visual_assets` by name:
+
+    certifications/<any>.png, cert*.png     -> global certification
+    <PART CODE>_dimension[_<n>].png         -> dimension drawing (also dim, drawing)
+    <PART CODE>_beam[...][_<n>].png         -> beam-angle chart
+    <PART CODE>[_<anything>][_<n>].png      -> product image
+    <PART CODE>/<any>.png                   -> same, by folder
+
+Part codes match products.base_part_code case-insensitively; `n` becomes the
+display order. Files that match no product are reported, not uploaded.
+"""
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, IO, List, Optional, Tuple
+
+from app.core.config import settings
+from app.services.asset_storage import AssetStorage
+from app.services.catalog_service import product_details_cache_key
+from app.services.render_cache import catalog_cache
+
+ASSET_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.gif', '.webp', '.svg', '.pdf'}
+DIMENSION_ROLES = {'dimension', 'dimensions', 'dim', 'drawing'}
+
+# (relative name, size, opener)
+AssetEntry = Tuple[str, int, Callable[[], IO[bytes]]]
+
+
+def zip_entries(archive: zipfile.ZipFile) -> List[AssetEntry]:
+    return [(info.filename, info.file_size, lambda info=info: archive.open(info))
+            for info in archive.infolist() if not info.is_dir()]
+
+
+def directory_entries(root: str) -> List[AssetEntry]:
+    entries = []
+    for folder, _, files in os.walk(root):
+        for name in files:
+            path = os.path.join(folder, name)
+            relative = os.path.relpath(path, root).replace(os.sep, '/')
+            entries.append((relative, os.path.getsize(path), lambda path=path: open(path, 'rb')))
+    return entries
+
+
+def is_asset_file(name: str) -> bool:
+    parts = name.split('/')
+    if any(part.startswith('.') or part == '__MACOSX' for part in parts):
+        return False
+    return posixpath.splitext(name)[1].lower() in ASSET_EXTENSIONS
+
+
+def classify_asset(name: str, product_codes: Dict[str, int]) -> Optional[Dict[str, Any]]:
+    """visual_assets fields implied by a file name, or None when it matches no product"""
+    folder, file_name = posixpath.split(name)
+    stem = posixpath.splitext(file_name)[0]
+    folders = [part.lower() for part in folder.split('/') if part]
+    tokens = stem.split('_')
+
+    if any(part.startswith('cert') for part in folders) or stem.lower().startswith('cert'):
+        return {'product_id': None, 'is_global': True, 'asset_type': 'certification',
+                'asset_category': 'certification', 'display_order': 0}
+
+    product_id = product_codes.get(tokens[0].lower())
+    if product_id is not None:
+        tokens = tokens[1:]
+    else:
+        product_id = next((product_codes[part] for part in reversed(folders) if part in product_codes), None)
+    if product_id is None:
+        return None
+
+    display_order = 0
+    if tokens and tokens[-1].isdigit():
+        display_order = int(tokens.pop())
+    role = tokens[0].lower() if tokens else ''
+    if role in DIMENSION_ROLES:
+        category = 'dimension'
+    elif role.startswith('beam'):
+        category = 'beam_angle'
+    else:
+        category = 'product'
+    return {'product_id': product_id, 'is_global': False, 'asset_type': 'image',
+            'asset_category': category, 'display_order': display_order}
+
+
+class AssetIngest:
+    """One ingest run; `client` writes visual_assets (the service-role client)"""
+
+    def __init__(self, client, storage: AssetStorage, concurrency: Optional[int] = None,
+                 chunk_files: Optional[int] = None, journal_dir: Optional[str] = None):
+        self.client = client
+        self.storage = storage
+        self.concurrency = concurrency or settings.asset_upload_concurrency
+        self.chunk_files = chunk_files or settings.asset_ingest_chunk_files
+        self.journal_dir = journal_dir or settings.asset_ingest_journal_dir
+        self._lock = threading.Lock()
+        self._failed_hashes = set()
+        self.report: Dict[str, Any] = {
+            'files': 0, 'unique_contents': 0, 'duplicate_files': 0, 'uploaded': 0, 'already_stored': 0,
+            'resumed': 0, 'linked': 0, 'already_linked': 0, 'unmatched': [], 'failed': [],
+        }
+
+    def ingest_zip(self, file) -> Dict[str, Any]:
+        with zipfile.ZipFile(file) as archive:
+            return self.run(zip_entries(archive))
+
+    def ingest_directory(self, root: str) -> Dict[str, Any]:
+        return self.run(directory_entries(root))
+
+    def run(self, entries: List[AssetEntry]) -> Dict[str, Any]:
+        start = time.perf_counter()
+        product_codes = self._load_product_codes()
+
+        matched = []
+        for name, size, opener in sorted(entries, key=lambda entry: entry[0]):
+            if not is_asset_file(name):
+                continue
+            link = classify_asset(name, product_codes)
+            if link is None:
+                self.report['unmatched'].append(name)
+            else:
+                matched.append((name, size, opener, link))
+        self.report['files'] = len(matched)
+
+        journal_path = self._journal_path(matched)
+        stored = self._read_journal(journal_path)
+        self.report['resumed'] = len(stored)
+        print(f"=== ASSET INGEST: {len(matched)} files ({len(stored)} already done), "
+              f"{len(self.report['unmatched'])} unmatched ===")
+
+        pending = [entry for entry in matched if entry[0] not in stored]
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="asset-upload") as pool, \
+                open(journal_path, 'a', encoding='utf-8') as journal:
+            seen_hashes: Dict[str, str] = {}
+            for chunk_start in range(0, len(pending), self.chunk_files):
+                chunk = pending[chunk_start:chunk_start + self.chunk_files]
+                results = list(pool.map(lambda entry: self._store(entry, seen_hashes), chunk))
+                for (name, _, _, _), result in zip(chunk, results):
+                    if result is None:
+                        continue
+                    if result.pop('duplicate') and result['hash'] in self._failed_hashes:
+                        # The copy that was actually uploaded failed, so this file isn't stored either
+                        self.report['duplicate_files'] -= 1
+                        self.report['failed'].append({'file': name, 'reason': 'same content as a failed upload'})
+                        continue
+                    stored[name] = result
+                    journal.write(json.dumps({'name': name, **result}) + '\n')
+                journal.flush()
+
+        self._link(matched, stored)
+        if not self.report['failed']:
+            os.remove(journal_path)
+
+        self.report['unique_contents'] = len({result['hash'] for result in stored.values()})
+        self.report['elapsed_s'] = round(time.perf_counter() - start, 2)
+        print(f"✓ Asset ingest: {self.report['uploaded']} uploaded, {self.report['duplicate_files']} duplicate files, "
+              f"{self.report['linked']} linked, {len(self.report['failed'])} failed in {self.report['elapsed_s']}s")
+        return self.report
+
+    # --- upload ------------------------------------------------------------
+
+    def _store(self, entry, seen_hashes: Dict[str, str]) -> Optional[Dict[str, str]]:
+        name, _, opener, _ = entry
+        content_hash = None
+        try:
+            with opener() as source:
+                data = source.read()
+            content_hash = hashlib.sha256(data).hexdigest()
+            extension = posixpath.splitext(name)[1].lower()
+            path = f"{settings.asset_storage_prefix}/{content_hash[:2]}/{content_hash}{extension}"
+
+            with self._lock:
+                duplicate = content_hash in seen_hashes
+                seen_hashes.setdefault(content_hash, path)
+            if duplicate:
+                with self._lock:
+                    self.report['duplicate_files'] += 1
+                return {'hash': content_hash, 'path': path, 'duplicate': True}
+
+            content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+            uploaded = self.storage.put(path, data, content_type)
+            with self._lock:
+                self.report['uploaded' if uploaded else 'already_stored'] += 1
+            return {'hash': content_hash, 'path': path, 'duplicate': False}
+        except Exception as e:
+            print(f"Asset upload failed for {name}: {str(e)}")
+            with self._lock:
+                self.report['failed'].append({'file': name, 'reason': str(e)})
+                if content_hash is not None:
+                    self._failed_hashes.add(content_hash)
+            return None
+
+    # --- visual_assets -----------------------------------------------------
+
+    def _link(self, matched, stored: Dict[str, Dict[str, str]]):
+        """Insert visual_assets rows for (product, content) pairs that don't have one yet"""
+        wanted: Dict[Tuple[Optional[int], str], Dict[str, Any]] = {}
+        for name, _, _, link in matched:
+            result = stored.get(name)
+            if result is not None:
+                wanted.setdefault((link['product_id'], result['hash']), dict(
+                    link, file_name=posixpath.basename(name), storage_path=result['path'], content_hash=result['hash']))
+
+        hashes = sorted({content_hash for _, content_hash in wanted})
+        existing = set()
+        for chunk_start in range(0, len(hashes), 200):
+            rows = self.client.table('visual_assets').select('product_id, content_hash') \
+                .in_('content_hash', hashes[chunk_start:chunk_start + 200]).execute().data
+            existing.update((row['product_id'], row['content_hash']) for row in rows)
+
+        new_rows = [row for key, row in wanted.items() if key not in existing]
+        self.report['already_linked'] = len(wanted) - len(new_rows)
+        urls: Dict[str, str] = {}
+        for row in new_rows:
+            if row['storage_path'] not in urls:
+                urls[row['storage_path']] = self.storage.url(row['storage_path'])
+            row['file_url'] = urls[row['storage_path']]
+        for chunk_start in range(0, len(new_rows), 500):
+            self.client.table('visual_assets').insert(new_rows[chunk_start:chunk_start + 500]).execute()
+        self.report['linked'] = len(new_rows)
+
+        if any(row['is_global'] for row in new_rows):
+            catalog_cache.clear()
+        else:
+            for product_id in {row['product_id'] for row in new_rows}:
+                catalog_cache.discard(product_details_cache_key(product_id))
+
+    def _load_product_codes(self) -> Dict[str, int]:
+        codes, start, page = {}, 0, 1000
+        while True:
+            rows = self.client.table('products').select('id, base_part_code').order('id').range(start, start + page - 1).execute().data
+            codes.update((row['base_part_code'].lower(), row['id']) for row in rows if row.get('base_part_code'))
+            if len(rows) < page:
+                return codes
+            start += page
+
+    # --- journal -----------------------------------------------------------
+
+    def _journal_path(self, matched) -> str:
+        listing = json.dumps([(name, size) for name, size, _, _ in matched])
+        os.makedirs(self.journal_dir, exist_ok=True)
+        return os.path.join(self.journal_dir, hashlib.sha256(listing.encode('utf-8')).hexdigest()[:24] + '.jsonl')
+
+    def _read_journal(self, path: str) -> Dict[str, Dict[str, str]]:
+        done = {}
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as journal:
+                for line in journal:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # Torn last line from an interrupted run
+                    done[entry['name']] = {'hash': entry['hash'], 'path': entry['path']}
+        return done
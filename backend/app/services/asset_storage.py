@@ -0,0 +1,82 @@
+# backend/app/services/asset_storage.py
+"""Where static assets (product images, diagrams, certification logos) are stored.
+
+Paths are content-addressed by the ingest (see asset_ingest), so `put` never
+overwrites: an object already at the path has the same bytes.
+`get_asset_storage()` picks the backend from `settings.asset_storage_backend`;
+"local" keeps files on disk so ingest runs without a Supabase project.
+"""
+import os
+import tempfile
+from abc import ABC, abstractmethod
+from typing import Optional
+
+from app.core.config import settings
+from app.services.asset_urls import storage_url
+
+
+class AssetStorage(ABC):
+    @abstractmethod
+    def put(self, path: str, data: bytes, content_type: str) -> bool:
+        """Store `data` at `path`; False if an object was already there"""
+
+    @abstractmethod
+    def url(self, path: str) -> str:
+        """URL stored in visual_assets.file_url for the object"""
+
+
+class SupabaseAssetStorage(AssetStorage):
+    def __init__(self, client, bucket: Optional[str] = None):
+        self.client = client
+        self.bucket = bucket or settings.asset_bucket
+
+    def put(self, path: str, data: bytes, content_type: str) -> bool:
+        try:
+            self.client.storage.from_(self.bucket).upload(path, data, {"content-type": content_type, "upsert": "false"})
+            return True
+        except Exception as e:
+            # Storage answers 409 Duplicate when the object exists
+            if '409' in str(e) or 'Duplicate' in str(e) or 'already exists' in str(e):
+                return False
+            raise
+
+    def url(self, path: str) -> str:
+        # The bucket is private: store a reference that never expires and let asset_urls sign it on read
+        return storage_url(self.bucket, path)
+
+
+class LocalFileStorage(AssetStorage):
+    """Files under `root`, served (or not) from `base_url`"""
+
+    def __init__(self, root: str, base_url: str = ''):
+        self.root = root
+        self.base_url = base_url.rstrip('/')
+
+    def put(self, path: str, data: bytes, content_type: str) -> bool:
+        target = os.path.join(self.root, *path.split('/'))
+        if os.path.exists(target):
+            return False
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        # Write then rename so a concurrent or interrupted upload never leaves a partial file at the path
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target), prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                tmp.write(data)
+            os.replace(tmp_path, target)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        return True
+
+    def url(self, path: str) -> str:
+        if self.base_url:
+            return f"{self.base_url}/{path}"
+        return 'file://' + os.path.abspath(os.path.join(self.root, *path.split('/')))
+
+
+def get_asset_storage() -> AssetStorage:
+    if settings.asset_storage_backend == 'local':
+        return LocalFileStorage(settings.asset_local_root, settings.asset_local_base_url)
+    from app.services.supabase_client import supabase_admin
+    return SupabaseAssetStorage(supabase_admin)
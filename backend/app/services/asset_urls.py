@@ -0,0 +1,262 @@
+# backend/app/services/asset_urls.py
+"""Signed URLs for assets in private storage buckets, signed in bulk and cached.
+
+An asset reference is one of:
+- a Supabase storage URL of this project, `<supabase_url>/storage/v1/object/{sign|authenticated}/<bucket>/<path>`
+  (with or without a `?token=`), see `storage_url()`;
+- a bare object path such as "visual-assets/logo.jpg", in `settings.asset_bucket`
+  (only with the "supabase" storage backend).
+Anything else (public-bucket URLs, other hosts, data: URIs) is returned unchanged.
+
+`canonical` maps any form of a reference (signed URL with whatever token,
+bare path) to one stable string, for anything that is hashed into a cache
+key; the configurator echoes signed URLs back, and those change on every
+re-sign.
+
+`resolve_many` turns a batch of references into fetchable URLs with at most
+one `create_signed_urls` call per bucket, so a datasheet or a product-details
+response costs one storage round trip, and none at all when everything is cached:
+
+- a URL whose token still has more than `asset_url_refresh_margin_s` left is
+  used as it is (its expiry is read from the token, no call needed);
+- a cached URL inside the refresh margin is still served, and re-signed in a
+  background thread;
+- a URL with less than `asset_url_min_validity_s` left, or none, is signed
+  before returning (Flying Saucer and browsers fetch the images right away).
+
+If signing fails the reference is returned unchanged (an old token may still
+work, and a render is never failed over an image) and the object isn't tried
+again for `asset_url_retry_s`, so an unreachable storage API doesn't add a
+timeout to every render.
+"""
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import quote, unquote, urlsplit
+
+from jose import jwt
+from jose.exceptions import JOSEError
+
+from app.core.config import settings
+from app.services.metrics import metrics
+
+STORAGE_PREFIX = '/storage/v1/object/'
+SIGNABLE_KINDS = ('sign', 'authenticated')
+
+
+def storage_url(bucket: str, path: str) -> str:
+    """Reference to an object in a private bucket (needs signing before anything can fetch it)"""
+    return f"{settings.supabase_url.rstrip('/')}{STORAGE_PREFIX}authenticated/{bucket}/{quote(path)}"
+
+
+@lru_cache(maxsize=4096)  # The same few references recur on every page
+def parse_reference(url: str) -> Optional[Tuple[str, str]]:
+    """(bucket, object path) of a signable asset reference, None for anything else"""
+    if not url:
+        return None
+    parts = urlsplit(url)
+    if not parts.scheme:
+        if url.startswith('/') or ':' in url or settings.asset_storage_backend != 'supabase':
+            return None
+        return settings.asset_bucket, unquote(url)
+    if parts.scheme not in ('http', 'https') or not parts.path.startswith(STORAGE_PREFIX):
+        return None
+    if settings.supabase_url and parts.netloc != urlsplit(settings.supabase_url).netloc:
+        return None  # Another project's storage; we can't sign for it
+    kind, _, rest = parts.path[len(STORAGE_PREFIX):].partition('/')
+    bucket, _, path = rest.partition('/')
+    if kind not in SIGNABLE_KINDS or not bucket or not path:
+        return None
+    return bucket, unquote(path)
+
+
+def token_expiry(url: str) -> Optional[float]:
+    """Expiry (epoch seconds) of a signed URL's token, read without verifying it"""
+    token = dict(pair.partition('=')[::2] for pair in urlsplit(url).query.split('&')).get('token')
+    if not token:
+        return None
+    try:
+        expires_at = jwt.get_unverified_claims(token).get('exp')
+    except JOSEError:
+        return None
+    return float(expires_at) if isinstance(expires_at, (int, float)) else None
+
+
+class SignedUrlResolver:
+    def __init__(self, client=None):
+        self._client = client
+        self._lock = threading.Lock()
+        self._urls: "OrderedDict[Tuple[str, str], Tuple[str, float]]" = OrderedDict()
+        self._refreshing: set = set()
+        self._failed: Dict[Tuple[str, str], float] = {}  # Key -> time signing may be retried
+
+    @property
+    def client(self):
+        if self._client is None:
+            # The buckets are private: signing needs the service role
+            from app.services.supabase_client import supabase_admin
+            self._client = supabase_admin
+        return self._client
+
+    @client.setter
+    def client(self, client):
+        self._client = client
+        self.clear()
+
+    def canonical(self, url: Optional[str]) -> Optional[str]:
+        """Stable form of an asset reference (see storage_url); a still-valid signed URL is kept for resolving it"""
+        key = parse_reference(url) if url else None
+        if key is None:
+            return url
+        expires_at = token_expiry(url)
+        if expires_at is not None and expires_at - time.time() > settings.asset_url_refresh_margin_s:
+            entry = self._cached(key)
+            if entry is None or entry[1] < expires_at:
+                self._store(key, url, expires_at)
+        return storage_url(*key)
+
+    def resolve(self, url: str) -> str:
+        return self.resolve_many([url]).get(url, url)
+
+    def resolve_many(self, urls: Iterable[Optional[str]]) -> Dict[str, str]:
+        """{reference: fetchable URL} for every non-empty reference, signing what needs it in one call per bucket"""
+        now = time.time()
+        resolved: Dict[str, str] = {}
+        missing: Dict[Tuple[str, str], List[str]] = {}
+        stale: List[Tuple[str, str]] = []
+        for url in urls:
+            if not url or url in resolved:
+                continue
+            key = parse_reference(url)
+            if key is None:
+                resolved[url] = url
+                continue
+            entry = self._cached(key)
+            if entry is None:
+                expires_at = token_expiry(url)
+                if expires_at is not None and expires_at - now > settings.asset_url_refresh_margin_s:
+                    entry = self._store(key, url, expires_at)
+            if entry is not None and entry[1] - now > settings.asset_url_min_validity_s:
+                resolved[url] = entry[0]
+                if entry[1] - now <= settings.asset_url_refresh_margin_s:
+                    stale.append(key)
+                continue
+            if self._failed.get(key, 0.0) > now:
+                resolved[url] = entry[0] if entry is not None else url
+                continue
+            missing.setdefault(key, []).append(url)
+
+        if missing:
+            signed = self._sign(list(missing))
+            for key, references in missing.items():
+                for url in references:
+                    resolved[url] = signed.get(key, url)
+        if stale:
+            self._refresh_in_background(stale)
+        metrics.increment('asset_urls.resolved', len(resolved))
+        return resolved
+
+    def prefetch(self, urls: Iterable[Optional[str]]):
+        """Sign a batch ahead of the renders that will resolve them one page at a time"""
+        self.resolve_many(urls)
+
+    # --- cache --------------------------------------------------------------
+
+    def _cached(self, key: Tuple[str, str]) -> Optional[Tuple[str, float]]:
+        with self._lock:
+            entry = self._urls.get(key)
+            if entry is not None:
+                self._urls.move_to_end(key)
+            return entry
+
+    def _store(self, key: Tuple[str, str], url: str, expires_at: float) -> Tuple[str, float]:
+        with self._lock:
+            self._urls[key] = (url, expires_at)
+            self._urls.move_to_end(key)
+            while len(self._urls) > settings.asset_url_cache_size:
+                self._urls.popitem(last=False)
+        return url, expires_at
+
+    # --- signing ------------------------------------------------------------
+
+    def _sign(self, keys: List[Tuple[str, str]]) -> Dict[Tuple[str, str], str]:
+        """Sign these objects with one create_signed_urls call per bucket; failures are left out"""
+        by_bucket: Dict[str, List[str]] = {}
+        for bucket, path in keys:
+            by_bucket.setdefault(bucket, []).append(path)
+
+        signed = {}
+        now = time.time()
+        retry_at = now + settings.asset_url_retry_s
+        with self._lock:
+            for key in [key for key, until in self._failed.items() if until <= now]:
+                del self._failed[key]  # Past their retry time; these are about to be signed or forgotten
+        for bucket, paths in by_bucket.items():
+            start = time.perf_counter()
+            expiry = settings.asset_url_expiry_s
+            try:
+                items = self.client.storage.from_(bucket).create_signed_urls(paths, expiry)
+            except Exception as e:
+                print(f"Could not sign {len(paths)} asset URLs in {bucket}: {str(e)}")
+                metrics.increment('asset_urls.sign_errors')
+                with self._lock:
+                    self._failed.update(((bucket, path), retry_at) for path in paths)
+                continue
+            metrics.observe('asset_urls.sign', time.perf_counter() - start)
+            metrics.increment('asset_urls.signed', len(paths))
+            expires_at = time.time() + expiry
+            for item in items:
+                signed_url = item.get('signedURL') or item.get('signedUrl')
+                path = item.get('path')
+                if not signed_url or path is None or item.get('error'):
+                    print(f"Could not sign asset {bucket}/{path}: {item.get('error')}")
+                    if path is not None:
+                        with self._lock:
+                            self._failed[(bucket, path)] = retry_at
+                    continue
+                # Rebuilt so the object path is always percent-encoded for Flying Saucer
+                token = urlsplit(signed_url).query
+                url = f"{settings.supabase_url.rstrip('/')}{STORAGE_PREFIX}sign/{bucket}/{quote(path)}?{token}"
+                signed[(bucket, path)] = self._store((bucket, path), url, expires_at)[0]
+                with self._lock:
+                    self._failed.pop((bucket, path), None)
+        return signed
+
+    def _refresh_in_background(self, keys: List[Tuple[str, str]]):
+        with self._lock:
+            keys = [key for key in keys if key not in self._refreshing]
+            self._refreshing.update(keys)
+        if not keys:
+            return
+
+        def refresh():
+            try:
+                self._sign(keys)
+            finally:
+                with self._lock:
+                    self._refreshing.difference_update(keys)
+        threading.Thread(target=refresh, name='asset-url-refresh', daemon=True).start()
+
+    def clear(self):
+        with self._lock:
+            self._urls.clear()
+            self._failed.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.time()
+        with self._lock:
+            expiring = sum(1 for _, expires_at in self._urls.values()
+                           if expires_at - now <= settings.asset_url_refresh_margin_s)
+            return {
+                'cached': len(self._urls),
+                'expiring': expiring,
+                'refreshing': len(self._refreshing),
+                'failed': len(self._failed),
+                'signed': metrics.get_counter('asset_urls.signed'),
+                'sign_errors': metrics.get_counter('asset_urls.sign_errors'),
+            }
+
+
+asset_urls = SignedUrlResolver()
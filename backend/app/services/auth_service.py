@@ -0,0 +1,162 @@
+# backend/app/services/auth_service.py
+"""Local verification of Supabase access tokens.
+
+Tokens are checked here with python-jose instead of a `supabase.auth.get_user`
+round trip per request:
+
+- HS256 tokens (legacy projects) use `supabase_jwt_secret`;
+- RS256/ES256 tokens (asymmetric signing keys) use the project's JWKS,
+  fetched from `supabase_jwks_url` (default: <supabase_url>/auth/v1/.well-known/jwks.json)
+  and kept for `auth_jwks_cache_s`. A token with an unknown `kid` triggers
+  one refetch (at most every `auth_jwks_min_refresh_s`) for key rotation.
+
+Verified claims are cached per token (by SHA-256) until the token expires,
+so a client repeating the same bearer token costs a hash and a dict lookup.
+The cache is an LRU bounded by `auth_claims_cache_size`; expired entries are
+dropped when looked up or when they reach the old end of the LRU.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+from jose import JWTError, jwk, jwt
+from jose.exceptions import JOSEError
+
+from app.core.config import settings
+from app.services.metrics import metrics
+
+ASYMMETRIC_ALGORITHMS = ('RS256', 'ES256')
+
+
+class AuthError(Exception):
+    pass
+
+
+class TokenVerifier:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._claims: "OrderedDict[str, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self._keys: Dict[str, Any] = {}
+        self._keys_fetched_at = 0.0
+        self._refresh_lock = threading.Lock()
+
+    def cached(self, token: str) -> Optional[Dict[str, Any]]:
+        """Claims of a token verified earlier and not yet expired (no signature work)"""
+        digest = hashlib.sha256(token.encode('utf-8')).hexdigest()
+        with self._lock:
+            entry = self._claims.get(digest)
+            if entry is None:
+                return None
+            claims, expires_at = entry
+            if expires_at <= time.time():
+                del self._claims[digest]
+                return None
+            self._claims.move_to_end(digest)
+        metrics.increment('auth.claims_cache_hits')
+        return claims
+
+    def verify(self, token: str) -> Dict[str, Any]:
+        """Claims of a valid access token; raises AuthError otherwise"""
+        claims = self.cached(token)
+        if claims is not None:
+            return claims
+
+        start = time.perf_counter()
+        try:
+            header = jwt.get_unverified_header(token)
+        except JWTError:
+            raise AuthError("Malformed token")
+        algorithm = header.get('alg')
+        if algorithm == 'HS256':
+            if not settings.supabase_jwt_secret:
+                raise AuthError("HS256 tokens are not accepted (no JWT secret configured)")
+            key = settings.supabase_jwt_secret
+        elif algorithm in ASYMMETRIC_ALGORITHMS:
+            key = self._signing_key(header.get('kid'), algorithm)
+        else:
+            raise AuthError(f"Unsupported token algorithm: {algorithm}")
+
+        try:
+            claims = jwt.decode(
+                token, key, algorithms=[algorithm], audience=settings.auth_jwt_audience or None,
+                options={'verify_aud': bool(settings.auth_jwt_audience), 'leeway': settings.auth_leeway_s},
+            )
+        except JWTError as e:
+            metrics.increment('auth.rejected')
+            raise AuthError(str(e))
+        # The service-role key is a JWT without a subject; every other token must name its user
+        if 'exp' not in claims or not (claims.get('sub') or claims.get('role') == 'service_role'):
+            raise AuthError("Token has no expiry or subject")
+        metrics.observe('auth.verify', time.perf_counter() - start)
+
+        digest = hashlib.sha256(token.encode('utf-8')).hexdigest()
+        with self._lock:
+            self._claims[digest] = (claims, float(claims['exp']))
+            while len(self._claims) > settings.auth_claims_cache_size:
+                self._claims.popitem(last=False)
+        return claims
+
+    def clear(self):
+        with self._lock:
+            self._claims.clear()
+            self._keys.clear()
+            self._keys_fetched_at = 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'cached_tokens': len(self._claims), 'signing_keys': len(self._keys),
+                    'jwks_age_s': round(time.time() - self._keys_fetched_at, 1) if self._keys_fetched_at else None}
+
+    # --- JWKS ---------------------------------------------------------------
+
+    def _signing_key(self, kid: Optional[str], algorithm: str):
+        if self._keys_stale(kid):
+            with self._refresh_lock:
+                if self._keys_stale(kid):  # Concurrent requests share one fetch
+                    self._refresh_keys()
+        key = self._keys.get(kid)
+        if key is None:
+            raise AuthError("Unknown signing key")
+        if key[0] != algorithm:
+            raise AuthError("Token algorithm does not match its signing key")
+        return key[1]
+
+    def _keys_stale(self, kid: Optional[str]) -> bool:
+        age = time.time() - self._keys_fetched_at
+        return age > settings.auth_jwks_cache_s or (kid not in self._keys and age > settings.auth_jwks_min_refresh_s)
+
+    def _refresh_keys(self):
+        url = settings.supabase_jwks_url or f"{settings.supabase_url.rstrip('/')}/auth/v1/.well-known/jwks.json"
+        start = time.perf_counter()
+        try:
+            response = httpx.get(url, headers={'apikey': settings.supabase_anon_key}, timeout=5.0)
+            response.raise_for_status()
+            jwks = response.json().get('keys', [])
+        except (httpx.HTTPError, ValueError) as e:
+            print(f"Could not fetch JWKS from {url}: {str(e)}")
+            with self._lock:
+                self._keys_fetched_at = time.time()  # Keep the old keys; retry after the refresh interval
+            if not self._keys:
+                raise AuthError("Signing keys unavailable")
+            return
+
+        keys = {}
+        for key_data in jwks:
+            algorithm = key_data.get('alg') or ('ES256' if key_data.get('kty') == 'EC' else 'RS256')
+            if algorithm not in ASYMMETRIC_ALGORITHMS:
+                continue
+            try:
+                keys[key_data.get('kid')] = (algorithm, jwk.construct(key_data, algorithm))
+            except JOSEError as e:
+                print(f"Skipping unusable JWKS key {key_data.get('kid')}: {str(e)}")
+        with self._lock:
+            self._keys = keys
+            self._keys_fetched_at = time.time()
+        metrics.observe('auth.jwks_fetch', time.perf_counter() - start)
+        print(f"✓ Loaded {len(keys)} signing keys from JWKS")
+
+
+token_verifier = TokenVerifier()
@@ -0,0 +1,157 @@
+# backend/app/services/cache_warmer.py
+"""Fill the catalog and PDF caches for every product's default configuration.
+
+Walks active categories -> active products -> product details (catalog cache)
+-> default datasheet (first variant, `is_default` options; PDF cache), so the
+first visitors after a deploy don't pay cold-start cost. Products are fetched
+at most `cache_warm_products_per_second` and processed by
+`cache_warm_concurrency` workers; progress is kept in `state` for the status
+endpoint.
+"""
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.services.catalog_service import build_default_datasheet_request, get_product_details_cached
+from app.services.metrics import metrics
+from app.services.pdf_generator import DatasheetGenerator
+from app.services.pdf_optimizer import optimize_pdf
+from app.services.render_cache import configuration_key, pdf_cache, pdf_cache_key
+from app.services.single_flight import pdf_flights
+
+
+class RateLimiter:
+    """Spaces out acquisitions to at most `rate` per second"""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            now = time.monotonic()
+            wait = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class CacheWarmer:
+    def __init__(self, client=None, generator: Optional[DatasheetGenerator] = None):
+        self._client = client
+        self.generator = generator or DatasheetGenerator()
+        self.state: Dict[str, Any] = {'status': 'idle'}
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            from app.services.supabase_client import supabase
+            self._client = supabase
+        return self._client
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self, client=None) -> bool:
+        """Start a warming run in the background; False if one is already running"""
+        if self.running:
+            return False
+        self._task = asyncio.ensure_future(self.run(client))
+        return True
+
+    async def run_forever(self, interval_s: int, client=None):
+        """Warm now and then every `interval_s` seconds"""
+        while True:
+            self.start(client)
+            await asyncio.shield(self._task)
+            await asyncio.sleep(interval_s)
+
+    async def run(self, client=None) -> Dict[str, Any]:
+        client = client or self.client
+        start = time.perf_counter()
+        self.state = {
+            'status': 'listing',
+            'started_at': datetime.now(timezone.utc).isoformat(),
+            'finished_at': None,
+            'total': 0, 'done': 0, 'failed': 0,
+            'pdfs_rendered': 0, 'pdfs_already_cached': 0, 'skipped': 0,
+            'errors': [],
+        }
+        try:
+            products = await run_in_threadpool(self._list_products, client)
+            self.state.update(status='warming', total=len(products))
+            print(f"=== CACHE WARMING: {len(products)} products ===")
+
+            limiter = RateLimiter(settings.cache_warm_products_per_second)
+            semaphore = asyncio.Semaphore(max(1, settings.cache_warm_concurrency))
+
+            async def warm(product):
+                async with semaphore:
+                    await limiter.acquire()
+                    try:
+                        await run_in_threadpool(self._warm_product, client, product['id'])
+                    except Exception as e:
+                        self.state['failed'] += 1
+                        if len(self.state['errors']) < 20:
+                            self.state['errors'].append(f"product {product['id']}: {str(e)}")
+                        metrics.increment('cache_warm.failed')
+                    finally:
+                        self.state['done'] += 1
+
+            await asyncio.gather(*(warm(product) for product in products))
+            self.state['status'] = 'finished'
+        except Exception as e:
+            print(f"Cache warming failed: {str(e)}")
+            self.state['status'] = 'failed'
+            self.state['errors'].append(str(e))
+        finally:
+            elapsed = time.perf_counter() - start
+            self.state['finished_at'] = datetime.now(timezone.utc).isoformat()
+            self.state['elapsed_s'] = round(elapsed, 2)
+            metrics.observe('cache_warm.run', elapsed)
+            print(f"✓ Cache warming {self.state['status']}: {self.state['done']}/{self.state['total']} products, "
+                  f"{self.state['pdfs_rendered']} PDFs rendered, {self.state['failed']} failed in {elapsed:.1f}s")
+        return self.state
+
+    def _list_products(self, client):
+        categories = client.table('categories').select('id').eq('is_active', True).order('display_order').execute().data
+        products = []
+        for category in categories:
+            rows = client.table('products').select('id, name').eq('category_id', category['id']).eq('is_active', True).execute().data
+            products.extend(rows)
+        return products
+
+    def _warm_product(self, client, product_id: int):
+        details = get_product_details_cached(client, product_id)
+        # No category: downloads never send one, and the key has to match theirs
+        request = build_default_datasheet_request(details) if details else None
+        if request is None or not settings.cache_warm_render_pdfs:
+            self.state['skipped'] += 1
+            return
+
+        optimize_level = settings.pdf_optimize_level
+        cache_key = pdf_cache_key(configuration_key(self.generator._extract_datasheet_fields(request)), optimize_level)
+        if pdf_cache.peek(cache_key) is not None or pdf_flights.in_flight(cache_key) is not None:
+            self.state['pdfs_already_cached'] += 1
+            return
+
+        # Every worker warms on startup; the lock leaves each PDF to one of them
+        with pdf_cache.compute_lock(cache_key):
+            if pdf_cache.peek(cache_key) is not None:
+                self.state['pdfs_already_cached'] += 1
+                return
+            pdf_data = self.generator.render_html(self.generator._create_phos_style_html(request), low_priority=True)
+            pdf_data, _ = optimize_pdf(pdf_data, optimize_level)
+            pdf_cache.put(cache_key, pdf_data)
+        self.state['pdfs_rendered'] += 1
+        metrics.increment('cache_warm.pdfs_rendered')
+
+
+cache_warmer = CacheWarmer()
@@ -0,0 +1,204 @@
+# backend/app/services/catalog_pdf.py
+"""Category catalog: every product's datasheet in one PDF with a table of contents.
+
+Products are rendered by Flying Saucer in chunks of `catalog_chunk_size`
+pages. Within a chunk the renderer already writes each font and each image
+URL once; once all chunks are merged the document is de-duplicated with pypdf
+(a single pass, so the build stays linear in the number of chunks) and the
+logo, footer logo and certification images end up as a single object
+referenced from every page. Only one chunk's product data and HTML are held
+at a time, and the finished PDF is spooled to disk above
+`catalog_spool_max_bytes`.
+
+The merged pages themselves live in pypdf's writer until the end, so memory
+grows with the number of products. Catalogs are therefore capped at
+`catalog_max_products`; larger categories are refused with CatalogTooLarge
+before anything is rendered.
+"""
+import html
+import math
+import tempfile
+import time
+from io import BytesIO
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from pypdf import PdfReader, PdfWriter
+
+from app.core.config import settings
+from app.services.asset_urls import asset_urls
+from app.services.pdf_generator import DatasheetGenerator, LOGO_URL, FULL_LOGO_URL
+from app.services.pdf_optimizer import optimize_writer
+
+TOC_ENTRIES_PER_PAGE = 28
+
+TOC_CSS = '''
+            .toc-table {
+                width: 100%;
+                table-layout: fixed;
+                border-collapse: collapse;
+                margin-top: 10pt;
+                font-size: 10pt;
+            }
+
+            /* One line per row, so TOC_ENTRIES_PER_PAGE rows always fit a page; long names are clipped */
+            .toc-table td {
+                padding: 3pt 2pt;
+                border-bottom: 0.5pt dotted #999;
+                height: 12pt;
+                white-space: nowrap;
+                overflow: hidden;
+            }
+
+            .toc-name {
+                font-weight: bold;
+                color: #333;
+                padding-right: 8pt;
+            }
+
+            .toc-code {
+                font-family: 'Courier New', monospace;
+                color: #555;
+                width: 150pt;
+            }
+
+            .toc-page {
+                text-align: right;
+                width: 30pt;
+            }
+'''
+
+
+class CatalogTooLarge(Exception):
+    pass
+
+
+class CatalogPdfBuilder:
+    """Renders a category's products into one multi-page PDF"""
+
+    def __init__(self, generator: Optional[DatasheetGenerator] = None, chunk_size: Optional[int] = None):
+        self.generator = generator or DatasheetGenerator()
+        self.chunk_size = max(1, chunk_size or settings.catalog_chunk_size)
+
+    def build(self, category_name: str, product_rows: List[Dict[str, Any]],
+              load_request: Callable[[Dict[str, Any]], Optional[Dict[str, Any]]]):
+        """Render the catalog and return it as a rewound SpooledTemporaryFile.
+
+        `product_rows` only needs enough to count and order the products;
+        `load_request` turns one row into a datasheet payload (or None to skip
+        it) and is called lazily, one chunk at a time.
+        """
+        if len(product_rows) > settings.catalog_max_products:
+            raise CatalogTooLarge(f"{len(product_rows)} products; catalogs are limited to {settings.catalog_max_products}")
+        start = time.perf_counter()
+        toc_pages = max(1, math.ceil(len(product_rows) / TOC_ENTRIES_PER_PAGE))
+        writer = PdfWriter()
+        entries: List[Tuple[str, str, int]] = []  # (product name, part code, page index)
+        next_page = toc_pages
+
+        for offset in range(0, len(product_rows), self.chunk_size):
+            requests = []
+            for row in product_rows[offset:offset + self.chunk_size]:
+                request = load_request(row)
+                if request is None:
+                    print(f"Skipping product {row.get('id')} - no datasheet data")
+                    continue
+                requests.append(request)
+            if not requests:
+                continue
+
+            pdf_data, start_pages = self._render_chunk(requests, next_page)
+            writer.append(PdfReader(BytesIO(pdf_data)), import_outline=False)
+            del pdf_data
+
+            for request, page in zip(requests, start_pages):
+                entries.append((request['product_name'], request.get('final_part_code') or request['base_part_code'], next_page + page))
+            next_page = len(writer.pages) + toc_pages
+            print(f"✓ Catalog chunk {offset // self.chunk_size + 1}: {len(requests)} products, {next_page - toc_pages} pages so far")
+
+        toc_reader = PdfReader(BytesIO(self.generator.render_html(self._toc_html(category_name, entries, toc_pages))))
+        if len(toc_reader.pages) != toc_pages:
+            # Every page number printed in the TOC and the footers assumed toc_pages
+            raise Exception(f"Table of contents rendered {len(toc_reader.pages)} pages, expected {toc_pages}")
+        writer.merge(0, toc_reader, import_outline=False)
+
+        for name, part_code, page in entries:
+            writer.add_outline_item(f"{name} ({part_code})", page)
+        steps = optimize_writer(writer, min(settings.pdf_optimize_level, 2))
+        if not steps:
+            # Chunks repeat the same logos and certification images; fold them into one object
+            writer.compress_identical_objects(remove_identicals=True, remove_orphans=True)
+
+        output = tempfile.SpooledTemporaryFile(max_size=settings.catalog_spool_max_bytes)
+        writer.write(output)
+        size = output.tell()
+        output.seek(0)
+        print(f"✅ Catalog '{category_name}': {len(entries)} products, {len(writer.pages)} pages, "
+              f"{size} bytes in {time.perf_counter() - start:.1f}s")
+        return output
+
+    def _render_chunk(self, requests: List[Dict[str, Any]], first_page: int) -> Tuple[bytes, List[int]]:
+        """Render one chunk; returns the PDF and each product's first page within it.
+
+        Page numbers in the footers are assigned assuming one page per product.
+        If a datasheet overflows onto a second page the chunk is rendered once
+        more with the real numbers (they don't affect layout).
+        """
+        fields = [self.generator._extract_datasheet_fields(request) for request in requests]
+        # One signing call for the whole chunk; each page then resolves from the cache
+        asset_urls.prefetch(url for item in fields for url in self.generator.asset_references(item))
+        start_pages = list(range(len(requests)))
+        for attempt in range(2):
+            for item, page in zip(fields, start_pages):
+                item['page_number'] = first_page + page + 1
+
+            pages = [f'<div id="catalog-item-{i}">{self.generator._render_phos_page(item)}</div>' for i, item in enumerate(fields)]
+            bookmarks = ''.join(f'<bookmark name="{html.escape(item["product_name"], quote=True)}" href="#catalog-item-{i}"/>'
+                                for i, item in enumerate(fields))
+            pdf_data = self.generator.render_html(self.generator._phos_document(pages, bookmarks=f'<bookmarks>{bookmarks}</bookmarks>'))
+
+            actual = self._outline_start_pages(pdf_data, len(requests))
+            if actual is None or actual == start_pages:
+                return pdf_data, start_pages
+            print(f"Datasheet overflowed onto extra pages - re-rendering chunk with corrected page numbers")
+            start_pages = actual
+        return pdf_data, start_pages
+
+    def _outline_start_pages(self, pdf_data: bytes, count: int) -> Optional[List[int]]:
+        """First page index of every product, read back from the bookmarks Flying Saucer wrote"""
+        reader = PdfReader(BytesIO(pdf_data))
+        try:
+            pages = [reader.get_destination_page_number(item) for item in reader.outline if not isinstance(item, list)]
+        except Exception as e:
+            print(f"Could not read catalog bookmarks: {e}")
+            return None
+        if len(pages) != count:
+            return None
+        return pages
+
+    def _toc_html(self, category_name: str, entries: List[Tuple[str, str, int]], toc_pages: int) -> str:
+        """Table of contents pages; page numbers are 1-based catalog page numbers"""
+        signed = asset_urls.resolve_many([LOGO_URL, FULL_LOGO_URL])
+        pages = []
+        for index in range(toc_pages):
+            rows = ''.join(f'''
+                <tr>
+                    <td class="toc-name">{html.escape(name)}</td>
+                    <td class="toc-code">{html.escape(part_code)}</td>
+                    <td class="toc-page">{page + 1}</td>
+                </tr>''' for name, part_code, page in entries[index * TOC_ENTRIES_PER_PAGE:(index + 1) * TOC_ENTRIES_PER_PAGE])
+            fields = {
+                'logo_url': signed.get(LOGO_URL, LOGO_URL),
+                'full_logo_url': signed.get(FULL_LOGO_URL, FULL_LOGO_URL),
+                'product_category': category_name,
+                'page_number': index + 1,
+            }
+            pages.append(f'''
+        <div class="page-content">
+            {self.generator._render_header(fields)}
+            <div class="product-title">{html.escape(category_name.upper())} CATALOG</div>
+            <table class="toc-table">{rows}
+            </table>
+        </div>
+
+        {self.generator._render_footer(fields)}''')
+        return self.generator._phos_document(pages, extra_css=TOC_CSS)
@@ -0,0 +1,267 @@
+# backend/app/services/catalog_search.py
+"""In-memory inverted index over the product catalog.
+
+Each active product is one document built from these fields. The weight of
+a field is how strongly a match on it ranks the product:
+
+    part code         4.0   base_part_code, indexed as the whole code and from each segment on
+    name              3.0
+    category          2.0
+    variants          1.5   variant name, part-code suffix, power ("9w"), output ("950lm")
+    options           1.0   option labels/values ("IP65", "2700K Warm White", "DALI")
+    features          0.5   feature values ("Die Cast Aluminium")
+    description       0.5
+
+Text is lower-cased and split on anything that isn't a letter or digit. A
+number followed by a unit is joined first, so "2700 K" and "2700K" both
+become "2700k" and "9 W" becomes "9w".
+
+A query matches each of its tokens exactly or as a prefix; the last token
+counts as still being typed, so its prefix matches score almost as much as
+exact ones. A product's score sums, over the query tokens, the best
+idf × field weight it reaches. Results rank by how many query tokens they
+match, then by score, so "2700K 9W downlight IP65" puts downlights that have
+all four first and still lists near misses.
+
+Part-code queries ("DO-001", "LY-DO-0") also go through a separate sorted
+list of compacted codes (letters and digits only) that is searched by
+prefix. A code longer than a product's base code still finds the product
+when it starts with that base code.
+
+Products changed by the Excel import (in any worker, through
+`catalog_invalidations`) are marked stale and re-indexed on the next query,
+one bulk load for all of them (as in config_matrix).
+"""
+import bisect
+import math
+import re
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from app.services.catalog_service import catalog_invalidations, select_in
+from app.services.metrics import metrics
+
+FIELD_WEIGHTS = {
+    'part_code': 4.0, 'name': 3.0, 'category': 2.0, 'variant': 1.5,
+    'option': 1.0, 'feature': 0.5, 'description': 0.5,
+}
+PREFIX_FACTOR = 0.5       # A prefix match on a completed token
+LAST_PREFIX_FACTOR = 0.9  # A prefix match on the token being typed
+MAX_EXPANSIONS = 64       # Terms one query token may expand to
+MIN_PREFIX_LENGTH = 2
+
+UNIT_JOIN = re.compile(r'(\d)\s+(k|w|lm|v|ma|mm|°)(?![a-z0-9])')
+TOKEN_SPLIT = re.compile(r'[^a-z0-9]+')
+CODE_SEGMENT = re.compile(r'[a-z0-9]+')
+
+
+def tokenize(text: Any) -> List[str]:
+    if text is None:
+        return []
+    text = UNIT_JOIN.sub(r'\1\2', str(text).lower())
+    return [token for token in TOKEN_SPLIT.split(text) if token]
+
+
+def compact_code(text: str) -> str:
+    return ''.join(CODE_SEGMENT.findall(text.lower()))
+
+
+class CatalogSearchIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._postings: Dict[str, Dict[int, float]] = {}
+        self._terms: List[str] = []
+        self._doc_terms: Dict[int, Set[str]] = {}
+        self._docs: Dict[int, Dict[str, Any]] = {}
+        self._codes: List[Tuple[str, int]] = []  # (compacted code or code tail, product id), sorted
+        self._base_codes: Dict[str, List[int]] = {}  # Compacted base code -> product ids
+        self._stale: Set[int] = set()
+        self._loaded_all = False
+
+    # --- building -----------------------------------------------------------
+
+    def load(self, client, product_ids: Optional[List[int]] = None) -> int:
+        """(Re)index the given products (default: every active one) with bulk queries; returns products indexed"""
+        with metrics.timer('catalog_search.load'):
+            query = client.table('products').select('id, name, base_part_code, description, category_id').eq('is_active', True)
+            products = (query.in_('id', product_ids) if product_ids is not None else query).execute().data
+            ids = [product['id'] for product in products]
+            categories = {row['id']: row['name'] for row in client.table('categories').select('id, name').execute().data}
+            variants = select_in(client, 'product_variants', 'product_id, variant_name, part_code_suffix, system_power, system_output',
+                                  'product_id', ids, active_only=True)
+            config_categories = select_in(client, 'configuration_categories', 'id, product_id', 'product_id', ids)
+            options = select_in(client, 'configuration_options', 'category_id, option_label, option_value',
+                                 'category_id', [row['id'] for row in config_categories])
+            features = select_in(client, 'product_features', 'product_id, feature_value', 'product_id', ids)
+
+            fields: Dict[int, Dict[str, List[Any]]] = {product_id: defaultdict(list) for product_id in ids}
+            for variant in variants:
+                power, output = variant.get('system_power'), variant.get('system_output')
+                fields[variant['product_id']]['variant'] += [
+                    variant.get('variant_name'), variant.get('part_code_suffix'),
+                    f"{power:g}w" if isinstance(power, (int, float)) else power,
+                    f"{output:g}lm" if isinstance(output, (int, float)) else output,
+                ]
+            product_of_category = {row['id']: row['product_id'] for row in config_categories}
+            for option in options:
+                fields[product_of_category[option['category_id']]]['option'] += [option.get('option_label'), option.get('option_value')]
+            for feature in features:
+                fields[feature['product_id']]['feature'].append(feature.get('feature_value'))
+
+            with self._lock:
+                for product_id in (list(self._docs) if product_ids is None else product_ids):
+                    self._remove(product_id)
+                for product in products:
+                    doc_fields = fields[product['id']]
+                    doc_fields['name'].append(product.get('name'))
+                    doc_fields['category'].append(categories.get(product.get('category_id')))
+                    doc_fields['description'].append(product.get('description'))
+                    self._add(product, doc_fields)
+                self._terms = sorted(self._postings)
+                self._codes = sorted((code, product_id) for product_id, doc in self._docs.items() for code in doc['codes'])
+                self._base_codes = defaultdict(list)
+                for product_id, doc in self._docs.items():
+                    if doc['codes']:
+                        self._base_codes[doc['codes'][0]].append(product_id)
+                self._stale.difference_update(ids if product_ids is None else product_ids)
+                if product_ids is None:
+                    self._loaded_all = True
+        print(f"✓ Catalog search index: {len(products)} products indexed, {len(self._terms)} terms")
+        return len(products)
+
+    def invalidate(self, product_ids: Optional[Iterable[int]]):
+        """Re-index these products (None: all of them) on the next query"""
+        with self._lock:
+            if product_ids is None:
+                self._loaded_all = False
+            else:
+                self._stale.update(product_ids)
+
+    def _add(self, product: Dict[str, Any], fields: Dict[str, List[Any]]):
+        product_id = product['id']
+        weights: Dict[str, float] = {}
+        for field, values in fields.items():
+            for value in values:
+                for token in tokenize(value):
+                    weights[token] = max(weights.get(token, 0.0), FIELD_WEIGHTS[field])
+        base_code = product.get('base_part_code') or ''
+        segments = CODE_SEGMENT.findall(base_code.lower())
+        codes = [''.join(segments[i:]) for i in range(len(segments))]
+        for token in segments + codes[:1]:
+            weights[token] = max(weights.get(token, 0.0), FIELD_WEIGHTS['part_code'])
+        for token, weight in weights.items():
+            self._postings.setdefault(token, {})[product_id] = weight
+        self._doc_terms[product_id] = set(weights)
+        self._docs[product_id] = {
+            'id': product_id, 'name': product.get('name'), 'base_part_code': base_code,
+            'category_id': product.get('category_id'), 'codes': codes,
+        }
+
+    def _remove(self, product_id: int):
+        for token in self._doc_terms.pop(product_id, ()):
+            postings = self._postings.get(token)
+            if postings is not None:
+                postings.pop(product_id, None)
+                if not postings:
+                    del self._postings[token]
+        self._docs.pop(product_id, None)
+
+    def _ensure_loaded(self, client):
+        catalog_invalidations.poll()
+        if not self._loaded_all:
+            self.load(client)
+        elif self._stale:
+            self.load(client, sorted(self._stale))
+
+    # --- queries ------------------------------------------------------------
+
+    def search(self, client, text: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """Products ranked by query-token coverage, then score"""
+        self._ensure_loaded(client)
+        start = time.perf_counter()
+        tokens = tokenize(text)
+        with self._lock:
+            total = max(1, len(self._docs))
+            scores: Dict[int, float] = defaultdict(float)
+            matched: Dict[int, int] = defaultdict(int)
+            for position, token in enumerate(tokens):
+                factor = LAST_PREFIX_FACTOR if position == len(tokens) - 1 else PREFIX_FACTOR
+                best: Dict[int, float] = {}
+                for term, term_factor in self._expand(token, factor):
+                    postings = self._postings[term]
+                    idf = math.log(1 + total / len(postings))
+                    for product_id, weight in postings.items():
+                        score = term_factor * idf * weight
+                        if score > best.get(product_id, 0.0):
+                            best[product_id] = score
+                for product_id, score in best.items():
+                    scores[product_id] += score
+                    matched[product_id] += 1
+            for product_id in self._code_matches(text):
+                # Counts as matching every token: the whole query was a part code
+                scores[product_id] += FIELD_WEIGHTS['part_code'] * math.log(1 + total)
+                matched[product_id] = max(matched[product_id], len(tokens))
+
+            ranked = sorted(scores, key=lambda product_id: (-matched[product_id], -scores[product_id], self._docs[product_id]['name'] or ''))
+            results = [{
+                'id': product_id,
+                'name': self._docs[product_id]['name'],
+                'base_part_code': self._docs[product_id]['base_part_code'],
+                'category_id': self._docs[product_id]['category_id'],
+                'score': round(scores[product_id], 3),
+                'matched_terms': matched[product_id],
+                'query_terms': len(tokens),
+            } for product_id in ranked[:limit]]
+        metrics.observe('catalog_search.query', time.perf_counter() - start)
+        return results
+
+    def suggest(self, client, text: str, limit: int = 8) -> Dict[str, Any]:
+        """Autocomplete: index terms completing the last token (most common first) and the top products"""
+        self._ensure_loaded(client)
+        tokens = tokenize(text)
+        completions = []
+        if tokens:
+            with self._lock:
+                candidates = [term for term, _ in self._expand(tokens[-1], 1.0)]
+            candidates.sort(key=lambda term: (-len(self._postings.get(term, ())), term))
+            completions = candidates[:limit]
+        return {'completions': completions, 'products': self.search(client, text, limit) if tokens else []}
+
+    def _expand(self, token: str, prefix_factor: float) -> List[Tuple[str, float]]:
+        """Index terms a query token matches, with the factor each match is worth"""
+        expansions = [(token, 1.0)] if token in self._postings else []
+        if len(token) >= MIN_PREFIX_LENGTH:
+            position = bisect.bisect_right(self._terms, token)
+            while position < len(self._terms) and len(expansions) < MAX_EXPANSIONS and self._terms[position].startswith(token):
+                expansions.append((self._terms[position], prefix_factor))
+                position += 1
+        return expansions
+
+    def _code_matches(self, text: str) -> Set[int]:
+        code = compact_code(text)
+        if len(code) < 3 or not any(ch.isdigit() for ch in code):
+            return set()
+        found = set()
+        position = bisect.bisect_left(self._codes, (code, -1))
+        while position < len(self._codes) and self._codes[position][0].startswith(code) and len(found) < MAX_EXPANSIONS:
+            found.add(self._codes[position][1])
+            position += 1
+        # A configured part code: longer than a base code and starting with it
+        for length in range(3, len(code)):
+            found.update(self._base_codes.get(code[:length], ()))
+        return found
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'products': len(self._docs),
+                'terms': len(self._terms),
+                'postings': sum(len(postings) for postings in self._postings.values()),
+                'stale': len(self._stale),
+            }
+
+
+catalog_search = CatalogSearchIndex()
+catalog_invalidations.subscribe(catalog_search.invalidate)
@@ -0,0 +1,275 @@
+# backend/app/services/catalog_service.py
+"""Catalog reads shared by the product routes and the catalog PDF builder.
+
+Functions take the Supabase client as their first argument so routes keep
+passing their module-level `supabase` (which the benchmarks swap for a fake).
+"""
+import json
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+from app.services.asset_urls import asset_urls
+from app.services.render_cache import catalog_cache
+from app.services.shared_cache import InvalidationFeed
+
+# Products changed by an import; the configuration matrix, search and facet indexes subscribe and poll it
+catalog_invalidations = InvalidationFeed('catalog-invalidations')
+
+
+def organize_visual_assets(assets: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Group visual_assets rows the way the configurator and datasheet expect"""
+    visual_assets = {
+        'certifications': [],
+        'product_images': [],
+        'dimension_images': [],
+        'all_assets': assets
+    }
+
+    for asset in assets:
+        if asset['asset_type'] == 'certification':
+            visual_assets['certifications'].append(asset)
+        elif 'product' in asset.get('asset_category', '').lower():
+            visual_assets['product_images'].append(asset)
+        elif 'dimension' in asset.get('asset_category', '').lower():
+            visual_assets['dimension_images'].append(asset)
+    return visual_assets
+
+
+def fetch_visual_assets(client, product_id: int) -> Dict[str, Any]:
+    """Product-specific AND global visual assets, organized by type"""
+    assets_result = client.table('visual_assets').select('*').or_(f'product_id.eq.{product_id},is_global.eq.true').order('display_order').execute()
+    return organize_visual_assets(assets_result.data)
+
+
+def fetch_product_details(client, product_id: int) -> Optional[Dict[str, Any]]:
+    """Product, variants, options, accessories, features and visual assets; None if the product doesn't exist"""
+    # Get product basic info
+    product_result = client.table('products').select('id, category_id, name, base_part_code, description, product_image_url, dimension_image_url, d1_mm, h_mm, d2_mm, cutout_mm, is_active, created_at').eq('id', product_id).execute()
+    if not product_result.data:
+        return None
+
+    product = product_result.data[0]
+
+    print(f"=== BACKEND PRODUCT DEBUG ===")
+    print(f"Product keys from database: {list(product.keys())}")
+    print(f"D1 from DB: {product.get('d1_mm', 'NOT_FOUND')}")
+    print(f"H from DB: {product.get('h_mm', 'NOT_FOUND')}")
+    print(f"D2 from DB: {product.get('d2_mm', 'NOT_FOUND')}")
+    print(f"Cutout from DB: {product.get('cutout_mm', 'NOT_FOUND')}")
+
+    # Get product variants
+    variants_result = client.table('product_variants').select('*').eq('product_id', product_id).eq('is_active', True).order('display_order').execute()
+
+    # Get configuration categories with options
+    config_cats_result = client.table('configuration_categories').select('*').eq('product_id', product_id).order('display_order').execute()
+
+    configuration_categories = []
+    for cat in config_cats_result.data:
+        # Get options for this category - make sure to include option_image_url
+        options_result = client.table('configuration_options').select('id, category_id, option_value, option_label, part_code_suffix, price_modifier, is_default, display_order, option_image_url').eq('category_id', cat['id']).order('display_order').execute()
+        cat['options'] = options_result.data if options_result.data else []
+        configuration_categories.append(cat)
+
+    # SAFE: Get ALL accessories columns to see what exists
+    try:
+        accessories = client.table('accessories').select('*').eq('product_id', product_id).execute().data
+
+        # Add missing fields for compatibility with frontend/PDF
+        for accessory in accessories:
+            if 'image_url' not in accessory:
+                accessory['image_url'] = None
+            if 'price' not in accessory:
+                accessory['price'] = 0.0
+            if 'is_active' not in accessory:
+                accessory['is_active'] = True
+            if 'display_order' not in accessory:
+                accessory['display_order'] = 0
+            if 'accessory_category' not in accessory:
+                accessory['accessory_category'] = 'General'
+
+        # Filter active accessories if the field exists
+        if accessories and 'is_active' in accessories[0]:
+            accessories = [acc for acc in accessories if acc.get('is_active', True)]
+
+    except Exception as e:
+        print(f"Error getting accessories: {e}")
+        accessories = []
+
+    # Get product features INCLUDING configurable color features
+    try:
+        features = client.table('product_features').select('*').eq('product_id', product_id).order('display_order').execute().data
+    except Exception as e:
+        print(f"Error getting features: {e}")
+        features = []
+
+    # Extract configurable color features
+    configurable_features = {
+        'housing_color': {'configurable': False, 'default_value': 'N/A'},
+        'reflector_color': {'configurable': False, 'default_value': 'N/A'},
+        'finish': {'configurable': False, 'default_value': 'N/A'}
+    }
+
+    for feature in features:
+        if feature['feature_type'] in configurable_features:
+            configurable_features[feature['feature_type']] = {
+                'configurable': feature.get('is_configurable', False),
+                'default_value': feature.get('feature_value', 'N/A')
+            }
+
+    # Get visual assets - BOTH product-specific AND global assets
+    try:
+        visual_assets = fetch_visual_assets(client, product_id)
+    except Exception as e:
+        print(f"Error getting visual assets: {e}")
+        visual_assets = organize_visual_assets([])
+
+    return {
+        "product": product,
+        "variants": variants_result.data,
+        "configuration_categories": configuration_categories,
+        "accessories": accessories,
+        "features": features,
+        "configurable_features": configurable_features,
+        "visual_assets": visual_assets
+    }
+
+
+def select_in(client, table: str, columns: str, column: str, values: List[int], active_only: bool = False) -> List[Dict[str, Any]]:
+    """Rows whose `column` is in `values`, fetched in chunks of 200 ids to keep URLs short"""
+    rows = []
+    for start in range(0, len(values), 200):
+        query = client.table(table).select(columns).in_(column, values[start:start + 200])
+        if active_only:
+            query = query.eq('is_active', True)
+        rows.extend(query.execute().data)
+    return rows
+
+
+def product_details_cache_key(product_id: int) -> str:
+    return f"product-details:{product_id}"
+
+
+def get_product_details_cached(client, product_id: int) -> Optional[Dict[str, Any]]:
+    """fetch_product_details through the catalog cache (entries expire after catalog_cache_ttl_s)"""
+    key = product_details_cache_key(product_id)
+    cached = catalog_cache.get(key)
+    if cached is not None:
+        # Stored serialized so callers can't mutate the cached copy
+        return json.loads(cached)
+
+    with catalog_cache.compute_lock(key):
+        # Another worker on the host may have fetched it while we waited
+        cached = catalog_cache.peek(key)
+        if cached is not None:
+            return json.loads(cached)
+        details = fetch_product_details(client, product_id)
+        if details is not None:
+            catalog_cache.put(key, json.dumps(details, default=str).encode('utf-8'), ttl=settings.catalog_cache_ttl_s)
+    return details
+
+
+def sign_asset_urls(details: Dict[str, Any]) -> Dict[str, Any]:
+    """Replace the storage references in product details with signed URLs, in one batch (mutates `details`).
+
+    The catalog cache keeps the references; signing happens per response so a
+    cached entry never hands out an expired token.
+    """
+    product = details['product']
+    options = [option for category in details.get('configuration_categories', []) for option in category.get('options', [])]
+    visual_assets = details.get('visual_assets') or {}
+    assets = [asset for group in visual_assets.values() if isinstance(group, list) for asset in group]
+    signed = asset_urls.resolve_many(
+        [product.get('product_image_url'), product.get('dimension_image_url')]
+        + [option.get('option_image_url') for option in options]
+        + [accessory.get('image_url') for accessory in details.get('accessories', [])]
+        + [asset.get('file_url') for asset in assets]
+    )
+    for row, column in ([(product, 'product_image_url'), (product, 'dimension_image_url')]
+                        + [(option, 'option_image_url') for option in options]
+                        + [(accessory, 'image_url') for accessory in details.get('accessories', [])]
+                        + [(asset, 'file_url') for asset in assets]):
+        if row.get(column):
+            row[column] = signed.get(row[column], row[column])
+    return details
+
+
+# Configurable colour features: (selected_options key, part-code prefix, configurator default when configurable)
+CONFIGURATOR_FEATURES = (
+    ('housing_color', 'Housing Color', 'H', 'BLACK'),
+    ('reflector_color', 'Reflector Color', 'R', 'BLACK'),
+    ('finish', 'Finish', 'F', 'POWDER COATED'),
+)
+CONFIGURATOR_DEFAULT_SDCM = 3
+
+
+def build_default_datasheet_request(details: Dict[str, Any], category_name: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Datasheet payload for a product in its default configuration.
+
+    Built the way DetailedProductConfigurator builds its /generate-datasheet
+    body before the user changes anything (first variant, is_default options
+    keyed by category label, SDCM 3, default colours and finish, same part-code
+    order), so that the datasheet fields, and with them the PDF cache key, are
+    the ones a real download produces. `category_name` is only for the catalog
+    PDF, which prints it; downloads never send one. Returns None for products
+    without active variants.
+    """
+    product = details['product']
+    if not details['variants']:
+        return None
+    variant = details['variants'][0]
+
+    selected_options = {}
+    part_code_parts = [product['base_part_code'], variant['part_code_suffix']]
+    for category in details['configuration_categories']:
+        option = next((o for o in category.get('options') or [] if o.get('is_default')), None)
+        if option is None:
+            continue
+        selected_options[category['category_label']] = {
+            'option_label': option['option_label'],
+            'price_modifier': option['price_modifier'],
+            'part_code_suffix': option.get('part_code_suffix') or '',
+            'option_image_url': option.get('option_image_url') or '',
+        }
+        if option.get('part_code_suffix'):
+            part_code_parts.append(option['part_code_suffix'])
+
+    selected_options['SDCM'] = {'option_label': str(CONFIGURATOR_DEFAULT_SDCM), 'price_modifier': 0,
+                                'part_code_suffix': f"SDCM{CONFIGURATOR_DEFAULT_SDCM}", 'option_image_url': ''}
+    part_code_parts.append(f"SDCM{CONFIGURATOR_DEFAULT_SDCM}")
+    configurable_features = details.get('configurable_features') or {}
+    for feature, key, prefix, default in CONFIGURATOR_FEATURES:
+        config = configurable_features.get(feature) or {}
+        value = default if config.get('configurable') else (config.get('default_value') or 'N/A')
+        suffix = f"{prefix}{''.join(value.split()).upper()}" if config.get('configurable') and value != 'N/A' else ''
+        selected_options[key] = {'option_label': value, 'price_modifier': 0, 'part_code_suffix': suffix, 'option_image_url': ''}
+        if suffix:
+            part_code_parts.append(suffix)
+
+    request = {
+        'product_name': product['name'],
+        'base_part_code': product['base_part_code'],
+        'final_part_code': '-'.join(part_code_parts),
+        'product_features': details['features'],
+        'variants': details['variants'],
+        'selected_variant_id': variant['id'],
+        'selected_variant_index': 0,
+        'selected_options': selected_options,
+        'accessories': [],
+        'visual_assets': details['visual_assets'],
+        # The configurator's fallbacks for missing product values
+        'product': {
+            'id': product.get('id') or 1,
+            'name': product.get('name') or '',
+            'description': product.get('description') or '',
+            'base_part_code': product.get('base_part_code') or '',
+            'product_image_url': product.get('product_image_url') or '',
+            'dimension_image_url': product.get('dimension_image_url') or '',
+            'd1_mm': product.get('d1_mm') or 50,
+            'h_mm': product.get('h_mm') or 50,
+            'd2_mm': product.get('d2_mm') or 55,
+            'cutout_mm': product.get('cutout_mm') or 50,
+        },
+    }
+    if category_name:
+        request['product_category'] = category_name
+    return request
@@ -0,0 +1,154 @@
+# backend/app/services/compatibility.py
+"""Which variant/option combinations of a product can actually be built.
+
+Rules live in `compatibility_rules`, one row per rule:
+
+    product_id, rule_type ('excludes' | 'requires'),
+    if_variant_id / if_option_id,      the choice the rule is about (one of the two)
+    then_variant_id / then_option_id   the choice it excludes or requires (one of the two)
+
+"excludes" forbids the two choices together (in either direction).
+"requires" means that picking the "if" choice forces the "then" choice on its
+axis, so the rule is compiled as excluding the rest of that axis.
+
+Every choice of a product (each variant, each option, and "none" for optional
+categories, in the axis order of config_matrix) gets one bit. `compatible[b]`
+is a Python int with the bits of every choice that may be combined with b.
+Intersecting the masks of the current selections gives what is still
+pairwise allowed. Valid-option answers and enumeration also check that a
+full combination can still be completed (forward checking), so the
+configurator never offers a dead end.
+"""
+from itertools import chain
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+RULE_TYPES = ('excludes', 'requires')
+
+
+class CompatibilityRules:
+    def __init__(self, axes, rules: List[Dict[str, Any]]):
+        """`axes` are config_matrix Axis objects; axis 0 holds the variants"""
+        self.axes = axes
+        self.offsets = []
+        bit = 0
+        for axis in axes:
+            self.offsets.append(bit)
+            bit += axis.radix
+        self.bits = bit
+        self.axis_masks = [((1 << axis.radix) - 1) << offset for axis, offset in zip(axes, self.offsets)]
+        self.full_mask = (1 << self.bits) - 1
+        self.later_masks = [self.axis_masks[i + 1:] for i in range(len(axes))]
+        self.compatible = [self.full_mask] * self.bits
+        self.excluded_pairs: List[Tuple[int, int]] = []
+        self.ignored = 0
+        for rule in rules:
+            self._compile(rule)
+        # Configurator states repeat a lot across sessions; answers are cached per allowed mask
+        self._choices_cache: Dict[int, Dict[int, List[int]]] = {}
+
+    # --- compilation --------------------------------------------------------
+
+    def bit(self, axis_index: int, choice_id: Optional[int]) -> Optional[int]:
+        digit = self.axes[axis_index].digit_of.get(choice_id)
+        return None if digit is None else self.offsets[axis_index] + digit
+
+    def locate(self, variant_id: Optional[int], option_id: Optional[int]) -> Optional[Tuple[int, int]]:
+        """(axis index, bit) of a variant or option of this product"""
+        if variant_id is not None:
+            bit = self.bit(0, variant_id)
+            return None if bit is None else (0, bit)
+        for axis_index in range(1, len(self.axes)):
+            bit = self.bit(axis_index, option_id)
+            if option_id is not None and bit is not None:
+                return axis_index, bit
+        return None
+
+    def _compile(self, rule: Dict[str, Any]):
+        subject = self.locate(rule.get('if_variant_id'), rule.get('if_option_id'))
+        target = self.locate(rule.get('then_variant_id'), rule.get('then_option_id'))
+        if subject is None or target is None or subject[0] == target[0] or rule.get('rule_type') not in RULE_TYPES:
+            # Rules about deleted options (or contradicting one axis) are kept in the table but don't apply
+            self.ignored += 1
+            return
+        if rule['rule_type'] == 'excludes':
+            self._exclude(subject[1], target[1])
+        else:
+            target_axis, target_bit = target
+            for other in _bits(self.axis_masks[target_axis] & ~(1 << target_bit)):
+                self._exclude(subject[1], other)
+
+    def _exclude(self, a: int, b: int):
+        self.compatible[a] &= ~(1 << b)
+        self.compatible[b] &= ~(1 << a)
+        self.excluded_pairs.append((a, b))
+
+    def axis_digit(self, bit: int) -> Tuple[int, int]:
+        for axis_index in range(len(self.axes) - 1, -1, -1):
+            if bit >= self.offsets[axis_index]:
+                return axis_index, bit - self.offsets[axis_index]
+        raise ValueError(bit)
+
+    # --- queries ------------------------------------------------------------
+
+    def allowed_mask(self, selected_bits: Sequence[int], restrict: int = -1) -> int:
+        """Bits still pairwise compatible with the selected ones (each selection pins its own axis)"""
+        allowed = self.full_mask & restrict
+        for bit in selected_bits:
+            axis_index, _ = self.axis_digit(bit)
+            allowed &= self.compatible[bit] & (~self.axis_masks[axis_index] | (1 << bit))
+        return allowed
+
+    def completion(self, allowed: int, axis_index: int = 0, covered: int = 0) -> Optional[Tuple[int, ...]]:
+        """Digits of one buildable combination within `allowed`, or None; bits outside `covered` are tried first"""
+        if axis_index == len(self.axes):
+            return ()
+        choices = allowed & self.axis_masks[axis_index]
+        for bit in chain(_bits(choices & ~covered), _bits(choices & covered)):
+            remaining = allowed & self.compatible[bit]
+            if all(remaining & mask for mask in self.later_masks[axis_index]):
+                rest = self.completion(remaining, axis_index + 1, covered)
+                if rest is not None:
+                    return (bit - self.offsets[axis_index],) + rest
+        return None
+
+    def valid_choices(self, selected_bits: Sequence[int]) -> Dict[int, List[int]]:
+        """Per axis, the digits that still lead to at least one buildable combination"""
+        allowed = self.allowed_mask(selected_bits)
+        cached = self._choices_cache.get(allowed)
+        if cached is not None:
+            return cached
+        supported = 0 if self.excluded_pairs else allowed
+        for axis_index, axis_mask in enumerate(self.axis_masks):
+            for bit in _bits(allowed & axis_mask & ~supported):
+                digits = self.completion(allowed & self.compatible[bit] & (~axis_mask | (1 << bit)), 0, supported)
+                if digits is not None:
+                    # One completion proves every choice in it, which skips most of the searches
+                    supported |= sum(1 << (offset + digit) for offset, digit in zip(self.offsets, digits))
+        choices = {axis_index: [bit - self.offsets[axis_index] for bit in _bits(supported & axis_mask)]
+                   for axis_index, axis_mask in enumerate(self.axis_masks)}
+        if len(self._choices_cache) >= 4096:
+            self._choices_cache.clear()
+        self._choices_cache[allowed] = choices
+        return choices
+
+    def iter_valid(self, allowed: int = -1) -> Iterator[Tuple[int, ...]]:
+        """Digit tuples of buildable combinations within `allowed`, lazily and in combination order"""
+        return self._search(self.full_mask & allowed, 0)
+
+    def _search(self, allowed: int, axis_index: int, prefix: Tuple[int, ...] = ()) -> Iterator[Tuple[int, ...]]:
+        if axis_index == len(self.axes):
+            yield prefix
+            return
+        offset = self.offsets[axis_index]
+        for bit in _bits(allowed & self.axis_masks[axis_index]):
+            remaining = allowed & self.compatible[bit]
+            # Forward check: every later axis must keep at least one choice
+            if all(remaining & mask for mask in self.later_masks[axis_index]):
+                yield from self._search(remaining, axis_index + 1, prefix + (bit - offset,))
+
+
+def _bits(mask: int) -> Iterator[int]:
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
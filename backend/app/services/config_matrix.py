@@ -0,0 +1,351 @@
+# backend/app/services/config_matrix.py
+"""Every product × variant × option combination with its part code and price.
+
+A product's combinations are never stored one by one. Each is a mixed-radix
+number: digit 0 picks the variant, digit i picks the option of configuration
+category i (display order; non-required categories get an extra "none"
+digit). With that numbering:
+
+- prices are one float64 array in combination order, built with a broadcast
+  sum (variant base price + option price modifiers);
+- part codes (built exactly like /configure/generate-part-code) are one
+  sorted bytes array plus the permutation back to combination numbers, so
+  exact and prefix lookups are two binary searches;
+- option filters select digits per axis, and the matching combination numbers
+  are computed directly (a broadcast sum of strides), not found by scanning;
+- compatibility rules (see compatibility) mark unbuildable combinations in a
+  boolean mask; those are left out of the part-code index and every query.
+
+Matrices are built lazily per product from a handful of bulk queries and
+kept in process. `invalidate()` marks the products an import changed; only
+those are rebuilt, on their next read, so an option edit never rebuilds the
+catalog. Imports in other workers arrive through `catalog_invalidations`,
+polled before every read.
+"""
+import threading
+from functools import reduce
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.compatibility import CompatibilityRules
+from app.services.catalog_service import catalog_invalidations, select_in
+from app.services.metrics import metrics
+
+
+class Axis:
+    """One digit of the combination number: the variants, or one configuration category"""
+
+    def __init__(self, name: str, ids: List[Optional[int]], suffixes: List[str], prices: List[float],
+                 part_code_position: int = 0):
+        self.name = name
+        self.ids = ids
+        self.suffixes = suffixes
+        self.prices = np.asarray(prices, dtype='float64')
+        self.part_code_position = part_code_position
+        self.digit_of = {option_id: digit for digit, option_id in enumerate(ids)}
+
+    @property
+    def radix(self) -> int:
+        return len(self.ids)
+
+
+class ProductMatrix:
+    def __init__(self, product_id: int, base_code: str, variant_axis: Axis, option_axes: List[Axis],
+                 rules: Optional[List[Dict[str, Any]]] = None):
+        self.product_id = product_id
+        self.base_code = base_code
+        self.axes = [variant_axis] + option_axes
+        self.shape = tuple(axis.radix for axis in self.axes)
+        self.size = int(np.prod(self.shape)) if self.axes else 0
+        self.strides = np.array([int(np.prod(self.shape[i + 1:])) for i in range(len(self.shape))], dtype='int64')
+        self.compatibility = CompatibilityRules(self.axes, rules or [])
+        self._build_valid()
+        self._build_prices()
+        self._build_part_codes()
+
+    # --- construction -----------------------------------------------------
+
+    def _axis_grid(self, axis_index: int, values: np.ndarray) -> np.ndarray:
+        """`values` shaped to broadcast along one axis of the full grid"""
+        shape = [1] * len(self.shape)
+        shape[axis_index] = len(values)
+        return values.reshape(shape)
+
+    def _build_valid(self):
+        valid = np.ones(self.shape, dtype=bool)
+        for a, b in self.compatibility.excluded_pairs:
+            index = [slice(None)] * len(self.shape)
+            for bit in (a, b):
+                axis_index, digit = self.compatibility.axis_digit(bit)
+                index[axis_index] = digit
+            valid[tuple(index)] = False
+        self.valid = valid.ravel()
+        self.valid_count = int(self.valid.sum())
+
+    def _build_prices(self):
+        grids = [self._axis_grid(i, axis.prices) for i, axis in enumerate(self.axes)]
+        self.prices = np.broadcast_to(reduce(np.add, grids), self.shape).ravel().copy()
+
+    def _part_code_axes(self) -> List[int]:
+        # Variant first, then required categories with a position, by position (see generate_part_code)
+        ordered = sorted((axis.part_code_position, i) for i, axis in enumerate(self.axes[1:], start=1)
+                         if axis.part_code_position > 0)
+        return [0] + [i for _, i in ordered]
+
+    def _build_part_codes(self):
+        codes = np.array([self.base_code.encode('utf-8')], dtype=object)
+        codes = codes.reshape([1] * len(self.shape))
+        for i in self._part_code_axes():
+            pieces = np.array([(f"-{suffix}" if suffix else '').encode('utf-8') for suffix in self.axes[i].suffixes], dtype=object)
+            codes = codes + self._axis_grid(i, pieces)  # object arrays concatenate bytes element-wise
+        # Only buildable combinations are indexed
+        buildable = np.flatnonzero(self.valid)
+        flat = np.broadcast_to(codes, self.shape).ravel()[buildable].astype('S')
+        sort = np.argsort(flat, kind='stable')
+        self.order = buildable[sort].astype('int64')
+        self.sorted_codes = flat[sort]
+
+    # --- reads -------------------------------------------------------------
+
+    def digits(self, index: int) -> Tuple[int, ...]:
+        return tuple(int(d) for d in np.unravel_index(index, self.shape))
+
+    def part_code(self, index: int) -> str:
+        digits = self.digits(index)
+        parts = [self.base_code] + [self.axes[i].suffixes[digits[i]] for i in self._part_code_axes()]
+        return '-'.join(part for part in parts if part)
+
+    def row(self, index: int) -> Dict[str, Any]:
+        digits = self.digits(index)
+        return {
+            'product_id': self.product_id,
+            'index': int(index),
+            'part_code': self.part_code(index),
+            'price': round(float(self.prices[index]), 2),
+            'variant_id': self.axes[0].ids[digits[0]],
+            'selected_options': {axis.name: axis.ids[digit] for axis, digit in zip(self.axes[1:], digits[1:])},
+        }
+
+    def find_part_code(self, part_code: str) -> Optional[int]:
+        # Categories outside the part code make several combinations share one; the first wins
+        key = part_code.encode('utf-8')
+        position = int(np.searchsorted(self.sorted_codes, key, side='left'))
+        if position < len(self.sorted_codes) and self.sorted_codes[position] == key:
+            return int(self.order[position])
+        return None
+
+    def prefix_range(self, prefix: str) -> Tuple[int, int]:
+        """Positions in sorted_codes of the codes starting with `prefix`"""
+        key = prefix.encode('utf-8')
+        low = int(np.searchsorted(self.sorted_codes, key, side='left'))
+        high = int(np.searchsorted(self.sorted_codes, key + b'\xff', side='left'))
+        return low, high
+
+    def matching_indices(self, variant_ids: Optional[Sequence[int]] = None,
+                         options: Optional[Dict[str, Sequence[Optional[int]]]] = None) -> np.ndarray:
+        """Sorted numbers of the buildable combinations whose variant/options are among the given ones"""
+        options = options or {}
+        by_name = {axis.name: i for i, axis in enumerate(self.axes[1:], start=1)}
+        unknown = [name for name in options if name not in by_name]
+        if unknown:
+            raise ValueError(f"Unknown configuration categories: {unknown}")
+
+        allowed = []
+        for i, axis in enumerate(self.axes):
+            wanted = variant_ids if i == 0 else options.get(axis.name)
+            if wanted is None:
+                allowed.append(np.arange(axis.radix, dtype='int64'))
+            else:
+                allowed.append(np.array(sorted({axis.digit_of[w] for w in wanted if w in axis.digit_of}), dtype='int64'))
+        grids = [self._axis_grid(i, digits * self.strides[i]) for i, digits in enumerate(allowed)]
+        indices = reduce(np.add, grids).ravel()
+        return indices[self.valid[indices]]
+
+    def selection_bits(self, variant_id: Optional[int] = None,
+                       selected_options: Optional[Dict[str, Optional[int]]] = None) -> List[int]:
+        """Compatibility bits of a configurator selection (categories left out are still open)"""
+        bits = []
+        if variant_id is not None:
+            bits.append(self.compatibility.bit(0, variant_id))
+        by_name = {axis.name: i for i, axis in enumerate(self.axes[1:], start=1)}
+        for name, option_id in (selected_options or {}).items():
+            if name not in by_name:
+                raise ValueError(f"Unknown configuration category: {name}")
+            bits.append(self.compatibility.bit(by_name[name], option_id))
+        if None in bits:
+            raise ValueError("Selection contains a variant or option that isn't part of this product")
+        return bits
+
+    def valid_options(self, variant_id: Optional[int] = None,
+                      selected_options: Optional[Dict[str, Optional[int]]] = None) -> Dict[str, Any]:
+        """Choices per axis that still lead to a buildable combination, given the current selection"""
+        choices = self.compatibility.valid_choices(self.selection_bits(variant_id, selected_options))
+        return {
+            'variants': [self.axes[0].ids[digit] for digit in choices[0]],
+            'options': {axis.name: [axis.ids[digit] for digit in choices[i]] for i, axis in enumerate(self.axes[1:], start=1)},
+            'buildable': all(choices.values()),
+        }
+
+    def iter_valid_indices(self, variant_id: Optional[int] = None,
+                           selected_options: Optional[Dict[str, Optional[int]]] = None) -> Iterator[int]:
+        """Buildable combination numbers consistent with a selection, generated lazily in combination order"""
+        bits = self.selection_bits(variant_id, selected_options)
+        for digits in self.compatibility.iter_valid(self.compatibility.allowed_mask(bits)):
+            yield int(np.dot(digits, self.strides))
+
+
+def build_product_matrix(product: Dict[str, Any], variants: List[Dict[str, Any]], categories: List[Dict[str, Any]],
+                         options: List[Dict[str, Any]], rules: Optional[List[Dict[str, Any]]] = None) -> ProductMatrix:
+    variant_axis = Axis('variant', [v['id'] for v in variants], [v.get('part_code_suffix') or '' for v in variants],
+                        [float(v.get('base_price') or 0) for v in variants])
+    option_axes = []
+    for category in categories:
+        category_options = [o for o in options if o['category_id'] == category['id']]
+        ids = [o['id'] for o in category_options]
+        suffixes = [o.get('part_code_suffix') or '' for o in category_options]
+        prices = [float(o.get('price_modifier') or 0) for o in category_options]
+        if not category.get('is_required', True) or not category_options:
+            # Leaving an optional category empty is a configuration of its own
+            ids, suffixes, prices = ids + [None], suffixes + [''], prices + [0.0]
+        position = category.get('part_code_position') or 0 if category.get('is_required', True) else 0
+        option_axes.append(Axis(category['category_name'], ids, suffixes, prices, position))
+
+    if not variants:
+        raise ValueError(f"Product {product['id']} has no active variants")
+    combinations = int(np.prod([len(variants)] + [axis.radix for axis in option_axes]))
+    if combinations > settings.config_matrix_max_combinations:
+        raise ValueError(f"Product {product['id']} has {combinations} combinations "
+                         f"(limit {settings.config_matrix_max_combinations})")
+    return ProductMatrix(product['id'], product['base_part_code'], variant_axis, option_axes, rules)
+
+
+class ConfigurationMatrix:
+    """Per-process registry of product matrices"""
+
+    def __init__(self):
+        self._matrices: Dict[int, ProductMatrix] = {}
+        self._stale = set()
+        self._loaded_all = False
+        self._lock = threading.Lock()
+
+    def get(self, client, product_id: int) -> ProductMatrix:
+        catalog_invalidations.poll()
+        matrix = self._matrices.get(product_id)
+        if matrix is None:
+            matrix = self.load(client, [product_id]).get(product_id)
+            if matrix is None:
+                raise KeyError(product_id)
+        return matrix
+
+    def load(self, client, product_ids: Optional[List[int]] = None) -> Dict[int, ProductMatrix]:
+        """Build matrices for the given products (default: every active one) with five bulk queries"""
+        with metrics.timer('config_matrix.load'):
+            query = client.table('products').select('id, base_part_code').eq('is_active', True)
+            products = (query.in_('id', product_ids) if product_ids is not None else query).execute().data
+            ids = [product['id'] for product in products]
+            variants = select_in(client, 'product_variants', 'id, product_id, part_code_suffix, base_price, display_order',
+                                  'product_id', ids, active_only=True)
+            categories = select_in(client, 'configuration_categories',
+                                    'id, product_id, category_name, part_code_position, is_required, display_order',
+                                    'product_id', ids)
+            options = select_in(client, 'configuration_options',
+                                 'id, category_id, part_code_suffix, price_modifier, display_order',
+                                 'category_id', [category['id'] for category in categories])
+            rules = _load_rules(client, ids)
+
+            built = {}
+            for product in products:
+                try:
+                    built[product['id']] = build_product_matrix(
+                        product,
+                        _ordered(v for v in variants if v['product_id'] == product['id']),
+                        _ordered(c for c in categories if c['product_id'] == product['id']),
+                        _ordered(options),
+                        [r for r in rules if r['product_id'] == product['id']],
+                    )
+                except ValueError as e:
+                    print(f"Configuration matrix skipped for product {product['id']}: {str(e)}")
+        with self._lock:
+            for product_id in (ids if product_ids is None else product_ids):
+                self._matrices.pop(product_id, None)
+                self._stale.discard(product_id)
+            self._matrices.update(built)
+            if product_ids is None:
+                self._loaded_all = True
+        print(f"✓ Configuration matrix: {len(built)} products, {sum(m.size for m in built.values())} combinations")
+        return built
+
+    def invalidate(self, product_ids):
+        """Drop products whose variants/options changed (None: all of them); they are rebuilt on next use"""
+        with self._lock:
+            if product_ids is None:
+                self._matrices.clear()
+                self._stale.clear()
+                self._loaded_all = False
+                return
+            for product_id in product_ids:
+                self._matrices.pop(product_id, None)
+                self._stale.add(product_id)
+
+    def search_part_codes(self, client, prefix: str, limit: int = 100) -> List[Dict[str, Any]]:
+        """Combinations whose part code starts with `prefix`, in part-code order"""
+        rows = []
+        for matrix in self._matrices_for_prefix(client, prefix):
+            low, high = matrix.prefix_range(prefix)
+            for position in range(low, min(high, low + limit - len(rows))):
+                rows.append(matrix.row(int(matrix.order[position])))
+            if len(rows) >= limit:
+                break
+        return rows
+
+    def find_part_code(self, client, part_code: str) -> Optional[Dict[str, Any]]:
+        for matrix in self._matrices_for_prefix(client, part_code):
+            index = matrix.find_part_code(part_code)
+            if index is not None:
+                return matrix.row(index)
+        return None
+
+    def iter_rows(self, matrix: ProductMatrix, indices: np.ndarray) -> Iterator[Dict[str, Any]]:
+        for index in indices:
+            yield matrix.row(int(index))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'products': len(self._matrices),
+                'combinations': sum(m.size for m in self._matrices.values()),
+                'buildable': sum(m.valid_count for m in self._matrices.values()),
+                'bytes': sum(m.prices.nbytes + m.valid.nbytes + m.sorted_codes.nbytes + m.order.nbytes
+                             for m in self._matrices.values()),
+            }
+
+    def _matrices_for_prefix(self, client, prefix: str) -> List[ProductMatrix]:
+        catalog_invalidations.poll()
+        if not self._loaded_all:
+            self.load(client)
+        elif self._stale:
+            self.load(client, sorted(self._stale))
+        with self._lock:
+            matrices = list(self._matrices.values())
+        # A prefix shorter than a base code selects whole products; a longer one must start with the base code
+        return sorted((m for m in matrices if m.base_code.startswith(prefix) or prefix.startswith(m.base_code)),
+                      key=lambda m: m.base_code)
+
+
+def _load_rules(client, product_ids: List[int]) -> List[Dict[str, Any]]:
+    try:
+        return select_in(client, 'compatibility_rules', '*', 'product_id', product_ids)
+    except Exception as e:
+        # Without the rules table every combination counts as buildable
+        print(f"Compatibility rules unavailable: {str(e)}")
+        return []
+
+
+def _ordered(rows) -> List[Dict[str, Any]]:
+    return sorted(rows, key=lambda row: (row.get('display_order') is None, row.get('display_order'), row['id']))
+
+
+configuration_matrix = ConfigurationMatrix()
+catalog_invalidations.subscribe(configuration_matrix.invalidate)
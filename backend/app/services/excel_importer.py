@@ -0,0 +1,594 @@
+# backend/app/services/excel_importer.py
+"""Import the Lylux product workbook into the catalog tables.
+
+The workbook is read with openpyxl in read-only mode, one row at a time, so
+memory stays flat no matter how many rows it has. Each sheet is recognised
+by its name or its headers as one of:
+
+    products     -> products              (upsert on base_part_code)
+    variants     -> product_variants      (upsert on product_id, part_code_suffix)
+    options      -> configuration_categories (product_id, category_name)
+                    + configuration_options  (category_id, option_value)
+    accessories  -> accessories           (upsert on product_id, part_code)
+
+Those column sets need unique constraints in the database for the upserts.
+Headers are matched through COLUMN_ALIASES (case and punctuation
+insensitive) and may sit below a few title rows. Rows are parsed in blocks
+by spec_normalizer (vectorized, "9W" -> 9, efficacy derived, outliers and
+implausible option values reported as warnings) and written
+`import_chunk_size` at a time; rows that can't be imported (missing
+keys, unparseable numbers, unknown product codes, failed chunks) are listed
+in the report with their sheet and row number instead of failing the import.
+
+Re-imports are incremental. Every normalized row is hashed and compared with
+the hash stored by the previous import in `catalog_row_hashes` (unique on
+entity_table, entity_key); only inserted and changed rows are written.
+With `delete_missing` (off by default), entities of an imported sheet that
+the workbook no longer contains are deactivated (options are deleted).
+Every product with a written or removed row gets its `catalog_versions`
+entry bumped and its cached details dropped, so nothing else is invalidated. The report carries the per-sheet diff.
+"""
+import hashlib
+import json
+import re
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+
+from app.core.config import settings
+from app.services.catalog_service import catalog_invalidations, product_details_cache_key
+from app.services.render_cache import catalog_cache
+from app.services.spec_normalizer import (normalize_frame, normalize_variants, option_warnings, to_records,
+                                          variant_warnings)
+
+# Sheets are imported in this order so child rows can resolve their product
+SHEET_KINDS = ['products', 'variants', 'options', 'accessories']
+
+SHEET_NAME_ALIASES = {
+    'products': ('products', 'product', 'fixtures', 'luminaires'),
+    'variants': ('variants', 'product variants', 'versions', 'wattages'),
+    'options': ('options', 'configuration', 'configurations', 'configuration options'),
+    'accessories': ('accessories', 'accessory'),
+}
+
+COLUMN_ALIASES = {
+    'products': {
+        'base_part_code': ('product code', 'part code', 'base part code', 'code', 'sku'),
+        'name': ('product name', 'name', 'product'),
+        'category': ('category', 'product category', 'family', 'product type'),
+        'description': ('description', 'product description'),
+        'product_image_url': ('image', 'product image', 'image url', 'product image url'),
+        'dimension_image_url': ('dimension image', 'dimension drawing', 'dimensions image', 'dimension image url'),
+        'd1_mm': ('d1', 'd1 mm'),
+        'h_mm': ('h', 'h mm', 'height', 'height mm'),
+        'd2_mm': ('d2', 'd2 mm'),
+        'cutout_mm': ('cutout', 'cut out', 'cutout mm', 'cut out mm'),
+    },
+    'variants': {
+        'product_code': ('product code', 'base part code', 'product'),
+        'variant_name': ('variant', 'variant name', 'wattage', 'power variant'),
+        'part_code_suffix': ('suffix', 'variant code', 'part code suffix', 'variant suffix'),
+        'system_output': ('system output', 'output', 'lumens', 'lumen output', 'output lm'),
+        'system_power': ('system power', 'power', 'watts', 'power w'),
+        'efficiency': ('efficiency', 'efficacy', 'lm w', 'system efficacy'),
+        'base_price': ('price', 'base price', 'unit price'),
+        'display_order': ('display order', 'order', 'sort'),
+    },
+    'options': {
+        'product_code': ('product code', 'base part code', 'product'),
+        'category_name': ('option category', 'configuration', 'configuration category', 'category', 'specification'),
+        'section_name': ('section', 'section name', 'datasheet section'),
+        'part_code_position': ('position', 'part code position', 'code position'),
+        'is_required': ('required', 'is required'),
+        'option_value': ('option', 'value', 'option value'),
+        'option_label': ('label', 'option label'),
+        'part_code_suffix': ('suffix', 'option code', 'part code suffix'),
+        'price_modifier': ('price modifier', 'surcharge', 'price', 'extra price'),
+        'is_default': ('default', 'is default'),
+        'option_image_url': ('image', 'option image', 'image url'),
+        'display_order': ('display order', 'order', 'sort'),
+    },
+    'accessories': {
+        'product_code': ('product code', 'base part code', 'product'),
+        'name': ('accessory', 'accessory name', 'name'),
+        'part_code': ('part code', 'accessory code', 'code'),
+        'description': ('description',),
+        'price': ('price', 'unit price'),
+        'accessory_category': ('category', 'accessory category', 'type'),
+        'image_url': ('image', 'image url'),
+    },
+}
+
+KIND_TABLES = {
+    'products': 'products',
+    'variants': 'product_variants',
+    'options': 'configuration_options',
+    'accessories': 'accessories',
+}
+
+# Besides the product code, what identifies a row across imports
+ENTITY_KEY_FIELDS = {
+    'variants': ('part_code_suffix',),
+    'options': ('category_name', 'option_value'),
+    'accessories': ('part_code',),
+}
+
+REQUIRED_COLUMNS = {
+    'products': ('base_part_code', 'name', 'category'),
+    'variants': ('product_code', 'variant_name'),
+    'options': ('product_code', 'category_name', 'option_value'),
+    'accessories': ('product_code', 'name', 'part_code'),
+}
+
+INT_FIELDS = {'d1_mm', 'h_mm', 'd2_mm', 'cutout_mm', 'system_output', 'system_power', 'efficiency',
+              'part_code_position', 'display_order'}
+FLOAT_FIELDS = {'base_price', 'price_modifier', 'price'}
+BOOL_FIELDS = {'is_default', 'is_required'}
+
+HEADER_SCAN_ROWS = 10
+# Rows parsed per vectorized pass; large enough that pandas' per-call overhead doesn't dominate
+NORMALIZE_BLOCK_ROWS = 5000
+
+
+class RowRejected(Exception):
+    """A row that can't be imported; the message goes into the report"""
+
+
+def normalize_header(value: Any) -> str:
+    return re.sub(r'[^a-z0-9]+', ' ', str(value or '').lower()).strip()
+
+
+def _alias_lookup(kind: str) -> Dict[str, str]:
+    lookup = {}
+    for field, aliases in COLUMN_ALIASES[kind].items():
+        lookup[normalize_header(field)] = field
+        for alias in aliases:
+            lookup.setdefault(normalize_header(alias), field)
+    return lookup
+
+
+ALIAS_LOOKUP = {kind: _alias_lookup(kind) for kind in SHEET_KINDS}
+
+
+def map_columns(kind: str, header: Tuple[Any, ...]) -> Dict[int, str]:
+    """Column index -> field for one header row (first matching column wins)"""
+    mapping: Dict[int, str] = {}
+    for index, cell in enumerate(header):
+        field = ALIAS_LOOKUP[kind].get(normalize_header(cell))
+        if field and field not in mapping.values():
+            mapping[index] = field
+    return mapping
+
+
+def slugify(value: str) -> str:
+    return re.sub(r'[^a-z0-9]+', '-', value.lower()).strip('-')
+
+
+def entity_key(kind: str, record: Dict[str, Any]) -> str:
+    """Natural key of a prepared row; always starts with the product code"""
+    if kind == 'products':
+        return record['base_part_code']
+    parts = [record['product_code']] + [str(record[field]) for field in ENTITY_KEY_FIELDS[kind]]
+    return '|'.join(parts)
+
+
+def product_code_of(key: str) -> str:
+    return key.split('|', 1)[0]
+
+
+def hash_row(record: Dict[str, Any]) -> str:
+    """Digest of a normalized row; equal digests mean nothing to write"""
+    payload = json.dumps(record, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+
+
+class ExcelCatalogImporter:
+    """One import run; `client` must be allowed to write (the service-role client)"""
+
+    def __init__(self, client, chunk_size: Optional[int] = None, dry_run: bool = False, delete_missing: bool = False):
+        self.client = client
+        self.chunk_size = chunk_size or settings.import_chunk_size
+        self.dry_run = dry_run
+        self.delete_missing = delete_missing
+        self.product_ids: Dict[str, Optional[int]] = {}
+        self.category_ids: Dict[str, int] = {}
+        self.config_category_ids: Dict[Tuple[int, str], int] = {}
+        self.display_orders: Dict[Any, int] = {}
+        # (kind, entity key) -> (row hash, entity id) as stored by the previous import
+        self.stored_hashes: Dict[Tuple[str, str], Tuple[str, Optional[int]]] = {}
+        self.seen: Set[Tuple[str, str]] = set()
+        self.changed_products: Set[str] = set()
+        self.report: Dict[str, Any] = {
+            'dry_run': dry_run,
+            'sheets': [],
+            'diff': {},
+            'upserted': {table: 0 for table in ('products', 'product_variants', 'configuration_categories',
+                                                'configuration_options', 'accessories')},
+            'deleted': {kind: 0 for kind in SHEET_KINDS},
+            'versions_bumped': 0,
+            'normalize_ms': 0.0,
+            'rejected_count': 0,
+            'rejected': [],
+            'warning_count': 0,
+            'warnings': [],
+        }
+
+    def run(self, file) -> Dict[str, Any]:
+        start = time.perf_counter()
+        workbook = load_workbook(file, read_only=True, data_only=True)
+        try:
+            sheets = []
+            for sheet in workbook.worksheets:
+                kind, header_row, mapping = self._classify(sheet)
+                if kind is None:
+                    self.report['sheets'].append({'sheet': sheet.title, 'kind': None, 'skipped': 'no recognised header'})
+                    continue
+                sheets.append((SHEET_KINDS.index(kind), sheet, kind, header_row, mapping))
+
+            self._load_row_hashes()
+            if any(kind == 'products' for _, _, kind, _, _ in sheets):
+                self._load_categories()
+            for _, sheet, kind, header_row, mapping in sorted(sheets, key=lambda item: item[0]):
+                self._import_sheet(sheet, kind, header_row, mapping)
+        finally:
+            workbook.close()
+
+        if self.delete_missing:
+            for kind in {kind for _, _, kind, _, _ in sheets}:
+                self._delete_missing(kind)
+        self._bump_versions()
+
+        self.report['elapsed_s'] = round(time.perf_counter() - start, 2)
+        self.report['normalize_ms'] = round(self.report['normalize_ms'], 1)
+        self.report['rejected_truncated'] = self.report['rejected_count'] > len(self.report['rejected'])
+        print(f"✓ Excel import: {self.report['diff']}, {self.report['versions_bumped']} product versions bumped, "
+              f"{self.report['rejected_count']} rejected in {self.report['elapsed_s']}s")
+        return self.report
+
+    # --- sheet handling ----------------------------------------------------
+
+    def _classify(self, sheet) -> Tuple[Optional[str], int, Dict[int, str]]:
+        """Find the sheet kind and its header row among the first HEADER_SCAN_ROWS rows"""
+        named = next((kind for kind, names in SHEET_NAME_ALIASES.items()
+                      if normalize_header(sheet.title) in names), None)
+        best: Tuple[int, Optional[str], int, Dict[int, str]] = (0, None, 0, {})
+        for row_number, values in enumerate(sheet.iter_rows(max_row=HEADER_SCAN_ROWS, values_only=True), start=1):
+            for kind in ([named] if named else SHEET_KINDS):
+                mapping = map_columns(kind, values)
+                if not all(field in mapping.values() for field in REQUIRED_COLUMNS[kind]):
+                    continue
+                if len(mapping) > best[0]:
+                    best = (len(mapping), kind, row_number, mapping)
+        return best[1], best[2], best[3]
+
+    def _import_sheet(self, sheet, kind: str, header_row: int, mapping: Dict[int, str]):
+        sheet_report = {
+            'sheet': sheet.title, 'kind': kind, 'header_row': header_row,
+            'columns': sorted(mapping.values()), 'rows': 0, 'written': 0, 'unchanged': 0, 'rejected': 0,
+        }
+        self.report['sheets'].append(sheet_report)
+        self.report['diff'].setdefault(kind, {'inserted': 0, 'changed': 0, 'unchanged': 0, 'deleted': 0})
+        print(f"Importing sheet '{sheet.title}' as {kind} (header on row {header_row})")
+
+        chunk: List[Tuple[int, Dict[str, Any], str, str]] = []
+        efficacy: List[np.ndarray] = []
+        raw: List[Tuple[int, Tuple[Any, ...]]] = []
+        for row_number, values in self._data_rows(sheet, header_row):
+            sheet_report['rows'] += 1
+            raw.append((row_number, values))
+            if len(raw) >= NORMALIZE_BLOCK_ROWS:
+                chunk = self._process_rows(kind, mapping, raw, chunk, sheet_report, efficacy)
+                raw = []
+        if raw:
+            chunk = self._process_rows(kind, mapping, raw, chunk, sheet_report, efficacy)
+        if chunk:
+            self._write_chunk(kind, chunk, sheet_report)
+
+        if kind == 'variants' and efficacy:
+            rows, values = np.concatenate(efficacy).T
+            for warning in variant_warnings(rows.astype('int64'), values):
+                self._warn(sheet_report, warning['row'], warning['reason'])
+
+    def _normalize(self, kind: str, mapping: Dict[int, str], raw: List[Tuple[int, Tuple[Any, ...]]]):
+        """Parse a block of rows column-wise; returns (row numbers, records, error per row, warning per row)"""
+        start = time.perf_counter()
+        indexes = list(mapping)
+        row_numbers = np.fromiter((row_number for row_number, _ in raw), dtype='int64', count=len(raw))
+        frame = pd.DataFrame([[values[i] if i < len(values) else None for i in indexes] for _, values in raw],
+                             columns=[mapping[i] for i in indexes], dtype=object)
+        frame, errors = normalize_frame(frame, INT_FIELDS, FLOAT_FIELDS, BOOL_FIELDS)
+        warnings = pd.Series(pd.NA, index=frame.index, dtype='string')
+        if kind == 'variants':
+            frame = normalize_variants(frame)
+        elif kind == 'options':
+            warnings = option_warnings(frame)
+        self.report['normalize_ms'] += (time.perf_counter() - start) * 1000
+        return (row_numbers, to_records(frame), errors.to_numpy(dtype=object, na_value=None).tolist(),
+                warnings.to_numpy(dtype=object, na_value=None).tolist(), frame)
+
+    def _process_rows(self, kind: str, mapping: Dict[int, str], raw, chunk, sheet_report, efficacy):
+        row_numbers, records, errors, warnings, frame = self._normalize(kind, mapping, raw)
+        if kind == 'variants':
+            efficacy.append(np.column_stack([row_numbers, frame['efficiency'].astype('float64').to_numpy()]))
+
+        for row_number, record, error, warning in zip(row_numbers.tolist(), records, errors, warnings):
+            if error is not None:
+                self._reject(sheet_report, row_number, error)
+                continue
+            if warning is not None:
+                self._warn(sheet_report, row_number, warning)
+            try:
+                record = self._prepare(kind, record)
+            except RowRejected as e:
+                self._reject(sheet_report, row_number, str(e))
+                continue
+
+            key = entity_key(kind, record)
+            row_hash = hash_row(record)
+            self.seen.add((kind, key))
+            stored = self.stored_hashes.get((kind, key))
+            if stored is not None and stored[0] == row_hash:
+                sheet_report['unchanged'] += 1
+                self.report['diff'][kind]['unchanged'] += 1
+                continue
+
+            chunk.append((row_number, record, key, row_hash))
+            if len(chunk) >= self.chunk_size:
+                self._write_chunk(kind, chunk, sheet_report)
+                chunk = []
+        return chunk
+
+    def _data_rows(self, sheet, header_row: int) -> Iterator[Tuple[int, Tuple[Any, ...]]]:
+        for row_number, values in enumerate(sheet.iter_rows(min_row=header_row + 1, values_only=True),
+                                            start=header_row + 1):
+            if any(value is not None and str(value).strip() for value in values):
+                yield row_number, values
+
+    def _prepare(self, kind: str, record: Dict[str, Any]) -> Dict[str, Any]:
+        """Validate one coerced row and fill derived columns (display order follows the sheet order)"""
+        for field in REQUIRED_COLUMNS[kind]:
+            if record.get(field) in (None, ''):
+                raise RowRejected(f"missing {field}")
+
+        if kind == 'products':
+            category = record.pop('category')
+            category_id = self.category_ids.get(category.lower()) or self.category_ids.get(slugify(category))
+            if category_id is None:
+                raise RowRejected(f"unknown category {category!r}")
+            record['category_id'] = category_id
+            record['is_active'] = True
+        elif kind == 'variants':
+            if record.get('system_power') is not None and record['system_power'] <= 0:
+                raise RowRejected(f"system_power must be positive, got {record['system_power']}")
+            record['part_code_suffix'] = record.get('part_code_suffix') or record['variant_name']
+            record['is_active'] = True
+            self._default_order(record, (kind, record['product_code']))
+        elif kind == 'options':
+            record['option_label'] = record.get('option_label') or record['option_value']
+            record['is_default'] = bool(record.get('is_default'))
+            category_key = ('option_categories', record['product_code'], record['category_name'])
+            if category_key not in self.display_orders:
+                self.display_orders[category_key] = self._next_order(('categories', record['product_code']))
+            record['category_order'] = self.display_orders[category_key]
+            self._default_order(record, (kind, record['product_code'], record['category_name']))
+        elif kind == 'accessories':
+            record['is_active'] = True
+            self._default_order(record, (kind, record['product_code']))
+        return record
+
+    def _default_order(self, record: Dict[str, Any], key: Any):
+        order = self._next_order(key)
+        if record.get('display_order') is None:
+            record['display_order'] = order
+
+    def _next_order(self, key: Any) -> int:
+        order = self.display_orders.get(key, 0)
+        self.display_orders[key] = order + 1
+        return order
+
+    # --- writes ------------------------------------------------------------
+
+    def _write_chunk(self, kind: str, chunk: List[Tuple[int, Dict[str, Any], str, str]], sheet_report: Dict[str, Any]):
+        if kind != 'products':
+            chunk = self._resolve_products(chunk, sheet_report)
+        if not chunk:
+            return
+        try:
+            if kind == 'products':
+                entity_ids = self._upsert_products(chunk)
+            elif kind == 'variants':
+                entity_ids = self._upsert_children('product_variants', chunk, ('product_id', 'part_code_suffix'))
+            elif kind == 'options':
+                entity_ids = self._upsert_options(chunk)
+            else:
+                entity_ids = self._upsert_children('accessories', chunk, ('product_id', 'part_code'))
+            self._store_row_hashes(kind, chunk, entity_ids)
+        except Exception as e:
+            print(f"Import chunk failed on sheet '{sheet_report['sheet']}': {str(e)}")
+            for row_number, _, _, _ in chunk:
+                self._reject(sheet_report, row_number, f"database error: {str(e)}")
+            return
+
+        sheet_report['written'] += len(chunk)
+        for _, _, key, _ in chunk:
+            change = 'changed' if (kind, key) in self.stored_hashes else 'inserted'
+            self.report['diff'][kind][change] += 1
+            self.changed_products.add(product_code_of(key))
+
+    def _upsert(self, table: str, rows: List[Dict[str, Any]], on_conflict: str) -> List[Dict[str, Any]]:
+        if self.dry_run:
+            # Placeholder id so rows depending on these still validate
+            return [dict(row, id=0) for row in rows]
+        result = self.client.table(table).upsert(rows, on_conflict=on_conflict).execute()
+        self.report['upserted'][table] += len(result.data)
+        return result.data
+
+    def _upsert_products(self, chunk) -> Dict[str, int]:
+        # Postgres rejects an upsert that touches the same row twice, so the last row per code wins
+        rows = list({key: record for _, record, key, _ in chunk}.values())
+        entity_ids = {}
+        for row in self._upsert('products', rows, 'base_part_code'):
+            self.product_ids[row['base_part_code']] = row['id']
+            entity_ids[row['base_part_code']] = row['id']
+        return entity_ids
+
+    def _upsert_children(self, table: str, chunk, conflict: Tuple[str, ...]) -> Dict[str, int]:
+        rows = {key: record for _, record, key, _ in chunk}
+        by_conflict = {tuple(record[column] for column in conflict): key for key, record in rows.items()}
+        returned = self._upsert(table, list(rows.values()), ','.join(conflict))
+        return {by_conflict.get(tuple(row[column] for column in conflict)): row['id'] for row in returned}
+
+    def _upsert_options(self, chunk) -> Dict[str, int]:
+        categories = {}
+        for _, record, _, _ in chunk:
+            key = (record['product_id'], record['category_name'])
+            if key in self.config_category_ids or key in categories:
+                continue
+            section = (record.get('section_name') or 'GENERAL').upper()
+            categories[key] = {
+                'product_id': record['product_id'],
+                'category_name': record['category_name'],
+                'category_label': record['category_name'],
+                'section_name': section,
+                'section_label': section.title(),
+                'part_code_position': record.get('part_code_position') or 0,
+                'is_required': record.get('is_required') if record.get('is_required') is not None else True,
+                'display_order': record['category_order'],
+            }
+        if categories:
+            for row in self._upsert('configuration_categories', list(categories.values()), 'product_id,category_name'):
+                self.config_category_ids[(row['product_id'], row['category_name'])] = row['id']
+
+        options, by_conflict = {}, {}
+        for _, record, key, _ in chunk:
+            category_id = self.config_category_ids.get((record['product_id'], record['category_name']))
+            by_conflict[(category_id, record['option_value'])] = key
+            options[key] = {
+                'category_id': category_id,
+                'option_value': record['option_value'],
+                'option_label': record['option_label'],
+                'part_code_suffix': record.get('part_code_suffix') or record['option_value'],
+                'price_modifier': record.get('price_modifier') or 0.0,
+                'is_default': record['is_default'],
+                'option_image_url': record.get('option_image_url'),
+                'display_order': record['display_order'],
+            }
+        returned = self._upsert('configuration_options', list(options.values()), 'category_id,option_value')
+        return {by_conflict.get((row['category_id'], row['option_value'])): row['id'] for row in returned}
+
+    def _store_row_hashes(self, kind: str, chunk, entity_ids: Dict[str, int]):
+        rows = {key: {
+            'entity_table': kind, 'entity_key': key, 'product_code': product_code_of(key),
+            'row_hash': row_hash, 'entity_id': entity_ids.get(key),
+        } for _, _, key, row_hash in chunk}
+        if not self.dry_run:
+            self.client.table('catalog_row_hashes').upsert(list(rows.values()), on_conflict='entity_table,entity_key').execute()
+
+    def _delete_missing(self, kind: str):
+        """Deactivate (or, for options, delete) entities a previous import wrote that this workbook no longer has"""
+        if any(sheet.get('kind') == kind and sheet['rejected'] for sheet in self.report['sheets']):
+            # A rejected row may be an entity that still exists; don't guess
+            self.report['diff'][kind]['deletions_skipped'] = 'sheet has rejected rows'
+            return
+        missing = [(key, entity_id) for (stored_kind, key), (_, entity_id) in self.stored_hashes.items()
+                   if stored_kind == kind and (kind, key) not in self.seen]
+        self.report['diff'][kind]['deleted'] = len(missing)
+        self.changed_products.update(product_code_of(key) for key, _ in missing)
+        if self.dry_run or not missing:
+            return
+
+        table = KIND_TABLES[kind]
+        for start in range(0, len(missing), self.chunk_size):
+            part = missing[start:start + self.chunk_size]
+            ids = [entity_id for _, entity_id in part if entity_id is not None]
+            if ids:
+                if kind == 'options':
+                    self.client.table(table).delete().in_('id', ids).execute()
+                else:
+                    self.client.table(table).update({'is_active': False}).in_('id', ids).execute()
+            self.client.table('catalog_row_hashes').delete().eq('entity_table', kind).in_('entity_key', [key for key, _ in part]).execute()
+            self.report['deleted'][kind] += len(part)
+
+    def _bump_versions(self):
+        """Increment catalog_versions for every product with a written or deleted row and drop its cached details"""
+        product_ids = set()
+        for code in self.changed_products:
+            product_id = self.product_ids.get(code)
+            if product_id is None:
+                stored = self.stored_hashes.get(('products', code))
+                product_id = stored[1] if stored else None
+            if product_id:
+                product_ids.add(product_id)
+        self.report['versions_bumped'] = len(product_ids)
+        if self.dry_run or not product_ids:
+            return
+
+        product_ids = sorted(product_ids)
+        now = datetime.now(timezone.utc).isoformat()
+        for start in range(0, len(product_ids), self.chunk_size):
+            part = product_ids[start:start + self.chunk_size]
+            current = {row['product_id']: row['version'] for row in
+                       self.client.table('catalog_versions').select('product_id, version').in_('product_id', part).execute().data}
+            self.client.table('catalog_versions').upsert(
+                [{'product_id': product_id, 'version': current.get(product_id, 0) + 1, 'updated_at': now} for product_id in part],
+                on_conflict='product_id').execute()
+        for product_id in product_ids:
+            catalog_cache.discard(product_details_cache_key(product_id))
+        # The matrix, search and facet indexes of every worker on the host
+        catalog_invalidations.publish(product_ids)
+
+    # --- lookups -----------------------------------------------------------
+
+    def _load_row_hashes(self):
+        page = 1000
+        start = 0
+        while True:
+            rows = self.client.table('catalog_row_hashes').select('entity_table, entity_key, row_hash, entity_id') \
+                .order('id').range(start, start + page - 1).execute().data
+            for row in rows:
+                self.stored_hashes[(row['entity_table'], row['entity_key'])] = (row['row_hash'], row['entity_id'])
+            if len(rows) < page:
+                break
+            start += page
+        print(f"Loaded {len(self.stored_hashes)} stored row hashes")
+
+    def _load_categories(self):
+        for row in self.client.table('categories').select('id, name, slug').execute().data:
+            self.category_ids[row['name'].lower()] = row['id']
+            if row.get('slug'):
+                self.category_ids[row['slug']] = row['id']
+
+    def _resolve_products(self, chunk, sheet_report: Dict[str, Any]):
+        """Swap product_code for product_id, looking up codes not imported in this run in one query"""
+        unknown = list({record['product_code'] for _, record, _, _ in chunk if record['product_code'] not in self.product_ids})
+        if unknown:
+            rows = self.client.table('products').select('id, base_part_code').in_('base_part_code', unknown).execute().data
+            found = {row['base_part_code']: row['id'] for row in rows}
+            for code in unknown:
+                self.product_ids[code] = found.get(code)
+
+        resolved = []
+        for row_number, record, key, row_hash in chunk:
+            code = record.pop('product_code')
+            if self.product_ids.get(code) is None:
+                self._reject(sheet_report, row_number, f"unknown product code {code!r}")
+                continue
+            record['product_id'] = self.product_ids[code]
+            resolved.append((row_number, record, key, row_hash))
+        return resolved
+
+    def _warn(self, sheet_report: Dict[str, Any], row_number: int, reason: str):
+        """Imported, but worth a look (outliers, values that don't parse for their category)"""
+        self.report['warning_count'] += 1
+        if len(self.report['warnings']) < settings.import_max_reported_rejections:
+            self.report['warnings'].append({'sheet': sheet_report['sheet'], 'row': row_number, 'reason': reason})
+
+    def _reject(self, sheet_report: Dict[str, Any], row_number: int, reason: str):
+        sheet_report['rejected'] += 1
+        self.report['rejected_count'] += 1
+        if len(self.report['rejected']) < settings.import_max_reported_rejections:
+            self.report['rejected'].append({'sheet': sheet_report['sheet'], 'row': row_number, 'reason': reason})
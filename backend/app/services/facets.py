@@ -0,0 +1,273 @@
+# backend/app/services/facets.py
+"""Faceted filtering of the catalog with live counts.
+
+Facets:
+
+    category        product category
+    cct             Colour Temperature options, parsed with spec_normalizer.parse_cct   (2700, 3000, ...)
+    beam_angle      Beam Angle options, parse_angle                                      (18, 24, ...)
+    ip_rating       IP Rating options, parse_ip                                          (20, 44, 65, ...)
+    cri             CRI options, parse_numeric                                           (80, 90, ...)
+    control_type    Control Type options, the cleaned label                              ("DALI", ...)
+    wattage         variant system_power                (range)
+    lumens          variant system_output               (range)
+    efficacy        variant efficiency, derived as lm/W by normalize_variants where missing (range)
+
+Everything is built once into numpy arrays. Rows are active variants, sorted
+by product:
+
+- each value of a discrete facet has a precomputed bitmap (bool array) over
+  products, since options belong to the product;
+- each range facet is a float column over rows plus its argsort, so a range
+  is two searchsorted calls and a scatter into a mask.
+
+A query ANDs the facets and ORs the values within one facet. A product
+matches when one of its variants is inside every range and the product
+offers a selected value of every discrete facet. Counts are disjunctive:
+each facet is counted with every filter applied except its own, which is
+what a specifier sees next to each checkbox. Range facets report the
+min/max still reachable. A query is a fixed number of vector operations per
+facet value, and the catalog is a few thousand rows, so answers take well
+under a millisecond.
+
+The engine is rebuilt from bulk queries on the first query after an Excel
+import (in any worker, through `catalog_invalidations`) changes products.
+"""
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.services.catalog_service import catalog_invalidations, select_in
+from app.services.metrics import metrics
+from app.services.spec_normalizer import clean_text, normalize_variants, parse_angle, parse_cct, parse_ip, parse_numeric
+
+# facet -> (option category names it reads, parser of the option value or None for the label text, label format)
+OPTION_FACETS = {
+    'cct': (('colour temperature', 'color temperature', 'cct'), parse_cct, '{:g}K'),
+    'beam_angle': (('beam angle',), parse_angle, '{:g}°'),
+    'ip_rating': (('ip rating',), parse_ip, 'IP{:g}'),
+    'cri': (('cri',), parse_numeric, 'CRI {:g}'),
+    'control_type': (('control type', 'control', 'dimming'), None, '{}'),
+}
+RANGE_FACETS = {'wattage': 'system_power', 'lumens': 'system_output', 'efficacy': 'efficiency'}
+QUANTITY = re.compile(r'\s*(?:IP|CRI)?\s*(\d+(?:\.\d+)?)\s*(?:K|°)?\s*', re.IGNORECASE)
+
+
+class FacetIndex:
+    def __init__(self, products: List[Dict[str, Any]], categories: Dict[int, str], variants: pd.DataFrame,
+                 options: pd.DataFrame):
+        """`variants` has product_id plus the RANGE_FACETS columns; `options` has product_id, category_name, option_value, option_label"""
+        self.built_at = time.time()
+        products = sorted((p for p in products if p['id'] in set(variants['product_id'])), key=lambda p: p['id'])
+        self.product_ids = np.array([p['id'] for p in products], dtype=np.int64)
+        self.products = products
+        position = {product_id: index for index, product_id in enumerate(self.product_ids.tolist())}
+
+        variants = variants[variants['product_id'].isin(position)].sort_values(['product_id', 'id'], kind='stable')
+        self.variant_ids = variants['id'].to_numpy(dtype=np.int64)
+        self.row_product = variants['product_id'].map(position).to_numpy(dtype=np.int64)
+        self.starts = np.flatnonzero(np.r_[True, self.row_product[1:] != self.row_product[:-1]])
+
+        self.ranges: Dict[str, Tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+        for facet, column in RANGE_FACETS.items():
+            values = variants[column].astype('float64').to_numpy() if column in variants else np.full(len(variants), np.nan)
+            order = np.argsort(values, kind='stable')  # NaN sorts last
+            finite = int(np.isfinite(values).sum())
+            self.ranges[facet] = (values, order[:finite], values[order[:finite]])
+
+        self.bitmaps: Dict[str, Dict[Any, np.ndarray]] = {'category': {}}
+        self.labels: Dict[str, Dict[Any, str]] = {'category': {}}
+        category_of = np.array([p.get('category_id') or 0 for p in products], dtype=np.int64)
+        for category_id in np.unique(category_of).tolist():
+            self.bitmaps['category'][category_id] = category_of == category_id
+            self.labels['category'][category_id] = categories.get(category_id, str(category_id))
+
+        options = options[options['product_id'].isin(position)]
+        category_name = options['category_name'].astype('string').str.strip().str.lower()
+        for facet, (names, parser, label_format) in OPTION_FACETS.items():
+            self.bitmaps[facet], self.labels[facet] = {}, {}
+            rows = options[category_name.isin(names).fillna(False).to_numpy()]
+            if rows.empty:
+                continue
+            if parser is None:
+                keys = clean_text(rows['option_label']).fillna(clean_text(rows['option_value']))
+            else:
+                keys = parser(rows['option_value']).fillna(parser(rows['option_label']))
+            for key, product_id in zip(keys.tolist(), rows['product_id'].tolist()):
+                if key is None or key is pd.NA or (isinstance(key, float) and np.isnan(key)):
+                    continue
+                key = int(key) if isinstance(key, float) and key.is_integer() else key
+                bitmap = self.bitmaps[facet].get(key)
+                if bitmap is None:
+                    bitmap = self.bitmaps[facet][key] = np.zeros(len(products), dtype=bool)
+                    self.labels[facet][key] = label_format.format(key)
+                bitmap[position[product_id]] = True
+
+    # --- queries ------------------------------------------------------------
+
+    def query(self, filters: Dict[str, Sequence[Any]], ranges: Dict[str, Tuple[Optional[float], Optional[float]]],
+              limit: int = 50, offset: int = 0) -> Dict[str, Any]:
+        """Matching products (by name) and disjunctive counts for every facet"""
+        start = time.perf_counter()
+        for facet in filters:
+            if facet not in self.bitmaps:
+                raise ValueError(f"Unknown facet: {facet}")
+        for facet in ranges:
+            if facet not in self.ranges:
+                raise ValueError(f"Unknown range facet: {facet}")
+
+        row_masks = {facet: self._range_mask(facet, low, high) for facet, (low, high) in ranges.items()
+                     if low is not None or high is not None}
+        product_masks = {facet: self._values_mask(facet, values) for facet, values in filters.items() if values}
+        all_rows = _and(row_masks.values(), len(self.row_product))
+        all_options = _and(product_masks.values(), len(self.product_ids))
+        rolled_up = self._rollup(all_rows)
+        matching = rolled_up & all_options
+
+        facets: Dict[str, Any] = {}
+        for facet, bitmaps in self.bitmaps.items():
+            base = rolled_up & _and((mask for name, mask in product_masks.items() if name != facet), len(self.product_ids))
+            facets[facet] = [{'value': key, 'label': self.labels[facet][key], 'count': int(np.count_nonzero(base & bitmap))}
+                             for key, bitmap in sorted(bitmaps.items(), key=lambda item: _sort_key(item[0]))]
+        options_per_row = all_options[self.row_product]
+        for facet, (values, _, _) in self.ranges.items():
+            rows = _and((mask for name, mask in row_masks.items() if name != facet), len(self.row_product)) & options_per_row
+            reachable = values[rows & np.isfinite(values)]
+            facets[facet] = {
+                'min': float(reachable.min()) if len(reachable) else None,
+                'max': float(reachable.max()) if len(reachable) else None,
+                'products': int(np.count_nonzero(self._rollup(rows))),
+            }
+
+        indices = np.flatnonzero(matching)
+        ordered = sorted(indices.tolist(), key=lambda index: (self.products[index].get('name') or '', index))
+        variant_rows = all_rows & options_per_row
+        results = []
+        for index in ordered[offset:offset + limit]:
+            product = self.products[index]
+            row_slice = slice(self.starts[index], self.starts[index + 1] if index + 1 < len(self.starts) else len(self.row_product))
+            results.append({
+                'id': product['id'], 'name': product.get('name'), 'base_part_code': product.get('base_part_code'),
+                'category_id': product.get('category_id'),
+                'variant_ids': self.variant_ids[row_slice][variant_rows[row_slice]].tolist(),
+            })
+        metrics.observe('facets.query', time.perf_counter() - start)
+        return {'total': len(indices), 'results': results, 'facets': facets}
+
+    def _range_mask(self, facet: str, low: Optional[float], high: Optional[float]) -> np.ndarray:
+        _, order, sorted_values = self.ranges[facet]
+        first = 0 if low is None else int(np.searchsorted(sorted_values, low, side='left'))
+        last = len(sorted_values) if high is None else int(np.searchsorted(sorted_values, high, side='right'))
+        mask = np.zeros(len(self.row_product), dtype=bool)
+        mask[order[first:last]] = True
+        return mask
+
+    def _values_mask(self, facet: str, values: Sequence[Any]) -> np.ndarray:
+        mask = np.zeros(len(self.product_ids), dtype=bool)
+        bitmaps = self.bitmaps[facet]
+        for value in values:
+            key = _coerce(value)
+            if key in bitmaps:
+                mask |= bitmaps[key]
+        return mask
+
+    def _rollup(self, row_mask: np.ndarray) -> np.ndarray:
+        """Per product: does any of its rows match"""
+        if not len(row_mask):
+            return np.zeros(len(self.product_ids), dtype=bool)
+        return np.logical_or.reduceat(row_mask, self.starts)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'products': len(self.product_ids),
+            'variants': len(self.row_product),
+            'values': {facet: len(bitmaps) for facet, bitmaps in self.bitmaps.items()},
+            'age_s': round(time.time() - self.built_at, 1),
+        }
+
+
+class FacetEngine:
+    """Holds the current FacetIndex and rebuilds it after catalog changes"""
+
+    def __init__(self):
+        self._index: Optional[FacetIndex] = None
+        self._generation = 0  # Bumped by every invalidation
+        self._index_generation = 0  # Generation the current index was built from
+        self._lock = threading.Lock()
+
+    @property
+    def _stale(self) -> bool:
+        return self._index_generation != self._generation
+
+    def get(self, client) -> FacetIndex:
+        catalog_invalidations.poll()
+        if self._index is None or self._stale:
+            with self._lock:
+                if self._index is None or self._stale:
+                    # A failed build leaves the index stale, so the next call retries; an invalidation
+                    # arriving during the build leaves it stale too
+                    generation = self._generation
+                    index = self.build(client)
+                    self._index, self._index_generation = index, generation
+        return self._index
+
+    def invalidate(self, product_ids=None):
+        self._generation += 1
+
+    def build(self, client) -> FacetIndex:
+        """Five bulk queries, then vectorized parsing of every option value"""
+        with metrics.timer('facets.build'):
+            products = client.table('products').select('id, name, base_part_code, category_id').eq('is_active', True).execute().data
+            ids = [product['id'] for product in products]
+            categories = {row['id']: row['name'] for row in client.table('categories').select('id, name').execute().data}
+            variants = pd.DataFrame(
+                select_in(client, 'product_variants', 'id, product_id, system_power, system_output, efficiency',
+                           'product_id', ids, active_only=True),
+                columns=['id', 'product_id', 'system_power', 'system_output', 'efficiency'])
+            variants = normalize_variants(variants.astype({'system_power': 'float64', 'system_output': 'float64',
+                                                           'efficiency': 'float64'}))
+            config_categories = select_in(client, 'configuration_categories', 'id, product_id, category_name', 'product_id', ids)
+            options = pd.DataFrame(
+                select_in(client, 'configuration_options', 'category_id, option_value, option_label',
+                           'category_id', [row['id'] for row in config_categories]),
+                columns=['category_id', 'option_value', 'option_label'])
+            categories_frame = pd.DataFrame(config_categories, columns=['id', 'product_id', 'category_name'])
+            options = options.merge(categories_frame, left_on='category_id', right_on='id', how='inner')
+            index = FacetIndex(products, categories, variants, options)
+        print(f"✓ Facet index: {len(index.product_ids)} products, {len(index.row_product)} variants")
+        return index
+
+    def stats(self) -> Dict[str, Any]:
+        index = self._index
+        return {'built': index is not None, 'stale': self._stale, **(index.stats() if index is not None else {})}
+
+
+def _and(masks, size: int) -> np.ndarray:
+    result = np.ones(size, dtype=bool)
+    for mask in masks:
+        result &= mask
+    return result
+
+
+def _coerce(value: Any) -> Any:
+    """Facet keys are ints for parsed quantities; query strings like "2700", "2700K" or "IP65" map onto them"""
+    if isinstance(value, str):
+        quantity = QUANTITY.fullmatch(value)
+        if quantity is None:
+            return value.strip()
+        value = float(quantity.group(1))
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _sort_key(key: Any) -> Tuple[int, Any]:
+    return (0, key) if isinstance(key, (int, float)) else (1, str(key))
+
+
+facet_engine = FacetEngine()
+catalog_invalidations.subscribe(facet_engine.invalidate)
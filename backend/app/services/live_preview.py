@@ -0,0 +1,95 @@
+# backend/app/services/live_preview.py
+"""Incremental HTML datasheet preview for the configurator WebSocket.
+
+A session keeps the current datasheet payload and the fields it resolved to.
+Each option delta is merged into the payload, the fields are resolved again
+and compared with the previous ones, and only the sections that display a
+changed field (DATASHEET_SECTIONS) are rendered and sent. Changes outside the
+sections (product, title, images) resend the whole document.
+
+Rendering signs image references (asset_urls), which can call the storage
+API, so `start` and `apply` are meant to run in a threadpool.
+"""
+import copy
+import time
+from typing import Any, Dict, Optional, Set
+
+from app.services.pdf_generator import DatasheetGenerator, DATASHEET_SECTIONS
+from app.services.render_cache import configuration_key
+
+# field name -> section that displays it
+FIELD_SECTIONS = {field: section for section, (_, fields) in DATASHEET_SECTIONS.items() for field in fields}
+
+
+class LivePreviewSession:
+    """State for one configurator connection"""
+
+    def __init__(self, generator: Optional[DatasheetGenerator] = None):
+        self.generator = generator or DatasheetGenerator()
+        self.payload: Optional[Dict[str, Any]] = None
+        self.fields: Optional[Dict[str, Any]] = None
+        self.seq = 0
+
+    def start(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Take a full payload (same shape as /generate-datasheet) and return the whole document"""
+        self.payload = copy.deepcopy(payload)
+        self.payload.setdefault('selected_options', {})
+        return self._document_message(time.perf_counter())
+
+    def apply(self, changes: Dict[str, Any]) -> Dict[str, Any]:
+        """Merge a delta and return only the sections whose displayed values changed.
+
+        `selected_options` is merged per configuration category (a null value
+        clears that category); every other key replaces the previous value.
+        """
+        if self.payload is None:
+            raise ValueError("Send an init message before deltas")
+        start = time.perf_counter()
+
+        # Only top-level keys and option entries are replaced, so a shallow copy keeps a failed delta from sticking
+        payload = dict(self.payload, selected_options=dict(self.payload['selected_options']))
+        for key, value in changes.items():
+            if key == 'selected_options':
+                for category, option in (value or {}).items():
+                    if option is None:
+                        payload['selected_options'].pop(category, None)
+                    else:
+                        payload['selected_options'][category] = option
+            else:
+                payload[key] = value
+
+        previous = self.fields
+        fields = self.generator._extract_datasheet_fields(payload)
+        self.payload = payload
+        changed = {name for name in fields if fields[name] != previous.get(name)}
+        if any(name not in FIELD_SECTIONS for name in changed):
+            return self._document_message(start, fields)
+
+        sections = self._sections_for(changed)
+        self.fields = fields
+        self.seq += 1
+        signed = self.generator._with_signed_urls(fields)
+        return {
+            'type': 'sections',
+            'seq': self.seq,
+            'configuration_key': configuration_key(fields),
+            'sections': {key: self.generator._render_section(key, signed) for key in sections},
+            'render_ms': round((time.perf_counter() - start) * 1000, 2),
+        }
+
+    def _sections_for(self, changed: Set[str]) -> list:
+        # Keep document order so the client can apply them top to bottom
+        wanted = {FIELD_SECTIONS[name] for name in changed}
+        return [key for key in DATASHEET_SECTIONS if key in wanted]
+
+    def _document_message(self, start: float, fields: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        self.fields = fields or self.generator._extract_datasheet_fields(self.payload)
+        self.seq += 1
+        return {
+            'type': 'document',
+            'seq': self.seq,
+            'configuration_key': configuration_key(self.fields),
+            'html': self.generator._phos_document([self.generator._render_phos_page(self.fields)]),
+            'sections': list(DATASHEET_SECTIONS),
+            'render_ms': round((time.perf_counter() - start) * 1000, 2),
+        }
@@ -0,0 +1,116 @@
+# backend/app/services/metrics.py
+"""Lightweight in-process metrics: counters, latency percentiles and cache stats.
+
+Exposed as JSON on GET /metrics. Latencies keep the most recent samples per
+name, which is enough to check p50/p95 against a target without an external
+metrics stack.
+"""
+import math
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, List, Optional
+
+LATENCY_SAMPLES = 2048
+WORKER_STATS_INTERVAL_S = 30
+
+
+def _percentile(sorted_samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_samples:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_samples)))
+    return sorted_samples[min(rank, len(sorted_samples)) - 1]
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, int] = defaultdict(int)
+        self._latencies: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=LATENCY_SAMPLES))
+        self._targets: Dict[str, float] = {}
+        self._caches: Dict[str, Any] = {}
+        self._published_at = 0.0
+
+    def increment(self, name: str, amount: int = 1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def observe(self, name: str, seconds: float):
+        with self._lock:
+            self._latencies[name].append(seconds * 1000)
+
+    @contextmanager
+    def timer(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def set_target(self, name: str, p95_ms: float):
+        """Declare a p95 latency target; the snapshot reports whether it is met"""
+        self._targets[name] = p95_ms
+
+    def register_cache(self, cache):
+        """Any object with .name and .stats() (see render_cache.LRUCache)"""
+        self._caches[cache.name] = cache
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self._counters)
+            latencies = {name: sorted(samples) for name, samples in self._latencies.items()}
+
+        latency_report = {}
+        for name, samples in latencies.items():
+            entry = {
+                'count': len(samples),
+                'p50_ms': round(_percentile(samples, 50), 2),
+                'p95_ms': round(_percentile(samples, 95), 2),
+                'p99_ms': round(_percentile(samples, 99), 2),
+                'max_ms': round(samples[-1], 2) if samples else 0.0,
+            }
+            target = self._targets.get(name)
+            if target is not None:
+                entry['target_p95_ms'] = target
+                entry['within_target'] = entry['p95_ms'] <= target
+            latency_report[name] = entry
+
+        report = {
+            'counters': counters,
+            'latency': latency_report,
+            'caches': {name: cache.stats() for name, cache in self._caches.items()},
+        }
+        shared = {name: cache.shared.stats() for name, cache in self._caches.items() if getattr(cache, 'shared', None)}
+        if shared:
+            from app.services.shared_cache import read_worker_stats
+            self.publish_worker_stats(force=True)
+            report['shared_caches'] = shared
+            report['workers'] = read_worker_stats()
+        return report
+
+    def publish_worker_stats(self, force: bool = False):
+        """Share this worker's cache hit rates with the other workers on the host (at most every 30s)"""
+        now = time.monotonic()
+        if not force and now - self._published_at < WORKER_STATS_INTERVAL_S:
+            return
+        self._published_at = now
+        from app.services.shared_cache import publish_worker_stats
+        try:
+            publish_worker_stats({'caches': {name: cache.stats() for name, cache in self._caches.items()}})
+        except OSError as e:
+            print(f"Could not publish worker stats: {str(e)}")
+
+    def get_counter(self, name: str) -> int:
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def reset(self, prefix: Optional[str] = None):
+        with self._lock:
+            for store in (self._counters, self._latencies):
+                for name in [n for n in store if prefix is None or n.startswith(prefix)]:
+                    del store[name]
+
+
+metrics = Metrics()
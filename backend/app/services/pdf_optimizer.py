@@ -0,0 +1,208 @@
+# backend/app/services/pdf_optimizer.py
+"""Optional post-render optimization of generated PDFs.
+
+Levels (each includes the previous ones):
+
+    0  off - bytes are returned exactly as the renderer wrote them
+    1  recompress content streams and merge identical objects (images, fonts)
+    2  also drop page resources the content never uses and orphaned objects
+    3  also pack objects into compressed object streams (needs pikepdf)
+
+Every optimized file is checked against the original before it is returned:
+each page's decoded content stream and every resource it draws with must be
+byte-for-byte identical after decoding. If that check fails the original PDF
+is returned unchanged.
+"""
+import hashlib
+import time
+from io import BytesIO
+from typing import Any, Dict, List, Optional, Tuple
+
+from pypdf import PdfReader, PdfWriter
+from pypdf.generic import ContentStream, DictionaryObject, IndirectObject, NameObject, StreamObject
+
+from app.core.config import settings
+
+try:
+    import pikepdf
+except ImportError:  # Level 3 is skipped without it
+    pikepdf = None
+
+MAX_LEVEL = 3
+
+# Resource categories and the content-stream operators that reference them
+RESOURCE_OPERATORS = {
+    '/Font': (b'Tf',),
+    '/XObject': (b'Do',),
+    '/ExtGState': (b'gs',),
+    '/Shading': (b'sh',),
+    '/Pattern': (b'scn', b'SCN'),
+    '/ColorSpace': (b'cs', b'CS'),
+}
+
+
+def _used_resource_names(page, reader) -> Dict[str, set]:
+    """Names each resource category is referenced by in the page content"""
+    used: Dict[str, set] = {category: set() for category in RESOURCE_OPERATORS}
+    for operands, operator in ContentStream(page.get_contents(), reader).operations:
+        for category, operators in RESOURCE_OPERATORS.items():
+            if operator in operators:
+                used[category].update(str(op) for op in operands if isinstance(op, NameObject))
+    return used
+
+
+def strip_unused_resources(writer: PdfWriter) -> int:
+    """Give every page a resource dictionary holding only what its content uses; returns entries dropped"""
+    dropped = 0
+    for page in writer.pages:
+        resources = page.get('/Resources')
+        if resources is None or page.get_contents() is None:
+            continue
+        resources = resources.get_object()
+        used = _used_resource_names(page, writer)
+
+        # Build a fresh dictionary rather than editing one that other pages may share
+        trimmed = DictionaryObject()
+        for key, value in resources.items():
+            if key in used and isinstance(value.get_object(), DictionaryObject):
+                entries = DictionaryObject({name: ref for name, ref in value.get_object().items() if name in used[key]})
+                dropped += len(value.get_object()) - len(entries)
+                if entries:
+                    trimmed[NameObject(key)] = entries
+            else:
+                trimmed[NameObject(key)] = value
+        page[NameObject('/Resources')] = trimmed
+    return dropped
+
+
+def optimize_writer(writer: PdfWriter, level: int) -> List[str]:
+    """Apply the pypdf-based steps (levels 1-2) to a writer in place; returns the steps applied"""
+    steps = []
+    if level >= 1:
+        for page in writer.pages:
+            page.compress_content_streams(level=9)
+        steps.append('compress_content_streams')
+    if level >= 2:
+        dropped = strip_unused_resources(writer)
+        steps.append(f'strip_unused_resources({dropped})')
+    if level >= 1:
+        writer.compress_identical_objects(remove_identicals=True, remove_orphans=level >= 2)
+        steps.append('dedupe_identical_objects' + ('+orphans' if level >= 2 else ''))
+    return steps
+
+
+def _pack_object_streams(pdf_bytes: bytes) -> bytes:
+    output = BytesIO()
+    with pikepdf.open(BytesIO(pdf_bytes)) as pdf:
+        pdf.save(output, object_stream_mode=pikepdf.ObjectStreamMode.generate,
+                 compress_streams=True, recompress_flate=True)
+    return output.getvalue()
+
+
+def _resolved_digest(obj, hasher, seen: set):
+    """Feed a resource's decoded content into `hasher`, following references"""
+    if isinstance(obj, IndirectObject):
+        # Identical objects may have been merged, so hash what they contain, not their numbers
+        key = (obj.idnum, obj.generation)
+        if key in seen:
+            hasher.update(b'cycle')
+            return
+        seen.add(key)
+        try:
+            _resolved_digest(obj.get_object(), hasher, seen)
+        finally:
+            seen.discard(key)
+        return
+    if isinstance(obj, StreamObject):
+        hasher.update(b'stream')
+        hasher.update(obj.get_data())
+        # /Length and /Filter describe the encoding, not what is drawn
+        items = [(k, v) for k, v in obj.items() if k not in ('/Length', '/Filter', '/DecodeParms')]
+    elif isinstance(obj, dict):
+        items = list(obj.items())
+    else:
+        items = None
+
+    if items is not None:
+        for k, v in sorted(items, key=lambda item: str(item[0])):
+            hasher.update(str(k).encode('latin-1'))
+            _resolved_digest(v, hasher, seen)
+    elif isinstance(obj, list):
+        for item in obj:
+            _resolved_digest(item, hasher, seen)
+    else:
+        hasher.update(repr(obj).encode('utf-8'))
+
+
+def page_fingerprints(pdf_bytes: bytes) -> List[str]:
+    """Per-page digest of the decoded content and every resource the content draws with"""
+    reader = PdfReader(BytesIO(pdf_bytes))
+    fingerprints = []
+    for page in reader.pages:
+        hasher = hashlib.sha256()
+        contents = page.get_contents()
+        hasher.update(contents.get_data() if contents is not None else b'')
+        hasher.update(repr([float(v) for v in page.mediabox]).encode('ascii'))
+        resources = page.get('/Resources')
+        if resources is not None and contents is not None:
+            resources = resources.get_object()
+            for category, names in _used_resource_names(page, reader).items():
+                category_dict = resources.get(category)
+                for name in sorted(names):
+                    hasher.update(f'{category}{name}'.encode('latin-1'))
+                    if category_dict is not None and name in category_dict.get_object():
+                        _resolved_digest(category_dict.get_object().raw_get(name), hasher, set())
+        fingerprints.append(hasher.hexdigest())
+    return fingerprints
+
+
+def optimize_pdf(pdf_bytes: bytes, level: Optional[int] = None, verify: Optional[bool] = None) -> Tuple[bytes, Dict[str, Any]]:
+    """Optimize rendered PDF bytes; returns (bytes, report with bytes saved and time spent)"""
+    level = settings.pdf_optimize_level if level is None else level
+    level = max(0, min(MAX_LEVEL, int(level)))
+    verify = settings.pdf_optimize_verify if verify is None else verify
+    report: Dict[str, Any] = {
+        'level': level,
+        'original_bytes': len(pdf_bytes),
+        'optimized_bytes': len(pdf_bytes),
+        'bytes_saved': 0,
+        'elapsed_ms': 0.0,
+        'steps': [],
+        'verified': None,
+    }
+    if level == 0:
+        return pdf_bytes, report
+
+    start = time.perf_counter()
+    try:
+        writer = PdfWriter(clone_from=PdfReader(BytesIO(pdf_bytes)))
+        report['steps'] = optimize_writer(writer, level)
+        output = BytesIO()
+        writer.write(output)
+        optimized = output.getvalue()
+
+        if level >= 3:
+            if pikepdf is None:
+                report['steps'].append('object_streams(skipped: pikepdf not installed)')
+            else:
+                optimized = _pack_object_streams(optimized)
+                report['steps'].append('object_streams')
+
+        if verify:
+            report['verified'] = page_fingerprints(optimized) == page_fingerprints(pdf_bytes)
+            if not report['verified']:
+                print("WARNING: optimized PDF does not match the original page content - keeping the original")
+                optimized = pdf_bytes
+        if len(optimized) >= len(pdf_bytes):
+            optimized = pdf_bytes
+    except Exception as e:
+        print(f"PDF optimization failed, keeping the original: {str(e)}")
+        report['error'] = str(e)
+        optimized = pdf_bytes
+
+    report['optimized_bytes'] = len(optimized)
+    report['bytes_saved'] = len(pdf_bytes) - len(optimized)
+    report['elapsed_ms'] = round((time.perf_counter() - start) * 1000, 2)
+    print(f"✓ PDF optimize level {level}: {report['original_bytes']} -> {report['optimized_bytes']} bytes "
+          f"({report['bytes_saved']} saved) in {report['elapsed_ms']}ms")
+    return optimized, report
@@ -0,0 +1,109 @@
+# backend/app/services/preview.py
+"""Screen-resolution thumbnails of datasheet page one for the configurator.
+
+Lookup order, fastest first:
+
+1. preview cache, keyed by configuration key + format + width;
+2. a PDF already cached for the configuration (a download or an earlier preview),
+   rasterized with pdfium;
+3. a stamped PDF (cached base page + overlay, see template_stamper), rasterized
+   with pdfium and kept in the PDF cache;
+4. without pdfium: Flying Saucer's Java2DRenderer on the HTML, a reduced-fidelity
+   image without the running header and footer.
+"""
+import time
+from io import BytesIO
+from typing import Any, Dict, Optional, Tuple
+
+from PIL import Image
+
+from app.core.config import settings
+from app.services.metrics import metrics
+from app.services.pdf_generator import DatasheetGenerator
+from app.services.render_cache import configuration_key, pdf_cache, pdf_cache_key, preview_cache
+from app.services.template_stamper import StampingNotPossible, template_stamper
+
+try:
+    import pypdfium2 as pdfium
+except ImportError:  # Falls back to the Java2D preview
+    pdfium = None
+
+PREVIEW_FORMATS = {'png': 'image/png', 'webp': 'image/webp'}
+
+metrics.set_target('preview.total', settings.preview_latency_target_ms)
+
+
+class DatasheetPreviewer:
+    def __init__(self, generator: Optional[DatasheetGenerator] = None):
+        self.generator = generator or template_stamper.generator
+
+    def render_preview(self, product_data: Dict[str, Any], image_format: str = 'webp',
+                       width: Optional[int] = None) -> Tuple[bytes, Dict[str, Any]]:
+        """Return (image bytes, info) where info has the configuration key, cache source and timing"""
+        start = time.perf_counter()
+        image_format = image_format.lower()
+        if image_format not in PREVIEW_FORMATS:
+            raise ValueError(f"Unsupported preview format: {image_format}")
+        width = max(100, min(width or settings.preview_default_width, settings.preview_max_width))
+
+        fields = self.generator._extract_datasheet_fields(product_data)
+        config_key = configuration_key(fields)
+        cache_key = (config_key, image_format, width)
+
+        image_bytes = preview_cache.get(cache_key)
+        source = 'preview_cache'
+        if image_bytes is None:
+            image, source = self._page_one_image(product_data, config_key, width)
+            image_bytes = self._encode(image, image_format)
+            preview_cache.put(cache_key, image_bytes)
+
+        elapsed = time.perf_counter() - start
+        metrics.observe('preview.total', elapsed)
+        metrics.observe(f'preview.{source}', elapsed)
+        return image_bytes, {
+            'configuration_key': config_key,
+            'source': source,
+            'render_ms': round(elapsed * 1000, 2),
+            'media_type': PREVIEW_FORMATS[image_format],
+        }
+
+    def _page_one_image(self, product_data: Dict[str, Any], config_key: str, width: int) -> Tuple[Image.Image, str]:
+        if pdfium is None:
+            html_content = self.generator._create_phos_style_html(product_data)
+            png = self.generator.render_preview_png(html_content, width)
+            return Image.open(BytesIO(png)), 'java2d'
+
+        for level in {0, settings.pdf_optimize_level}:
+            pdf_data = pdf_cache.peek(pdf_cache_key(config_key, level))
+            if pdf_data is not None:
+                return self._rasterize(pdf_data, width), 'pdf_cache'
+
+        try:
+            pdf_data = template_stamper.stamp(product_data)
+            source = 'stamped'
+        except StampingNotPossible as e:
+            print(f"Preview: stamping not possible ({e}) - using full render")
+            pdf_data = self.generator.render_html(self.generator._create_phos_style_html(product_data))
+            source = 'full_render'
+        pdf_cache.put(pdf_cache_key(config_key, 0), pdf_data)
+        return self._rasterize(pdf_data, width), source
+
+    def _rasterize(self, pdf_data: bytes, width: int) -> Image.Image:
+        document = pdfium.PdfDocument(pdf_data)
+        try:
+            page = document[0]
+            bitmap = page.render(scale=width / page.get_width())
+            return bitmap.to_pil()
+        finally:
+            document.close()
+
+    def _encode(self, image: Image.Image, image_format: str) -> bytes:
+        output = BytesIO()
+        if image_format == 'webp':
+            image.convert('RGB').save(output, format='WEBP', quality=80, method=4)
+        else:
+            image.save(output, format='PNG')
+        return output.getvalue()
+
+
+datasheet_previewer = DatasheetPreviewer()
@@ -0,0 +1,169 @@
+# backend/app/services/render_cache.py
+"""In-process caches for rendered datasheets, previews and catalog reads.
+
+Entries are keyed by the configuration key: a digest of exactly what ends up
+on the page (the resolved datasheet fields plus the template version), so two
+requests that would render the same datasheet share one entry no matter how
+the payload was shaped.
+
+With `shared_cache_dir` set (several workers on one host), each cache is
+backed by a shared_cache namespace. The in-process LRU keeps the entries this
+worker uses, writes go to both, and an in-process hit is only trusted while
+the shared entry still carries the same stamp. So a discard or re-render in
+one worker is seen by all of them.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from contextlib import nullcontext
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from app.core.config import settings
+from app.services.metrics import metrics
+from app.services.pdf_generator import TEMPLATE_VERSION
+from app.services.shared_cache import SharedDiskCache, shared_tier
+
+
+def configuration_key(fields: Dict[str, Any]) -> str:
+    """Stable key for resolved datasheet fields (see DatasheetGenerator._extract_datasheet_fields)"""
+    payload = json.dumps({'template': TEMPLATE_VERSION, 'fields': fields}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+
+
+class LRUCache:
+    """Thread-safe LRU cache of byte strings bounded by total size, with hit/miss counters"""
+
+    def __init__(self, name: str, max_bytes: int, shared: Optional[SharedDiskCache] = None):
+        self.name = name
+        self.max_bytes = max_bytes
+        self.shared = shared
+        self._entries: "OrderedDict[Hashable, bytes]" = OrderedDict()
+        self._expires: Dict[Hashable, float] = {}
+        self._stamps: Dict[Hashable, int] = {}
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        value, from_shared = self._read(key, touch=True)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.shared_hits += from_shared
+        if self.shared is not None:
+            metrics.publish_worker_stats()
+        return value
+
+    def peek(self, key: Hashable) -> Optional[bytes]:
+        """Look up without touching recency or the hit/miss counters"""
+        return self._read(key, touch=False)[0]
+
+    def put(self, key: Hashable, value: bytes, ttl: Optional[float] = None):
+        """Store a value; with `ttl` (seconds) it expires even if it is still recently used"""
+        if len(value) > self.max_bytes:
+            return
+        stamp = self.shared.put(key, value, ttl) if self.shared is not None else None
+        self._store(key, value, ttl, stamp)
+
+    def discard(self, key: Hashable):
+        with self._lock:
+            self._remove(key)
+        if self.shared is not None:
+            self.shared.discard(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._expires.clear()
+            self._stamps.clear()
+            self._size = 0
+        if self.shared is not None:
+            self.shared.clear()
+
+    def compute_lock(self, key: Hashable):
+        """Serializes computing `key` across the host's workers (a no-op without a shared tier)"""
+        return self.shared.compute_lock(key) if self.shared is not None else nullcontext()
+
+    def _read(self, key: Hashable, touch: bool) -> Tuple[Optional[bytes], bool]:
+        """(value, came from the shared tier)"""
+        with self._lock:
+            value = self._live_value(key)
+            stamp = self._stamps.get(key)
+            if value is not None and touch:
+                self._entries.move_to_end(key)
+        if self.shared is None:
+            return value, False
+        # One stat() tells whether another worker replaced or dropped the entry since we copied it
+        if value is not None and self.shared.stamp(key) == stamp:
+            return value, False
+        entry = self.shared.get(key)
+        if entry is None:
+            if value is not None:
+                with self._lock:
+                    self._remove(key)
+            return None, False
+        value, stamp, ttl = entry
+        self._store(key, value, ttl, stamp)
+        return value, True
+
+    def _store(self, key: Hashable, value: bytes, ttl: Optional[float], stamp: Optional[int]):
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = value
+            self._size += len(value)
+            if ttl is not None:
+                self._expires[key] = time.monotonic() + ttl
+            if stamp is not None:
+                self._stamps[key] = stamp
+            while self._size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _live_value(self, key: Hashable) -> Optional[bytes]:
+        expires = self._expires.get(key)
+        if expires is not None and expires <= time.monotonic():
+            self._remove(key)
+            return None
+        return self._entries.get(key)
+
+    def _remove(self, key: Hashable):
+        value = self._entries.pop(key, None)
+        if value is not None:
+            self._size -= len(value)
+        self._expires.pop(key, None)
+        self._stamps.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._size,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'shared_hits': self.shared_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+def pdf_cache_key(config_key: str, optimize_level: int) -> str:
+    return f"{config_key}:o{optimize_level}"
+
+
+pdf_cache = LRUCache('pdf', settings.pdf_cache_max_mb * 1024 * 1024, shared_tier('pdf'))
+preview_cache = LRUCache('preview', settings.preview_cache_max_mb * 1024 * 1024, shared_tier('preview'))
+# Serialized product-details responses (see catalog_service.get_product_details_cached)
+catalog_cache = LRUCache('catalog', settings.catalog_cache_max_mb * 1024 * 1024, shared_tier('catalog'))
+
+metrics.register_cache(pdf_cache)
+metrics.register_cache(preview_cache)
+metrics.register_cache(catalog_cache)
@@ -0,0 +1,77 @@
+# backend/app/services/saved_configurations.py
+"""Listing and searching saved configurations (user_configurations) page by page.
+
+Pages are keyset-paginated on `id`, newest first: the cursor is the last id
+of the previous page, and the next page asks for `id < cursor`. Ids are
+unique and increasing, so the ordering is stable under concurrent saves and
+every page is an index range scan of the same cost. OFFSET would instead read
+and discard all earlier rows.
+
+Filters (user, product, part-code prefix, created_at range, text search) are
+plain PostgREST filters. The indexes that keep them on a range scan:
+
+    create index user_configurations_user_id_idx on user_configurations (user_id, id desc);
+    create index user_configurations_user_product_idx on user_configurations (user_id, product_id, id desc);
+    create index user_configurations_part_code_idx on user_configurations (final_part_code text_pattern_ops);
+"""
+import base64
+import binascii
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+
+LIST_COLUMNS = ('id, user_id, product_id, variant_id, configuration_name, notes, final_part_code, '
+                'final_price, selected_options, selected_accessories, created_at')
+
+
+def encode_cursor(last_id: int) -> str:
+    return base64.urlsafe_b64encode(str(last_id).encode('ascii')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        return int(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('ascii'))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError("Invalid cursor")
+
+
+def _like_literal(text: str) -> str:
+    """Text matched literally inside a LIKE pattern ('*' is PostgREST's wildcard)"""
+    for char in ('\\', '%', '_'):
+        text = text.replace(char, '\\' + char)
+    return text.replace('*', '')
+
+
+def list_saved_configurations(client, user_id: Optional[str] = None, product_id: Optional[int] = None,
+                              part_code_prefix: Optional[str] = None, created_from: Optional[str] = None,
+                              created_to: Optional[str] = None, search: Optional[str] = None,
+                              cursor: Optional[str] = None, limit: Optional[int] = None) -> Dict[str, Any]:
+    """One page of saved configurations, newest first, with the cursor of the next page (None on the last)"""
+    limit = max(1, min(limit or settings.saved_configurations_page_size, settings.saved_configurations_max_page_size))
+    query = client.table('user_configurations').select(LIST_COLUMNS)
+    if user_id is not None:
+        query = query.eq('user_id', user_id)
+    if product_id is not None:
+        query = query.eq('product_id', product_id)
+    if part_code_prefix:
+        query = query.like('final_part_code', f"{_like_literal(part_code_prefix)}*")
+    if created_from:
+        query = query.gte('created_at', created_from)
+    if created_to:
+        query = query.lt('created_at', created_to)
+    if search:
+        # Quoted for PostgREST's or= syntax, which unescapes backslashes once more
+        term = _like_literal(search.replace('"', '').strip()).replace('\\', '\\\\')
+        query = query.or_(','.join(f'{column}.ilike."*{term}*"' for column in ('configuration_name', 'notes', 'final_part_code')))
+    if cursor:
+        query = query.lt('id', decode_cursor(cursor))
+
+    # One extra row tells us whether another page exists without a count(*)
+    rows = query.order('id', desc=True).limit(limit + 1).execute().data
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return {
+        'items': rows,
+        'next_cursor': encode_cursor(rows[-1]['id']) if has_more else None,
+        'limit': limit,
+    }
@@ -0,0 +1,342 @@
+# backend/app/services/shared_cache.py
+"""Host-wide cache tier shared by all worker processes.
+
+Each namespace (pdf, preview, catalog) is a directory under
+`settings.shared_cache_dir`. /dev/shm keeps it in memory, and any local disk
+works. An entry is one file named after the SHA-256 of its key: an 8-byte
+expiry timestamp (0 = none) followed by the value. Writers publish through a
+temp file and `os.replace`, so readers never see a partial entry and need no
+lock. The file's mtime doubles as a version stamp, which lets render_cache
+drop in-process copies that another worker replaced or discarded.
+
+Locks are advisory file locks (fcntl on POSIX, msvcrt on Windows):
+
+- `compute_lock(key)` makes one worker on the host compute a missing entry
+  while the others wait, then read its result;
+- eviction (oldest published first, down to `shared_cache_max_mb` per
+  namespace) runs in whichever worker grabs the namespace lock; the rest
+  skip it.
+
+`InvalidationFeed` passes "these products changed" between workers for
+in-process state that has no shared copy (the configuration matrix, search
+and facet indexes). Each publish is one numbered file; a `generation` file
+holds the latest number, so checking for news costs one stat.
+"""
+import hashlib
+import json
+import os
+import struct
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Hashable, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from app.core.config import settings
+
+HEADER = struct.Struct('>d')
+SWEEP_EVERY_BYTES_FRACTION = 0.1
+WORKER_STATS_DIR = 'workers'
+INVALIDATIONS_KEPT = 1000
+
+
+def atomic_write(path: str, data: bytes):
+    """Write `data` to `path` so other processes see the old file or the new one, never a mix"""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as tmp:
+            tmp.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+@contextmanager
+def file_lock(path: str, blocking: bool = True) -> Iterator[bool]:
+    """Exclusive advisory lock on `path`; yields False (without waiting) if `blocking` is off and it's taken"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    locked = False
+    try:
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            else:
+                msvcrt.locking(fd, msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+            locked = True
+        except OSError:
+            if blocking:
+                raise
+        yield locked
+    finally:
+        if locked:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+        os.close(fd)
+
+
+class SharedDiskCache:
+    def __init__(self, root: str, name: str, max_bytes: int):
+        self.name = name
+        self.directory = os.path.join(root, name)
+        self.max_bytes = max_bytes
+        self._written_since_sweep = 0
+        os.makedirs(self.directory, exist_ok=True)
+
+    def path(self, key: Hashable) -> str:
+        digest = _digest(key)
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def stamp(self, key: Hashable) -> Optional[int]:
+        """Version of the published entry (mtime in ns), or None if there is none"""
+        try:
+            return os.stat(self.path(key)).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def get(self, key: Hashable) -> Optional[Tuple[bytes, int, Optional[float]]]:
+        """(value, stamp, seconds left or None), or None when missing or expired"""
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as entry:
+                stamp = os.fstat(entry.fileno()).st_mtime_ns
+                data = entry.read()
+        except FileNotFoundError:
+            return None
+        if len(data) < HEADER.size:
+            return None
+        expires_at = HEADER.unpack_from(data)[0]
+        remaining = expires_at - time.time() if expires_at else None
+        if remaining is not None and remaining <= 0:
+            self._unlink(path)
+            return None
+        return data[HEADER.size:], stamp, remaining
+
+    def put(self, key: Hashable, value: bytes, ttl: Optional[float] = None) -> Optional[int]:
+        if len(value) > self.max_bytes:
+            return None
+        path = self.path(key)
+        atomic_write(path, HEADER.pack(time.time() + ttl if ttl is not None else 0.0) + value)
+        self._written_since_sweep += len(value)
+        if self._written_since_sweep > self.max_bytes * SWEEP_EVERY_BYTES_FRACTION:
+            self.sweep()
+        return self.stamp(key)
+
+    def discard(self, key: Hashable):
+        self._unlink(self.path(key))
+
+    def clear(self):
+        with file_lock(os.path.join(self.directory, '.lock')):
+            for path, _, _ in self._entries():
+                self._unlink(path)
+
+    @contextmanager
+    def compute_lock(self, key: Hashable):
+        """Held while this worker computes `key`; other workers block here, then find the published entry"""
+        # Striped over 256 lock files: per-key lock files could never be deleted safely
+        with file_lock(os.path.join(self.directory, f".compute-{_digest(key)[:2]}.lock")):
+            yield
+
+    def sweep(self) -> int:
+        """Drop expired entries, then the oldest until the namespace fits; returns bytes freed"""
+        self._written_since_sweep = 0
+        freed = 0
+        with file_lock(os.path.join(self.directory, '.lock'), blocking=False) as locked:
+            if not locked:
+                return 0  # Another worker is sweeping
+            entries = sorted(self._entries(), key=lambda entry: entry[2])
+            total = sum(size for _, size, _ in entries)
+            now = time.time()
+            for path, size, _ in entries:
+                if total <= self.max_bytes and not self._expired(path, now):
+                    continue
+                self._unlink(path)
+                total -= size
+                freed += size
+        return freed
+
+    def stats(self) -> Dict[str, Any]:
+        entries = list(self._entries())
+        return {'directory': self.directory, 'entries': len(entries),
+                'bytes': sum(size for _, size, _ in entries), 'max_bytes': self.max_bytes}
+
+    def _entries(self) -> Iterator[Tuple[str, int, int]]:
+        """(path, size, mtime_ns) of every published entry"""
+        for folder, _, files in os.walk(self.directory):
+            for file_name in files:
+                if file_name.startswith('.'):
+                    continue
+                path = os.path.join(folder, file_name)
+                try:
+                    info = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield path, info.st_size, info.st_mtime_ns
+
+    def _expired(self, path: str, now: float) -> bool:
+        try:
+            with open(path, 'rb') as entry:
+                header = entry.read(HEADER.size)
+        except FileNotFoundError:
+            return False
+        expires_at = HEADER.unpack(header)[0] if len(header) == HEADER.size else 0
+        return bool(expires_at) and expires_at <= now
+
+    def _unlink(self, path: str):
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+
+def shared_tier(name: str) -> Optional[SharedDiskCache]:
+    """The shared namespace for a cache, or None in single-process mode (shared_cache_dir unset)"""
+    if not settings.shared_cache_dir:
+        return None
+    return SharedDiskCache(settings.shared_cache_dir, name, settings.shared_cache_max_mb * 1024 * 1024)
+
+
+def publish_worker_stats(stats: Dict[str, Any]):
+    if settings.shared_cache_dir:
+        path = os.path.join(settings.shared_cache_dir, WORKER_STATS_DIR, f"{os.getpid()}.json")
+        atomic_write(path, json.dumps({'pid': os.getpid(), 'updated_at': time.time(), **stats}).encode('utf-8'))
+
+
+def read_worker_stats() -> Dict[str, Any]:
+    """Last published stats of every live worker on this host, by pid"""
+    workers = {}
+    directory = os.path.join(settings.shared_cache_dir, WORKER_STATS_DIR)
+    if not settings.shared_cache_dir or not os.path.isdir(directory):
+        return workers
+    for file_name in os.listdir(directory):
+        if not file_name.endswith('.json'):
+            continue
+        path = os.path.join(directory, file_name)
+        try:
+            with open(path, 'rb') as report:
+                stats = json.loads(report.read())
+        except (OSError, ValueError):
+            continue
+        if not _alive(stats):
+            os.unlink(path)
+            continue
+        workers[str(stats['pid'])] = stats
+    return workers
+
+
+class InvalidationFeed:
+    """Product-change notices for in-process indexes, shared by every worker on the host.
+
+    `publish(ids)` calls this worker's subscribers right away and, with
+    `shared_cache_dir` set, records the ids under the next generation number.
+    Other workers pick them up in `poll()`, which the indexes call before
+    serving. A worker that fell more than INVALIDATIONS_KEPT generations
+    behind gets `None` (everything may have changed).
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._subscribers: List[Callable[[Optional[List[int]]], None]] = []
+        self._lock = threading.Lock()
+        self._seen_stamp: Optional[int] = None
+        self._seen_generation = self._read_generation()
+
+    @property
+    def directory(self) -> Optional[str]:
+        return os.path.join(settings.shared_cache_dir, self.name) if settings.shared_cache_dir else None
+
+    def subscribe(self, callback: Callable[[Optional[List[int]]], None]):
+        """`callback(product_ids)`; product_ids is None when every product must be treated as changed"""
+        self._subscribers.append(callback)
+
+    def publish(self, product_ids: Iterable[int]):
+        product_ids = sorted(set(product_ids))
+        self._notify(product_ids)
+        directory = self.directory
+        if directory is None or not product_ids:
+            return
+        with file_lock(os.path.join(directory, '.lock')):
+            generation = self._read_generation() + 1
+            atomic_write(os.path.join(directory, f"{generation:012d}.json"), json.dumps(product_ids).encode('utf-8'))
+            atomic_write(os.path.join(directory, 'generation'), str(generation).encode('ascii'))
+            stale = os.path.join(directory, f"{generation - INVALIDATIONS_KEPT:012d}.json")
+            if os.path.exists(stale):
+                os.unlink(stale)
+        with self._lock:
+            if self._seen_generation == generation - 1:
+                self._seen_generation = generation  # Our own notice; nothing to replay
+
+    def poll(self):
+        """Apply notices other workers published since the last poll"""
+        directory = self.directory
+        if directory is None:
+            return
+        try:
+            stamp = os.stat(os.path.join(directory, 'generation')).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if stamp == self._seen_stamp:
+            return
+        with self._lock:
+            if stamp == self._seen_stamp:
+                return
+            latest = self._read_generation()
+            changed: Optional[set] = set() if latest - self._seen_generation <= INVALIDATIONS_KEPT else None
+            for generation in range(self._seen_generation + 1, latest + 1 if changed is not None else 0):
+                try:
+                    with open(os.path.join(directory, f"{generation:012d}.json"), 'rb') as notice:
+                        changed.update(json.loads(notice.read()))
+                except (FileNotFoundError, ValueError):
+                    changed = None  # Pruned before we read it
+                    break
+            self._seen_generation = latest
+            self._seen_stamp = stamp
+        if changed is None or changed:
+            self._notify(sorted(changed) if changed is not None else None)
+
+    def _notify(self, product_ids: Optional[List[int]]):
+        for callback in self._subscribers:
+            try:
+                callback(product_ids)
+            except Exception as e:
+                print(f"Invalidation subscriber failed: {str(e)}")
+
+    def _read_generation(self) -> int:
+        directory = self.directory
+        if directory is None:
+            return 0
+        try:
+            with open(os.path.join(directory, 'generation'), 'rb') as current:
+                return int(current.read() or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+
+def _alive(stats: Dict[str, Any]) -> bool:
+    if fcntl is None:
+        # os.kill(pid, 0) isn't a probe on Windows; trust recent reports instead
+        return time.time() - stats.get('updated_at', 0) < 600
+    try:
+        os.kill(int(stats.get('pid')), 0)
+        return True
+    except PermissionError:
+        return True
+    except (OSError, TypeError, ValueError):
+        return False
+
+
+def _digest(key: Hashable) -> str:
+    return hashlib.sha256(repr(key).encode('utf-8')).hexdigest()
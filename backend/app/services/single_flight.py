@@ -0,0 +1,91 @@
+# backend/app/services/single_flight.py
+"""Single-flight coalescing: one render per key, however many requests want it.
+
+The first caller to `join` a key becomes its leader and must settle the
+flight with `finish` (bytes or the error) or `abandon`. Callers that join
+while it is still running are followers: they wait on the same
+concurrent.futures.Future, which works from the event loop and from worker
+threads, and they get the leader's bytes or its exception.
+
+Cancellation:
+- A follower that goes away stops waiting, and nothing else happens (the
+  wait is shielded).
+- A leader that goes away before finishing (its client disconnected,
+  admission turned it away, or a speculative guess failed) abandons the
+  flight. Its followers then see FlightAbandoned and retry `join`, so one of
+  them leads the next attempt. Its failure is not passed on to them.
+
+Keys are pdf_cache keys (canonical configuration hash + optimize level).
+The coalescing rate is `coalesced / (leaders + coalesced)` in `stats()` and
+/metrics.
+"""
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from app.services.metrics import metrics
+
+
+class FlightAbandoned(Exception):
+    """The leader stopped before producing a result; followers should join again"""
+
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._flights: Dict[Hashable, Future] = {}
+
+    def join(self, key: Hashable) -> Tuple[Future, bool]:
+        """(future, is_leader) for `key`; a leader must later call finish() or abandon()"""
+        with self._lock:
+            future = self._flights.get(key)
+            if future is not None:
+                metrics.increment(f'single_flight.{self.name}.coalesced')
+                return future, False
+            future = self._flights[key] = Future()
+        metrics.increment(f'single_flight.{self.name}.leaders')
+        return future, True
+
+    def in_flight(self, key: Hashable) -> Optional[Future]:
+        with self._lock:
+            return self._flights.get(key)
+
+    def finish(self, key: Hashable, future: Future, result: Any = None, error: Optional[BaseException] = None):
+        """Settle a flight with its result or error; only the first call counts"""
+        with self._lock:
+            if self._flights.get(key) is future:
+                del self._flights[key]
+            if future.done():
+                return
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+        if error is not None and not isinstance(error, FlightAbandoned):
+            metrics.increment(f'single_flight.{self.name}.failed')
+
+    def abandon(self, key: Hashable, future: Future):
+        self.finish(key, future, error=FlightAbandoned())
+
+    async def wait(self, future: Future) -> Any:
+        """Follower side; cancelling the waiter leaves the leader's render alone"""
+        return await asyncio.shield(asyncio.wrap_future(future))
+
+    def stats(self) -> Dict[str, Any]:
+        leaders = metrics.get_counter(f'single_flight.{self.name}.leaders')
+        coalesced = metrics.get_counter(f'single_flight.{self.name}.coalesced')
+        with self._lock:
+            in_flight = len(self._flights)
+        return {
+            'in_flight': in_flight,
+            'leaders': leaders,
+            'coalesced': coalesced,
+            'failed': metrics.get_counter(f'single_flight.{self.name}.failed'),
+            'coalescing_rate': round(coalesced / (leaders + coalesced), 4) if leaders + coalesced else 0.0,
+        }
+
+
+# Datasheet renders, keyed by pdf_cache_key; shared by downloads and the speculative renderer
+pdf_flights = SingleFlight('pdf')
@@ -0,0 +1,196 @@
+# backend/app/services/spec_normalizer.py
+"""Column-wise parsing of the free-text spec values found in the Lylux workbook.
+
+Everything works on whole pandas columns (regex extraction, to_numeric,
+masks), so a chunk of thousands of rows is parsed in a handful of vectorized
+calls instead of a Python loop per cell. Unparseable cells come back as NaN
+plus an error mask; callers decide whether that rejects the row.
+
+    parse_numeric  "9W", "945lm", "1,200 lm", "€ 45,50", 12     -> 9, 945, 1200, 45.5, 12
+    parse_cct      "2700K Warm White"                           -> 2700
+    parse_angle    "30° Medium"                                 -> 30
+    parse_ip       "IP65"                                       -> 65
+    parse_range    "-20°C to 50°C"                              -> (-20, 50)
+"""
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+TRUE_VALUES = ['1', 'y', 'yes', 'true', 'x', '✓', 'default']
+
+# Above this a "lm/W" figure is a typo or a unit mix-up rather than an LED
+MAX_PLAUSIBLE_EFFICACY = 250.0
+OUTLIER_Z = 3.5
+
+NUMBER = r'(-?\d+(?:[.,]\d+)?)'
+
+
+def as_text(column: pd.Series) -> pd.Series:
+    """Stripped strings with blanks as <NA>"""
+    text = column.astype('string').str.strip()
+    return text.mask(text == '')
+
+
+def per_unique(parser=None, dtype: str = 'float64'):
+    """Run a column parser on the distinct values only and broadcast back.
+
+    Spec columns repeat a few values ("9W", "IP65") thousands of times, so this
+    turns most of the string work into one integer take.
+    """
+    def decorate(parser):
+        missing = np.nan if dtype == 'float64' else pd.NA
+
+        def parse(column: pd.Series) -> pd.Series:
+            codes, uniques = pd.factorize(column.to_numpy(dtype=object), use_na_sentinel=True)
+            parsed = parser(pd.Series(uniques, dtype=object)).to_numpy(dtype=object if dtype != 'float64' else dtype)
+            values = np.append(parsed, np.array([missing], dtype=parsed.dtype))[codes]  # code -1 picks the trailing blank
+            return pd.Series(values, index=column.index).astype(dtype)
+        parse.__name__ = parser.__name__
+        parse.__doc__ = parser.__doc__
+        return parse
+    return decorate(parser) if parser is not None else decorate
+
+
+@per_unique(dtype='string')
+def clean_text(column: pd.Series) -> pd.Series:
+    """as_text, computed once per distinct value"""
+    return as_text(column)
+
+
+@per_unique
+def parse_numeric(column: pd.Series) -> pd.Series:
+    """First number in each cell as float (NaN when there is none)"""
+    text = as_text(column)
+    # "1,200" is a thousands separator, "45,50" a decimal comma
+    text = text.str.replace(r'(?<=\d),(?=\d{3}(?!\d))', '', regex=True)
+    number = text.str.extract(NUMBER, expand=False).str.replace(',', '.', regex=False)
+    return pd.to_numeric(number, errors='coerce').astype('float64')
+
+
+@per_unique
+def parse_cct(column: pd.Series) -> pd.Series:
+    return _extract(column, r'(\d{4,5})\s*K\b')
+
+
+@per_unique
+def parse_angle(column: pd.Series) -> pd.Series:
+    return _extract(column, r'(\d+(?:\.\d+)?)\s*(?:°|deg)')
+
+
+@per_unique
+def parse_ip(column: pd.Series) -> pd.Series:
+    return _extract(column, r'IP\s*(\d{2})')
+
+
+def parse_range(column: pd.Series) -> Tuple[pd.Series, pd.Series]:
+    """(low, high) of "-20°C to 50°C", "-20 ~ +50 °C", "10-40"; a single value gives low == high"""
+    text = as_text(column)
+    parts = text.str.extract(r'([+-]?\d+(?:\.\d+)?)[^\d+-]*(?:to|~|–|-|/)\s*([+-]?\d+(?:\.\d+)?)', flags=0)
+    low = pd.to_numeric(parts[0], errors='coerce').astype('float64')
+    high = pd.to_numeric(parts[1], errors='coerce').astype('float64')
+    single = parse_numeric(text)
+    return low.fillna(single), high.fillna(single)
+
+
+def parse_bool(column: pd.Series) -> pd.Series:
+    """True/False, or <NA> for blank cells"""
+    text = clean_text(column).str.lower()
+    return text.isin(TRUE_VALUES).astype('boolean').mask(text.isna())
+
+
+def _extract(column: pd.Series, pattern: str) -> pd.Series:
+    value = as_text(column).str.extract(pattern, flags=2, expand=False)  # re.IGNORECASE
+    return pd.to_numeric(value, errors='coerce').astype('float64')
+
+
+def robust_outliers(values: np.ndarray, threshold: float = OUTLIER_Z) -> np.ndarray:
+    """Mask of values whose modified z-score (median/MAD) exceeds `threshold`"""
+    values = np.asarray(values, dtype='float64')
+    mask = np.zeros(len(values), dtype=bool)
+    finite = np.isfinite(values)
+    if finite.sum() < 5:
+        return mask
+    median = np.median(values[finite])
+    mad = np.median(np.abs(values[finite] - median))
+    if mad == 0:
+        return mask
+    mask[finite] = np.abs(0.6745 * (values[finite] - median) / mad) > threshold
+    return mask
+
+
+def normalize_frame(frame: pd.DataFrame, int_fields, float_fields, bool_fields) -> Tuple[pd.DataFrame, pd.Series]:
+    """Parse typed columns in place; returns (frame, per-row error message or <NA>)"""
+    errors = pd.Series(pd.NA, index=frame.index, dtype='string')
+    for field in frame.columns:
+        column = frame[field]
+        if field in int_fields or field in float_fields:
+            # A stray TRUE/FALSE cell would otherwise read as 1/0 (and factorize as equal to it)
+            is_bool = column.map(type).eq(bool)
+            if is_bool.any():
+                column = column.mask(is_bool, column.astype(str))
+            parsed = parse_numeric(column)
+            bad = clean_text(column).notna() & parsed.isna()
+            if bad.any():
+                message = f"{field}: expected a number, got " + column[bad].map(repr).astype('string')
+                errors = errors.fillna(message.reindex(frame.index))
+            frame[field] = parsed.round().astype('Int64') if field in int_fields else parsed
+        elif field in bool_fields:
+            frame[field] = parse_bool(column)
+        else:
+            # Codes typed as numbers come back from Excel as floats ("1200.0")
+            text = clean_text(column)
+            floats = column[column.map(type).eq(float)].astype('float64')
+            integral = floats[floats % 1 == 0]
+            frame[field] = text.mask(text.index.isin(integral.index), integral.astype('int64').astype('string')) if len(integral) else text
+    return frame, errors
+
+
+def normalize_variants(frame: pd.DataFrame) -> pd.DataFrame:
+    """Derive efficacy (lm/W) where it is missing; power must be positive"""
+    if 'system_output' in frame and 'system_power' in frame:
+        output = frame['system_output'].astype('float64')
+        power = frame['system_power'].astype('float64')
+        efficacy = (output / power.where(power > 0)).round()
+        current = frame['efficiency'].astype('float64') if 'efficiency' in frame else pd.Series(np.nan, index=frame.index)
+        frame['efficiency'] = current.fillna(efficacy).round().astype('Int64')
+    elif 'efficiency' not in frame:
+        frame['efficiency'] = pd.array([pd.NA] * len(frame), dtype='Int64')
+    return frame
+
+
+def variant_warnings(row_numbers: np.ndarray, efficacy: np.ndarray) -> List[Dict[str, Any]]:
+    """Efficacy values that are implausible or far from the rest of the sheet"""
+    flagged = robust_outliers(efficacy) | (efficacy > MAX_PLAUSIBLE_EFFICACY)
+    median = float(np.nanmedian(efficacy)) if np.isfinite(efficacy).any() else None
+    return [{'row': int(row), 'field': 'efficiency', 'value': float(value),
+             'reason': f"efficacy {value:.0f} lm/W is an outlier (sheet median {median:.0f} lm/W)"}
+            for row, value in zip(row_numbers[flagged], efficacy[flagged])]
+
+
+# Option categories whose values must carry a specific quantity
+OPTION_PARSERS = {
+    'colour temperature': parse_cct, 'color temperature': parse_cct, 'cct': parse_cct,
+    'beam angle': parse_angle,
+    'ip rating': parse_ip,
+}
+
+
+def option_warnings(frame: pd.DataFrame) -> pd.Series:
+    """Warning per option row whose value doesn't parse for its category (e.g. a CCT without "K")"""
+    warnings = pd.Series(pd.NA, index=frame.index, dtype='string')
+    if 'category_name' not in frame or 'option_value' not in frame:
+        return warnings
+    category = frame['category_name'].str.lower()
+    for name, parser in OPTION_PARSERS.items():
+        rows = category == name
+        if rows.any():
+            bad = rows & parser(frame['option_value']).isna()
+            warnings = warnings.mask(bad.fillna(False), f"option value doesn't look like a {name}")
+    return warnings
+
+
+def to_records(frame: pd.DataFrame) -> List[Dict[str, Optional[Any]]]:
+    """Plain-Python dicts (None for missing, int/float/bool/str) ready for JSON and the database"""
+    columns = [frame[name].to_numpy(dtype=object, na_value=None).tolist() for name in frame.columns]
+    return [dict(zip(frame.columns, row)) for row in zip(*columns)]
@@ -0,0 +1,168 @@
+# backend/app/services/speculative.py
+"""Speculative background rendering of the datasheet a user is likely to download.
+
+Every configurator change reschedules a per-session timer. Once the session
+has been idle for `speculative_debounce_ms`, the current configuration is
+rendered in a small dedicated pool with the JVM niced, exactly as a download
+with default settings would render it, and the result goes into the PDF
+cache under the same configuration key. Each render leads a flight in
+single_flight.pdf_flights, so /generate-datasheet finds it finished in the
+cache or joins the in-flight render instead of starting its own.
+
+Speculation is only a guess, so it gives way: each session gets at most
+`speculative_max_per_session` renders per `speculative_session_window_s`,
+and nothing new starts while the pool queue is full, foreground downloads
+are rendering, or the machine's load average is above the limit. A failed
+speculative render abandons its flight, so a download waiting on it renders
+afresh instead of failing.
+"""
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Optional
+
+from app.core.config import settings
+from app.services.metrics import metrics
+from app.services.pdf_generator import DatasheetGenerator
+from app.services.pdf_optimizer import optimize_pdf
+from app.services.render_cache import configuration_key, pdf_cache, pdf_cache_key
+from app.services.single_flight import pdf_flights
+
+MAX_TRACKED_SESSIONS = 10000
+
+
+class SpeculativeRenderer:
+    def __init__(self, generator: Optional[DatasheetGenerator] = None):
+        self.generator = generator or DatasheetGenerator()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+        self._session_starts: "OrderedDict[str, Deque[float]]" = OrderedDict()
+        self._in_flight: Dict[str, Future] = {}
+        self._queued = 0
+        self._foreground = 0
+
+    # --- called from request handlers -------------------------------------
+
+    def schedule(self, session_id: str, product_data: Dict[str, Any]):
+        """(Re)start the idle timer for a session; must be called on the event loop"""
+        if not settings.speculative_enabled or not session_id:
+            return
+        timer = self._timers.pop(session_id, None)
+        if timer is not None:
+            timer.cancel()
+        loop = asyncio.get_running_loop()
+        self._timers[session_id] = loop.call_later(
+            settings.speculative_debounce_ms / 1000, self._start, session_id, product_data)
+        metrics.increment('speculative.scheduled')
+
+    def cancel(self, session_id: str):
+        """Forget a session's pending timer (e.g. when its WebSocket closes)"""
+        timer = self._timers.pop(session_id, None)
+        if timer is not None:
+            timer.cancel()
+
+    @contextmanager
+    def foreground(self):
+        """Wrap user-initiated renders so speculation backs off while they run"""
+        with self._lock:
+            self._foreground += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._foreground -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'pending_timers': len(self._timers),
+                'in_flight': len(self._in_flight),
+                'queued': self._queued,
+                'foreground': self._foreground,
+                'tracked_sessions': len(self._session_starts),
+            }
+
+    # --- internals ---------------------------------------------------------
+
+    def _start(self, session_id: str, product_data: Dict[str, Any]):
+        self._timers.pop(session_id, None)
+
+        fields = self.generator._extract_datasheet_fields(product_data)
+        optimize_level = settings.pdf_optimize_level
+        cache_key = pdf_cache_key(configuration_key(fields), optimize_level)
+        if pdf_cache.peek(cache_key) is not None or pdf_flights.in_flight(cache_key) is not None:
+            metrics.increment('speculative.already_available')
+            return
+
+        reason = self._drop_reason(session_id)
+        if reason:
+            metrics.increment(f'speculative.dropped.{reason}')
+            return
+
+        flight, leader = pdf_flights.join(cache_key)
+        if not leader:
+            metrics.increment('speculative.already_available')  # A download started it in the meantime
+            return
+        with self._lock:
+            self._queued += 1
+            future = self._get_executor().submit(self._render, cache_key, product_data, optimize_level)
+            self._in_flight[cache_key] = future
+        future.add_done_callback(lambda _: self._finish(cache_key, flight))
+        metrics.increment('speculative.started')
+
+    def _drop_reason(self, session_id: str) -> Optional[str]:
+        now = time.monotonic()
+        with self._lock:
+            if self._queued >= settings.speculative_max_queue:
+                return 'queue_full'
+            if self._foreground >= settings.speculative_max_foreground:
+                return 'foreground_busy'
+            if hasattr(os, 'getloadavg') and os.getloadavg()[0] / (os.cpu_count() or 1) > settings.speculative_max_load:
+                return 'system_load'
+
+            starts = self._session_starts.pop(session_id, None) or deque()
+            self._session_starts[session_id] = starts
+            while starts and now - starts[0] > settings.speculative_session_window_s:
+                starts.popleft()
+            if len(starts) >= settings.speculative_max_per_session:
+                return 'session_cap'
+            starts.append(now)
+            while len(self._session_starts) > MAX_TRACKED_SESSIONS:
+                self._session_starts.popitem(last=False)
+        return None
+
+    def _render(self, cache_key: str, product_data: Dict[str, Any], optimize_level: int) -> bytes:
+        start = time.perf_counter()
+        with self._lock:
+            self._queued -= 1
+        html_content = self.generator._create_phos_style_html(product_data)
+        pdf_data = self.generator.render_html(html_content, low_priority=True)
+        pdf_data, _ = optimize_pdf(pdf_data, optimize_level)
+        pdf_cache.put(cache_key, pdf_data)
+        metrics.observe('speculative.render', time.perf_counter() - start)
+        return pdf_data
+
+    def _finish(self, cache_key: str, flight: Future):
+        with self._lock:
+            future = self._in_flight.pop(cache_key, None)
+        if future is not None and future.exception() is None:
+            pdf_flights.finish(cache_key, flight, future.result())
+            return
+        pdf_flights.abandon(cache_key, flight)
+        if future is not None:
+            metrics.increment('speculative.failed')
+            print(f"Speculative render failed: {future.exception()}")
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=settings.speculative_max_concurrency,
+                                                thread_name_prefix="speculative-render")
+        return self._executor
+
+
+speculative_renderer = SpeculativeRenderer()
@@ -1,14 +1,42 @@
 # app/services/supabase_client.py
+import threading
+from typing import Optional
+
 from supabase import create_client, Client
 from app.core.config import settings
 
-supabase: Client = create_client(
+
+class LazyClient:
+    """Stands in for a supabase Client and creates it on first use (or on `connect()` during warm-up)"""
+
+    def __init__(self, url: str, key: str):
+        self._url = url
+        self._key = key
+        self._client: Optional[Client] = None
+        self._lock = threading.Lock()
+
+    @property
+    def connected(self) -> bool:
+        return self._client is not None
+
+    def connect(self) -> Client:
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = create_client(self._url, self._key)
+        return self._client
+
+    def __getattr__(self, name):
+        return getattr(self.connect(), name)
+
+
+supabase: Client = LazyClient(
     settings.supabase_url,
     settings.supabase_anon_key  # Now matches the .env file
 )
 
 # For admin operations - now you can uncomment this since you have the service role key
-supabase_admin: Client = create_client(
+supabase_admin: Client = LazyClient(
     settings.supabase_url,
     settings.supabase_service_role_key
-)
\ No newline at end of file
+)
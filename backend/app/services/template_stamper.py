@@ -0,0 +1,489 @@
+# backend/app/services/template_stamper.py
+"""Template-stamping render mode.
+
+Everything on a datasheet except the configuration-dependent values (LED,
+optics and electric values, colours, part code, accessories and the light
+distribution chart) is identical for every datasheet of a product. Instead of
+laying out the full HTML page each time, this module:
+
+1. renders a *probe* page once per layout where every variable value is a
+   unique marker and every variable image is a uniquely sized placeholder, and
+   reads back the exact position, font, size and colour of each slot;
+2. renders a *base* page once with those slots blanked (non-breaking spaces
+   and white placeholder images, so the layout is unchanged) and caches it;
+3. per configuration, draws only the variable text/images with ReportLab and
+   merges that overlay onto a copy of the cached base page.
+
+Anything that would change the geometry (number and kind of accessory rows,
+whether there is a light distribution chart, any static product field, the
+template version) is part of the base cache key. Whenever a value can't be
+stamped faithfully (it would wrap, uses an unknown font or glyph), the
+generator falls back to the full render path. A layout whose base can't be
+built (slots not found, unsupported font) is remembered for
+`stamp_failure_retry_s`, so its requests go straight to the full render
+instead of paying for the probe and base renders again.
+"""
+import base64
+import hashlib
+import json
+import os
+import re
+import struct
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from io import BytesIO
+from typing import Any, Dict, List, Optional, Tuple
+
+from pypdf import PdfReader, PdfWriter
+from pypdf.generic import ContentStream
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+from app.core.config import settings
+from app.services.asset_urls import asset_urls
+from app.services.pdf_generator import DatasheetGenerator, TEMPLATE_VERSION
+
+# Per-configuration text values; everything else on the page is baked into the base
+STAMPED_TEXT_FIELDS = [
+    'finish', 'housing_color', 'reflector_color', 'ip_rating',
+    'cct', 'cri', 'led_output', 'system_output', 'sdcm',
+    'beam_angle',
+    'led_driver', 'led_power', 'system_power',
+    'final_part_code',
+]
+
+BLANK_TEXT = '&#160;'
+
+# .page-content has 15mm side margins; the right column has 10pt padding on both sides of the gutter
+PAGE_CONTENT_MARGIN = 15 * 72 / 25.4
+COLUMN_GUTTER = 20.0
+# Accessory name blocks are padded 6pt on each side
+ACCESSORY_BLOCK_PADDING = 6.0
+
+STANDARD_FONTS = set(pdfmetrics.standardFonts)
+FONTS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "assets", "fonts"))
+YU_GOTHIC_FILES = {'bold': 'YuGothB.ttc', 'medium': 'YuGothM.ttc', 'light': 'YuGothL.ttc', 'regular': 'YuGothR.ttc'}
+
+
+class StampingNotPossible(Exception):
+    """Raised when a configuration can't be stamped exactly; callers fall back to the full render"""
+
+
+def _solid_png(width: int, height: int, rgb: Tuple[int, int, int] = (255, 255, 255)) -> str:
+    """Tiny opaque PNG as a data URI; distinct widths let probe images be told apart"""
+    raw = b''.join(b'\x00' + bytes(rgb) * width for _ in range(height))
+
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', zlib.crc32(tag + data) & 0xffffffff)
+
+    png = (b'\x89PNG\r\n\x1a\n'
+           + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+           + chunk(b'IDAT', zlib.compress(raw))
+           + chunk(b'IEND', b''))
+    return 'data:image/png;base64,' + base64.b64encode(png).decode('ascii')
+
+
+def _multiply(m1: List[float], m2: List[float]) -> List[float]:
+    a1, b1, c1, d1, e1, f1 = m1
+    a2, b2, c2, d2, e2, f2 = m2
+    return [a1 * a2 + b1 * c2, a1 * b2 + b1 * d2,
+            c1 * a2 + d1 * c2, c1 * b2 + d1 * d2,
+            e1 * a2 + f1 * c2 + e2, e1 * b2 + f1 * d2 + f2]
+
+
+def _parse_to_unicode(cmap_data: bytes) -> Dict[int, str]:
+    """Minimal ToUnicode CMap parser (bfchar and bfrange) for embedded Identity-H fonts"""
+    mapping: Dict[int, str] = {}
+    text = cmap_data.decode('latin-1')
+    hex_to_str = lambda h: bytes.fromhex(h).decode('utf-16-be', errors='replace')
+    for block in re.findall(r'beginbfchar(.*?)endbfchar', text, re.S):
+        for src, dst in re.findall(r'<([0-9A-Fa-f]+)>\s*<([0-9A-Fa-f]+)>', block):
+            mapping[int(src, 16)] = hex_to_str(dst)
+    for block in re.findall(r'beginbfrange(.*?)endbfrange', text, re.S):
+        for start, end, dst in re.findall(r'<([0-9A-Fa-f]+)>\s*<([0-9A-Fa-f]+)>\s*(<[0-9A-Fa-f]+>|\[[^\]]*\])', block):
+            start, end = int(start, 16), int(end, 16)
+            if dst.startswith('['):
+                for offset, item in enumerate(re.findall(r'<([0-9A-Fa-f]+)>', dst)):
+                    mapping[start + offset] = hex_to_str(item)
+            else:
+                base_code = int(dst[1:-1], 16)
+                width = len(dst[1:-1])
+                for code in range(start, end + 1):
+                    mapping[code] = hex_to_str(f'{base_code + code - start:0{width}X}')
+    return mapping
+
+
+def _font_decoder(font) -> Any:
+    """Return a function turning raw string bytes into text for one font resource"""
+    if font.get('/Subtype') == '/Type0' and '/ToUnicode' in font:
+        mapping = _parse_to_unicode(font['/ToUnicode'].get_object().get_data())
+        return lambda raw: ''.join(mapping.get(int.from_bytes(raw[i:i + 2], 'big'), '?') for i in range(0, len(raw) - 1, 2))
+    return lambda raw: raw.decode('cp1252', errors='replace')
+
+
+def collect_page_runs(reader: PdfReader, page) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Walk a page's content stream and return (text runs, image placements).
+
+    Text runs carry the decoded text, baseline origin, font BaseFont, size and
+    fill colour; image placements carry the XObject pixel width and the
+    rectangle it is drawn into. Only the operators Flying Saucer/iText and
+    ReportLab actually emit are interpreted.
+    """
+    resources = page.get('/Resources', {})
+    fonts = {name: font.get_object() for name, font in resources.get('/Font', {}).items()}
+    xobjects = {name: x.get_object() for name, x in resources.get('/XObject', {}).items()}
+    decoders = {name: _font_decoder(font) for name, font in fonts.items()}
+
+    texts, images = [], []
+    ctm = [1, 0, 0, 1, 0, 0]
+    stack = []
+    fill = (0.0, 0.0, 0.0)
+    font_name, font_size = None, 0.0
+    tm = line_matrix = [1, 0, 0, 1, 0, 0]
+
+    for operands, operator in ContentStream(page.get_contents(), reader).operations:
+        if operator == b'q':
+            stack.append((ctm, fill))
+        elif operator == b'Q' and stack:
+            ctm, fill = stack.pop()
+        elif operator == b'cm':
+            ctm = _multiply([float(v) for v in operands], ctm)
+        elif operator == b'rg':
+            fill = tuple(round(float(v), 4) for v in operands)
+        elif operator == b'g':
+            fill = (round(float(operands[0]), 4),) * 3
+        elif operator == b'BT':
+            tm = line_matrix = [1, 0, 0, 1, 0, 0]
+        elif operator == b'Tf':
+            font_name, font_size = operands[0], float(operands[1])
+        elif operator == b'Tm':
+            tm = line_matrix = [float(v) for v in operands]
+        elif operator in (b'Td', b'TD'):
+            line_matrix = _multiply([1, 0, 0, 1, float(operands[0]), float(operands[1])], line_matrix)
+            tm = line_matrix
+        elif operator in (b'Tj', b'TJ', b"'", b'"'):
+            items = operands[0] if operator == b'TJ' else operands[-1:]
+            raw = b''.join(getattr(i, 'original_bytes', None) or bytes(i, 'latin-1') if isinstance(i, str) else bytes(i)
+                           for i in items if not isinstance(i, (int, float)))
+            decode = decoders.get(font_name, lambda r: r.decode('latin-1'))
+            origin = _multiply(tm, ctm)
+            font = fonts.get(font_name, {})
+            texts.append({
+                'text': decode(raw),
+                'x': origin[4], 'y': origin[5],
+                'size': font_size * (origin[0] ** 2 + origin[1] ** 2) ** 0.5,
+                'font': str(font.get('/BaseFont', '')).lstrip('/'),
+                'color': fill,
+            })
+        elif operator == b'Do':
+            xobject = xobjects.get(operands[0])
+            if xobject is not None and xobject.get('/Subtype') == '/Image':
+                images.append({
+                    'name': operands[0], 'pixel_width': int(xobject.get('/Width', 0)),
+                    'x': ctm[4], 'y': ctm[5], 'width': ctm[0], 'height': ctm[3],
+                })
+    return texts, images
+
+
+def _reportlab_font(base_font: str) -> str:
+    """Map a BaseFont from the probe PDF onto a font name ReportLab can draw with"""
+    name = base_font.split('+', 1)[-1]
+    if name in STANDARD_FONTS:
+        return name
+    if 'yugoth' in name.lower().replace(' ', ''):
+        weight = next((w for w in ('bold', 'medium', 'light') if w in name.lower()), 'regular')
+        registered = f'YuGothic-{weight}'
+        if registered not in pdfmetrics.getRegisteredFontNames():
+            path = os.path.join(FONTS_DIR, YU_GOTHIC_FILES[weight])
+            if not os.path.exists(path):
+                raise StampingNotPossible(f"Font file for {name} not found")
+            pdfmetrics.registerFont(TTFont(registered, path, subfontIndex=0))
+        return registered
+    raise StampingNotPossible(f"Unsupported font in template: {base_font}")
+
+
+class _BasePage:
+    """A cached blank base page plus the geometry of every slot on it"""
+
+    def __init__(self, pdf_bytes: bytes, text_slots: Dict[str, Dict[str, Any]], image_slots: Dict[str, Dict[str, Any]]):
+        self.pdf_bytes = pdf_bytes
+        self.reader = PdfReader(BytesIO(pdf_bytes))
+        self.page_sizes = [(float(p.mediabox.width), float(p.mediabox.height)) for p in self.reader.pages]
+        self.text_slots = text_slots
+        self.image_slots = image_slots
+        self.lock = threading.Lock()
+
+
+class TemplateStamper:
+    """Builds and caches base pages and stamps configurations onto them"""
+
+    def __init__(self, generator: Optional[DatasheetGenerator] = None, cache_size: Optional[int] = None):
+        self.generator = generator or DatasheetGenerator()
+        self.cache_size = cache_size or settings.stamp_base_cache_size
+        self._bases: "OrderedDict[str, _BasePage]" = OrderedDict()
+        self._failed: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()  # Signature -> (reason, retry at)
+        self._build_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._images: "OrderedDict[str, ImageReader]" = OrderedDict()
+        self.stats = {'stamped': 0, 'fallbacks': 0, 'base_builds': 0, 'base_hits': 0, 'base_failures': 0}
+
+    # --- public API -------------------------------------------------------
+
+    def generate_datasheet(self, product_data: Dict[str, Any]) -> BytesIO:
+        """Stamp a datasheet, falling back to the full Flying Saucer render when needed"""
+        try:
+            start = time.perf_counter()
+            pdf_bytes = self.stamp(product_data)
+            print(f"✓ Stamped datasheet in {(time.perf_counter() - start) * 1000:.1f}ms ({len(pdf_bytes)} bytes)")
+            return BytesIO(pdf_bytes)
+        except StampingNotPossible as e:
+            with self._lock:
+                self.stats['fallbacks'] += 1
+            print(f"Stamping not possible ({e}) - using full render")
+            return self.generator.generate_datasheet(product_data)
+
+    def stamp(self, product_data: Dict[str, Any]) -> bytes:
+        fields = self.generator._extract_datasheet_fields(product_data)
+        text_values, image_values = self._variable_slots(fields)
+        base = self._get_base(fields, text_values, image_values)
+
+        signed = asset_urls.resolve_many(image_values.values())
+        overlay = self._draw_overlay(base, text_values, {name: signed.get(url, url) for name, url in image_values.items()})
+        overlay_reader = PdfReader(BytesIO(overlay))
+
+        writer = PdfWriter()
+        with base.lock:
+            for index, base_page in enumerate(base.reader.pages):
+                page = writer.add_page(base_page)
+                page.merge_page(overlay_reader.pages[index])
+        output = BytesIO()
+        writer.write(output)
+        with self._lock:
+            self.stats['stamped'] += 1
+        return output.getvalue()
+
+    def verify(self, product_data: Dict[str, Any]) -> List[str]:
+        """Compare stamped output with the full render; returns the differences (empty when equivalent)"""
+        full = self.generator.render_html(self.generator._create_phos_style_html(product_data))
+        stamped = self.stamp(product_data)
+
+        def summary(pdf_bytes: bytes):
+            reader = PdfReader(BytesIO(pdf_bytes))
+            texts, images = set(), set()
+            for index, page in enumerate(reader.pages):
+                page_texts, page_images = collect_page_runs(reader, page)
+                texts.update((index, t['text'].strip(), round(t['x']), round(t['y']), t['font'].split('+')[-1],
+                              round(t['size'], 1), t['color']) for t in page_texts if t['text'].strip())
+                images.update((index, round(i['x']), round(i['y']), round(i['width']), round(i['height']))
+                              for i in page_images)
+            return texts, images, len(reader.pages)
+
+        full_texts, full_images, full_pages = summary(full)
+        stamped_texts, stamped_images, stamped_pages = summary(stamped)
+        differences = []
+        if full_pages != stamped_pages:
+            differences.append(f"page count {full_pages} != {stamped_pages}")
+        differences += [f"missing text {t}" for t in sorted(full_texts - stamped_texts, key=str)]
+        differences += [f"extra text {t}" for t in sorted(stamped_texts - full_texts, key=str)]
+        differences += [f"image placement {i} missing" for i in sorted(full_images - stamped_images)]
+        return differences
+
+    # --- slots and base pages ---------------------------------------------
+
+    def _variable_slots(self, fields: Dict[str, Any]):
+        """Split resolved fields into {slot: text} and {slot: image url}"""
+        text_values = {name: str(fields[name]) for name in STAMPED_TEXT_FIELDS}
+        image_values = {}
+        if fields['light_distribution_image_url']:
+            image_values['light_distribution'] = fields['light_distribution_image_url']
+        for index, accessory in enumerate(fields['accessories']):
+            text_values[f'accessory_{index}_name'] = accessory['name']
+            if accessory['part_code']:
+                text_values[f'accessory_{index}_part_code'] = accessory['part_code']
+            if accessory['image_url']:
+                image_values[f'accessory_{index}_image'] = accessory['image_url']
+        return text_values, image_values
+
+    def _slot_fields(self, fields: Dict[str, Any], text_for, image_for) -> Dict[str, Any]:
+        """Copy fields with every variable slot replaced via the given callbacks"""
+        slot_fields = dict(fields)
+        for name in STAMPED_TEXT_FIELDS:
+            slot_fields[name] = text_for(name)
+        if fields['light_distribution_image_url']:
+            slot_fields['light_distribution_image_url'] = image_for('light_distribution')
+        slot_fields['accessories'] = []
+        for index, accessory in enumerate(fields['accessories']):
+            slot_fields['accessories'].append({
+                'name': text_for(f'accessory_{index}_name'),
+                'part_code': text_for(f'accessory_{index}_part_code') if accessory['part_code'] else '',
+                'image_url': image_for(f'accessory_{index}_image') if accessory['image_url'] else '',
+            })
+        return slot_fields
+
+    def _signature(self, fields: Dict[str, Any]) -> str:
+        static = {k: v for k, v in fields.items()
+                  if k not in STAMPED_TEXT_FIELDS and k not in ('accessories', 'light_distribution_image_url')}
+        layout = {
+            'template': TEMPLATE_VERSION,
+            'static': static,
+            'light_distribution': bool(fields['light_distribution_image_url']),
+            'accessories': [(bool(a['part_code']), bool(a['image_url'])) for a in fields['accessories']],
+        }
+        return hashlib.sha256(json.dumps(layout, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+    def _get_base(self, fields: Dict[str, Any], text_values: Dict[str, str], image_values: Dict[str, str]) -> _BasePage:
+        signature = self._signature(fields)
+        with self._lock:
+            base = self._bases.get(signature)
+            if base is not None:
+                self._bases.move_to_end(signature)
+                self.stats['base_hits'] += 1
+                return base
+            self._check_failed(signature)
+            build_lock = self._build_locks.setdefault(signature, threading.Lock())
+
+        # One build per signature; concurrent requests for the same layout wait for it
+        try:
+            with build_lock:
+                with self._lock:
+                    base = self._bases.get(signature)
+                    if base is None:
+                        self._check_failed(signature)  # The build we waited for failed
+                if base is None:
+                    try:
+                        base = self._build_base(fields, list(text_values), list(image_values))
+                    except StampingNotPossible as e:
+                        with self._lock:
+                            self._failed[signature] = (str(e), time.monotonic() + settings.stamp_failure_retry_s)
+                            while len(self._failed) > self.cache_size:
+                                self._failed.popitem(last=False)
+                            self.stats['base_failures'] += 1
+                        raise
+                    with self._lock:
+                        self._bases[signature] = base
+                        while len(self._bases) > self.cache_size:
+                            self._bases.popitem(last=False)
+                        self.stats['base_builds'] += 1
+        finally:
+            with self._lock:
+                self._build_locks.pop(signature, None)
+        return base
+
+    def _check_failed(self, signature: str):
+        """Raise the remembered failure of this layout's base build (call with self._lock held)"""
+        failure = self._failed.get(signature)
+        if failure is None:
+            return
+        reason, retry_at = failure
+        if retry_at <= time.monotonic():
+            del self._failed[signature]
+            return
+        raise StampingNotPossible(reason)
+
+    def _build_base(self, fields: Dict[str, Any], text_slots: List[str], image_slots: List[str]) -> _BasePage:
+        generator = self.generator
+        markers = {name: f'QZ{index:03d}Z' for index, name in enumerate(text_slots)}
+        probe_images = {name: _solid_png(index + 2, 1) for index, name in enumerate(image_slots)}
+
+        probe_fields = self._slot_fields(fields, lambda n: markers[n], lambda n: probe_images[n])
+        probe_pdf = generator.render_html(generator._phos_document([generator._render_phos_page(probe_fields)]))
+
+        blank_image = _solid_png(1, 1)
+        base_fields = self._slot_fields(fields, lambda n: BLANK_TEXT, lambda n: blank_image)
+        base_pdf = generator.render_html(generator._phos_document([generator._render_phos_page(base_fields)]))
+
+        reader = PdfReader(BytesIO(probe_pdf))
+        by_marker = {marker: name for name, marker in markers.items()}
+        by_width = {index + 2: name for index, name in enumerate(image_slots)}
+        located_text: Dict[str, Dict[str, Any]] = {}
+        located_images: Dict[str, Dict[str, Any]] = {}
+        for page_index, page in enumerate(reader.pages):
+            texts, images = collect_page_runs(reader, page)
+            for run in texts:
+                name = by_marker.get(run['text'].strip())
+                if name:
+                    located_text[name] = dict(run, page=page_index, page_width=float(page.mediabox.width))
+            for image in images:
+                name = by_width.get(image['pixel_width'])
+                if name:
+                    located_images[name] = dict(image, page=page_index)
+
+        missing = [n for n in text_slots if n not in located_text] + [n for n in image_slots if n not in located_images]
+        if missing:
+            raise StampingNotPossible(f"slots not found in probe render: {missing}")
+
+        # Available width for each text slot, so values that would wrap fall back to the full render
+        right_column_x = located_text['final_part_code']['x']
+        for name, slot in located_text.items():
+            if slot['x'] >= right_column_x - 1:
+                limit = slot['page_width'] - PAGE_CONTENT_MARGIN
+                if name.startswith('accessory_') and name.endswith('_name') and name.replace('_name', '_image') in image_slots:
+                    limit -= ACCESSORY_BLOCK_PADDING
+            else:
+                limit = right_column_x - COLUMN_GUTTER
+            slot['max_width'] = limit - slot['x']
+            slot['reportlab_font'] = _reportlab_font(slot['font'])
+
+        print(f"✓ Built stamping base page ({len(text_slots)} text slots, {len(image_slots)} image slots)")
+        return _BasePage(base_pdf, located_text, located_images)
+
+    # --- overlay ----------------------------------------------------------
+
+    def _draw_overlay(self, base: _BasePage, text_values: Dict[str, str], image_values: Dict[str, str]) -> bytes:
+        buffer = BytesIO()
+        pdf = canvas.Canvas(buffer, pagesize=base.page_sizes[0], pageCompression=1)
+        for page_index, page_size in enumerate(base.page_sizes):
+            pdf.setPageSize(page_size)
+
+            for name, url in image_values.items():
+                slot = base.image_slots[name]
+                if slot['page'] != page_index:
+                    continue
+                image = self._load_image(url)
+                if image is not None:
+                    pdf.drawImage(image, slot['x'], slot['y'], slot['width'], slot['height'], mask='auto')
+
+            for name, value in text_values.items():
+                slot = base.text_slots[name]
+                if slot['page'] != page_index:
+                    continue
+                font = slot['reportlab_font']
+                if font in STANDARD_FONTS:
+                    try:
+                        value.encode('cp1252')
+                    except UnicodeEncodeError:
+                        raise StampingNotPossible(f"{name} has characters outside the standard font encoding")
+                if pdfmetrics.stringWidth(value, font, slot['size']) > slot['max_width']:
+                    raise StampingNotPossible(f"{name} would wrap")
+                pdf.setFillColorRGB(*slot['color'])
+                pdf.setFont(font, slot['size'])
+                pdf.drawString(slot['x'], slot['y'], value)
+
+            pdf.showPage()
+        pdf.save()
+        return buffer.getvalue()
+
+    def _load_image(self, url: str) -> Optional[ImageReader]:
+        """Fetch overlay images once; Flying Saucer would fetch them on every full render"""
+        with self._lock:
+            image = self._images.get(url)
+            if image is not None:
+                self._images.move_to_end(url)
+                return image
+        try:
+            image = ImageReader(url)
+        except Exception as e:
+            print(f"Could not load overlay image {url[:60]}: {e}")
+            return None
+        with self._lock:
+            self._images[url] = image
+            while len(self._images) > self.cache_size:
+                self._images.popitem(last=False)
+        return image
+
+
+template_stamper = TemplateStamper()
@@ -0,0 +1,160 @@
+# backend/app/services/warmup.py
+"""Start-up warm-up and the readiness state behind /ready.
+
+Required steps run in parallel threads as soon as the app starts:
+
+    supabase   create both clients and make one round trip (opens the HTTP pool)
+    renderer   compile PdfStream and render a one-page document with the logo
+               and certification images, so the JVM, fonts and image fetches
+               have been exercised before the first real datasheet
+
+The instance is ready once every required step has succeeded; failed steps
+are retried every `warmup_retry_s` seconds. Background steps (the
+configuration matrix, the search index and the facets) run after that and are reported but never hold
+readiness back. Steps query `client`: the shared supabase client unless another one is set (the stub server
+sets its in-memory fake).
+"""
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.services.metrics import metrics
+
+WARMUP_HTML = """<!DOCTYPE html>
+<html xmlns="http://www.w3.org/1999/xhtml"><head><style>
+@page { size: A4; margin: 10mm; } body { font-family: 'Poppins', sans-serif; font-size: 9pt; }
+img { height: 20px; }
+</style></head><body><p>Warm-up</p>%s</body></html>"""
+
+
+class Warmup:
+    def __init__(self, started_at: Optional[float] = None, client=None):
+        self.started_at = started_at if started_at is not None else time.perf_counter()
+        self.state: Dict[str, Any] = {'status': 'starting', 'ready': False, 'steps': {}, 'import_to_ready_ms': None}
+        self._client = client
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            from app.services.supabase_client import supabase
+            self._client = supabase
+        return self._client
+
+    @client.setter
+    def client(self, client):
+        self._client = client
+
+    @property
+    def ready(self) -> bool:
+        return self.state['ready']
+
+    def start(self) -> asyncio.Task:
+        self._task = asyncio.ensure_future(self.run())
+        return self._task
+
+    async def stop(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def run(self):
+        self.state['status'] = 'warming'
+        pending = self.required_steps()
+        while True:
+            results = await asyncio.gather(*(self._step(name, step) for name, step in pending.items()))
+            pending = {name: step for (name, step), ok in zip(pending.items(), results) if not ok}
+            if not pending:
+                break
+            self.state['status'] = 'retrying'
+            print(f"Warm-up: {', '.join(pending)} failed, retrying in {settings.warmup_retry_s}s")
+            await asyncio.sleep(settings.warmup_retry_s)
+
+        elapsed = time.perf_counter() - self.started_at
+        self.state.update(status='ready', ready=True, import_to_ready_ms=round(elapsed * 1000, 1),
+                          ready_at=datetime.now(timezone.utc).isoformat())
+        metrics.observe('startup.import_to_ready', elapsed)
+        print(f"✓ Ready {elapsed:.2f}s after import")
+
+        for name, step in self.background_steps().items():
+            await self._step(name, step)
+
+    def required_steps(self) -> Dict[str, Callable[[], Any]]:
+        steps = {'supabase': self._connect_supabase}
+        if settings.warmup_render_check:
+            steps['renderer'] = self._warm_renderer
+        return steps
+
+    def background_steps(self) -> Dict[str, Callable[[], Any]]:
+        steps = {}
+        if settings.warmup_load_matrix:
+            steps['configuration_matrix'] = self._load_matrix
+        if settings.warmup_build_search_index:
+            steps['catalog_search'] = self._build_search_index
+            steps['facets'] = self._build_facets
+        return steps
+
+    async def _step(self, name: str, step: Callable[[], Any]) -> bool:
+        info = self.state['steps'].setdefault(name, {'attempts': 0})
+        info.update(status='running', attempts=info['attempts'] + 1, error=None)
+        start = time.perf_counter()
+        try:
+            result = step()
+            if asyncio.iscoroutine(result):
+                await result
+            info['status'] = 'ok'
+            return True
+        except Exception as e:
+            print(f"Warm-up step {name} failed: {str(e)}")
+            info.update(status='failed', error=str(e))
+            return False
+        finally:
+            elapsed = time.perf_counter() - start
+            info['ms'] = round(elapsed * 1000, 1)
+            metrics.observe(f"startup.{name}", elapsed)
+
+    # --- steps -------------------------------------------------------------
+
+    async def _connect_supabase(self):
+        from app.services.supabase_client import supabase, supabase_admin
+        client = self.client
+
+        def connect():
+            if client is supabase:
+                supabase.connect()
+                supabase_admin.connect()
+            client.table('categories').select('id').limit(1).execute()
+        await run_in_threadpool(connect)
+
+    async def _warm_renderer(self):
+        from app.services.asset_urls import asset_urls
+        from app.services.pdf_generator import CERTIFICATION_IMAGES, FULL_LOGO_URL, LOGO_URL, DatasheetGenerator
+
+        # Also signs the shared images every datasheet prints, ahead of the first request
+        signed = await run_in_threadpool(asset_urls.resolve_many, [LOGO_URL, FULL_LOGO_URL] + [url for url, _ in CERTIFICATION_IMAGES])
+        images = ''.join(f'<img src="{url}" alt="" />' for url in signed.values())
+        pdf_bytes = await run_in_threadpool(DatasheetGenerator().render_html, WARMUP_HTML % images.replace('&', '&amp;'))
+        if not pdf_bytes.startswith(b'%PDF'):
+            raise Exception("Renderer returned no PDF")
+
+    async def _load_matrix(self):
+        from app.services.config_matrix import configuration_matrix
+        await run_in_threadpool(configuration_matrix.load, self.client)
+
+    async def _build_search_index(self):
+        from app.services.catalog_search import catalog_search
+        await run_in_threadpool(catalog_search.load, self.client)
+
+    async def _build_facets(self):
+        from app.services.facets import facet_engine
+        await run_in_threadpool(facet_engine.get, self.client)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {**self.state, 'uptime_s': round(time.perf_counter() - self.started_at, 1)}
@@ -0,0 +1,310 @@
+# backend/benchmarks/bench_hot_paths.py
+"""Microbenchmarks for the datasheet and configuration hot paths.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_hot_paths                      # run, write results/latest.json
+    python -m benchmarks.bench_hot_paths --save-baseline      # also refresh baselines/baseline.json
+    python -m benchmarks.bench_hot_paths --compare baselines/baseline.json
+
+Results are plain JSON (one entry per benchmark with min/median/mean/stdev in
+microseconds) so two runs can be diffed directly. With --compare the run exits
+non-zero when any benchmark's median is slower than the baseline by more than
+--threshold.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from benchmarks.fake_supabase import FakeSupabase, build_catalog, build_datasheet_request
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_OUTPUT = os.path.join(BENCH_DIR, "results", "latest.json")
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baselines", "baseline.json")
+
+
+@contextlib.contextmanager
+def quiet():
+    """Swallow the generator's debug prints so terminal I/O doesn't dominate timings"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def measure(func: Callable[[], Any], rounds: int, iterations: int, warmup: int = 1) -> Dict[str, Any]:
+    """Time `func` over several rounds and return per-call statistics in microseconds"""
+    with quiet():
+        for _ in range(warmup):
+            func()
+        samples = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            for _ in range(iterations):
+                func()
+            samples.append((time.perf_counter() - start) / iterations * 1e6)
+
+    return {
+        "rounds": rounds,
+        "iterations": iterations,
+        "min_us": round(min(samples), 3),
+        "median_us": round(statistics.median(samples), 3),
+        "mean_us": round(statistics.fmean(samples), 3),
+        "stdev_us": round(statistics.stdev(samples), 3) if len(samples) > 1 else 0.0,
+    }
+
+
+def bench_html(generator, request_small: Dict[str, Any], request_large: Dict[str, Any], rounds: int) -> Dict[str, Any]:
+    return {
+        "html.small_accessories": measure(lambda: generator._create_phos_style_html(request_small), rounds, 50),
+        "html.large_accessories": measure(lambda: generator._create_phos_style_html(request_large), rounds, 20),
+    }
+
+
+def bench_variant_selection(generator, request: Dict[str, Any], rounds: int) -> Dict[str, Any]:
+    last_variant = dict(request, selected_variant_id=request["variants"][-1]["id"])
+    missing_variant = dict(request, selected_variant_id=-1)
+    return {
+        "variant.first": measure(lambda: generator._get_selected_variant(request), rounds, 20000),
+        "variant.last": measure(lambda: generator._get_selected_variant(last_variant), rounds, 20000),
+        "variant.fallback": measure(lambda: generator._get_selected_variant(missing_variant), rounds, 20000),
+    }
+
+
+def bench_routes(tables: Dict[str, List[Dict[str, Any]]], rounds: int) -> Dict[str, Any]:
+    """Price, part-code and product-details assembly against the fake data source"""
+    from app.api.routes import products as products_routes
+    from app.services.render_cache import catalog_cache
+
+    fake = FakeSupabase(tables)
+    products_routes.supabase = fake
+    loop = asyncio.new_event_loop()
+
+    product = tables["products"][0]
+    variant = next(v for v in tables["product_variants"] if v["product_id"] == product["id"])
+    categories = [c for c in tables["configuration_categories"] if c["product_id"] == product["id"]]
+    selected_options = {}
+    for category in categories:
+        option = next(o for o in tables["configuration_options"] if o["category_id"] == category["id"])
+        selected_options[category["category_name"]] = option["id"]
+    accessory_ids = [a["id"] for a in tables["accessories"] if a["product_id"] == product["id"]][:2]
+
+    config = products_routes.UserConfiguration(
+        product_id=product["id"], variant_id=variant["id"], selected_options=selected_options,
+        selected_accessories=accessory_ids, configuration_name=None, notes=None,
+    )
+
+    def cold_product_details(product_id):
+        catalog_cache.clear()
+        return products_routes.get_product_details_new(product_id)
+
+    def run(coro_factory):
+        return lambda: loop.run_until_complete(coro_factory())
+
+    results = {}
+    for name, factory in (
+        ("config.calculate_price", lambda: products_routes.calculate_configuration_price(config)),
+        ("config.generate_part_code", lambda: products_routes.generate_part_code(config)),
+        ("catalog.product_details", lambda: products_routes.get_product_details_new(product["id"])),
+        ("catalog.product_details_cold", lambda: cold_product_details(product["id"])),
+    ):
+        fake.query_count = 0
+        results[name] = measure(run(factory), rounds, 50)
+        # Queries per call is the number that matters once this talks to a real database
+        results[name]["queries_per_call"] = round(fake.query_count / ((rounds * 50) + 1), 2)
+    loop.close()
+
+    # Served from the in-process configuration matrix (built during warmup)
+    selection = products_routes.SelectionState(
+        product_id=product["id"], variant_id=variant["id"], selected_options=dict(list(selected_options.items())[:2]))
+    results["config.valid_options"] = measure(lambda: products_routes.get_valid_options(selection), rounds, 50)
+    part_code = products_routes.get_valid_options(selection)["first_match"]["part_code"]
+    results["config.part_code_lookup"] = measure(lambda: products_routes.lookup_part_code(part_code), rounds, 50)
+
+    # Served from the in-process search index (built on the first query)
+    query = f"{variant['variant_name']} {product['name']} IP65"
+    results["catalog.search"] = measure(lambda: products_routes.search_products(query), rounds, 50)
+    results["catalog.search_suggest"] = measure(lambda: products_routes.suggest_products(product["name"][:4]), rounds, 50)
+
+    facet_query = products_routes.FacetQuery(filters={"ip_rating": [65], "category": [product["category_id"]]},
+                                             ranges={"wattage": {"min": 8, "max": 13}})
+    results["catalog.facets"] = measure(lambda: products_routes.query_facets(facet_query), rounds, 50)
+    return results
+
+
+def available_engines(generator) -> Dict[str, Optional[str]]:
+    """Map engine name -> None when usable, or the reason it is skipped"""
+    engines: Dict[str, Optional[str]] = {}
+
+    jars_present = all(os.path.exists(os.path.join(generator.jar_path, jar)) for jar in (
+        "flying-saucer-core-9.1.22.jar", "flying-saucer-pdf-itext5-9.1.22.jar", "itextpdf-5.5.13.1.jar"))
+    if shutil.which("java") and shutil.which("javac") and jars_present:
+        engines["flying_saucer"] = None
+    else:
+        engines["flying_saucer"] = "java/javac or Flying Saucer jars not available"
+
+    try:
+        import weasyprint  # noqa: F401
+        engines["weasyprint"] = None
+    except Exception as e:
+        engines["weasyprint"] = f"not importable: {e}"
+
+    try:
+        import pdfkit  # noqa: F401
+        engines["wkhtmltopdf"] = None if shutil.which("wkhtmltopdf") else "wkhtmltopdf binary not on PATH"
+    except Exception as e:
+        engines["wkhtmltopdf"] = f"not importable: {e}"
+
+    return engines
+
+
+def bench_engines(generator, request: Dict[str, Any], rounds: int) -> Dict[str, Any]:
+    """End-to-end render (HTML build + PDF) through every engine that is installed"""
+    results: Dict[str, Any] = {}
+    for engine, skip_reason in available_engines(generator).items():
+        name = f"render.{engine}"
+        if skip_reason:
+            results[name] = {"skipped": skip_reason}
+            continue
+
+        if engine == "flying_saucer":
+            render = lambda: generator.generate_datasheet(request)
+        elif engine == "weasyprint":
+            import weasyprint
+            render = lambda: weasyprint.HTML(string=generator._create_phos_style_html(request)).write_pdf()
+        else:
+            import pdfkit
+            render = lambda: pdfkit.from_string(generator._create_phos_style_html(request), False)
+
+        try:
+            results[name] = measure(render, rounds=max(1, rounds // 2), iterations=1)
+        except Exception as e:
+            results[name] = {"error": f"{type(e).__name__}: {e}"}
+
+    if not results["render.flying_saucer"].get("skipped"):
+        results.update(bench_stamped(generator, request, rounds))
+    return results
+
+
+def bench_stamped(generator, request: Dict[str, Any], rounds: int) -> Dict[str, Any]:
+    """Stamped render with a warm base page, plus an equivalence check against the full render"""
+    from app.services.template_stamper import TemplateStamper
+
+    stamper = TemplateStamper(generator)
+    try:
+        with quiet():
+            differences = stamper.verify(request)
+        result = measure(lambda: stamper.stamp(request), rounds, 10)
+        result["equivalent_to_full_render"] = not differences
+        if differences:
+            result["differences"] = differences[:20]
+        return {"render.stamped": result}
+    except Exception as e:
+        return {"render.stamped": {"error": f"{type(e).__name__}: {e}"}}
+
+
+def git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=BENCH_DIR)
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Return human-readable regression lines; empty when within threshold"""
+    regressions = []
+    for name, current in results["benchmarks"].items():
+        previous = baseline.get("benchmarks", {}).get(name)
+        if not previous or "median_us" not in current or "median_us" not in previous:
+            continue
+        ratio = current["median_us"] / previous["median_us"] if previous["median_us"] else 1.0
+        current["baseline_median_us"] = previous["median_us"]
+        current["ratio"] = round(ratio, 3)
+        if ratio > threshold:
+            regressions.append(f"{name}: {previous['median_us']:.1f}us -> {current['median_us']:.1f}us ({ratio:.2f}x)")
+    return regressions
+
+
+def run(args) -> Dict[str, Any]:
+    from app.services.asset_urls import asset_urls
+    from app.services.pdf_generator import DatasheetGenerator
+
+    generator = DatasheetGenerator()
+    tables = build_catalog(products_per_category=args.products_per_category)
+    asset_urls.client = FakeSupabase(tables)  # Signing stays in-process; measured runs hit the URL cache
+    first_product = tables["products"][0]["id"]
+    request_small = build_datasheet_request(tables, first_product, accessory_count=2)
+    request_large = build_datasheet_request(tables, first_product, accessory_count=60)
+
+    benchmarks: Dict[str, Any] = {}
+    benchmarks.update(bench_html(generator, request_small, request_large, args.rounds))
+    benchmarks.update(bench_variant_selection(generator, request_small, args.rounds))
+    if not args.skip_routes:
+        try:
+            benchmarks.update(bench_routes(tables, args.rounds))
+        except ImportError as e:
+            benchmarks["config.*"] = {"skipped": f"route dependencies missing: {e}"}
+    if not args.skip_engines:
+        benchmarks.update(bench_engines(generator, request_small, args.rounds))
+
+    return {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "git_commit": git_commit(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "catalog_products": len(tables["products"]),
+        "benchmarks": benchmarks,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Lylux backend hot-path microbenchmarks")
+    parser.add_argument("--rounds", type=int, default=7)
+    parser.add_argument("--products-per-category", type=int, default=4)
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--compare", metavar="BASELINE_JSON")
+    parser.add_argument("--threshold", type=float, default=1.15, help="allowed median slowdown ratio")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--skip-routes", action="store_true")
+    parser.add_argument("--skip-engines", action="store_true")
+    args = parser.parse_args(argv)
+
+    results = run(args)
+
+    regressions: List[str] = []
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.threshold)
+
+    for path in [args.output] + ([DEFAULT_BASELINE] if args.save_baseline else []):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    for name, stats in results["benchmarks"].items():
+        if "median_us" in stats:
+            print(f"{name:32s} median {stats['median_us']:>12.1f}us  min {stats['min_us']:>12.1f}us")
+        else:
+            print(f"{name:32s} {stats}")
+    print(f"Results written to {args.output}")
+
+    if regressions:
+        print("REGRESSIONS:")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
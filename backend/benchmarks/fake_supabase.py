@@ -0,0 +1,363 @@
+# backend/benchmarks/fake_supabase.py
+"""In-memory stand-in for the Supabase client used by the benchmarks and load tests.
+
+Only the query-builder calls the routes actually use are implemented
+(table/select/eq/in_/lt/gte/like/or_/order/limit/range/insert/upsert/update/delete/execute), plus
+storage.from_().create_signed_urls so asset URL signing never leaves the process. Data is a synthetic
+catalog generated deterministically from a seed so runs are comparable.
+"""
+import copy
+import random
+import re
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+from urllib.parse import quote
+
+from jose import jwt
+
+
+OPTION_CATEGORIES = [
+    # (category_name, section_name, part_code_position, labels)
+    ("Beam Angle", "OPTICS", 3, ["18° Narrow", "24° Spot", "30° Medium", "40° Wide", "60° Flood"]),
+    ("Colour Temperature", "LED", 4, ["2700K Warm White", "3000K Warm White", "3500K Neutral", "4000K Cool White"]),
+    ("IP Rating", "GENERAL", 5, ["IP20", "IP44", "IP54", "IP65"]),
+    ("CRI", "LED", 6, ["80", "90", "95"]),
+    ("Control Type", "ELECTRIC", 7, ["Non Dimmable", "Phase Dimmable", "DALI", "1-10V"]),
+    ("SDCM", "LED", 0, ["2", "3"]),
+]
+
+CATEGORY_NAMES = ["Downlight", "Track", "Wall Light", "Uplight", "Projector", "Facade Lighting"]
+
+
+class FakeResult:
+    def __init__(self, data: List[Dict[str, Any]]):
+        self.data = data
+
+
+class FakeQuery:
+    """Chainable query mirroring the subset of postgrest-py used in the routes"""
+
+    def __init__(self, db: "FakeSupabase", table: str):
+        self.db = db
+        self.table_name = table
+        self.columns: Optional[List[str]] = None
+        self.filters: List[Any] = []
+        self.order_by: List[Any] = []
+        self.limit_count: Optional[int] = None
+        self.insert_rows: Optional[List[Dict[str, Any]]] = None
+        self.on_conflict: Optional[List[str]] = None
+        self.offset = 0
+        self.update_values: Optional[Dict[str, Any]] = None
+        self.delete_rows = False
+
+    def select(self, columns: str = "*"):
+        if columns.strip() != "*":
+            self.columns = [c.strip() for c in columns.split(",")]
+        return self
+
+    def eq(self, column: str, value: Any):
+        self.filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def in_(self, column: str, values: List[Any]):
+        values = set(values)
+        self.filters.append(lambda row: row.get(column) in values)
+        return self
+
+    def lt(self, column: str, value: Any):
+        self.filters.append(lambda row: row.get(column) is not None and row.get(column) < value)
+        return self
+
+    def gte(self, column: str, value: Any):
+        self.filters.append(lambda row: row.get(column) is not None and row.get(column) >= value)
+        return self
+
+    def like(self, column: str, pattern: str):
+        regex = _like_regex(pattern)
+        self.filters.append(lambda row: row.get(column) is not None and regex.fullmatch(str(row.get(column))) is not None)
+        return self
+
+    def or_(self, expression: str):
+        # Supports the "col.eq.value,col.ilike."*text*"" forms used by the routes (no commas inside values)
+        clauses = []
+        for clause in expression.split(","):
+            column, operator, value = clause.split(".", 2)
+            if operator == "ilike":
+                value = value[1:-1].replace("\\\\", "\\") if value.startswith('"') else value
+                clauses.append((column, _like_regex(value, re.IGNORECASE)))
+            else:
+                clauses.append((column, _parse_literal(value)))
+        self.filters.append(lambda row: any(
+            (v.fullmatch(str(row.get(c) or "")) is not None) if isinstance(v, re.Pattern) else row.get(c) == v
+            for c, v in clauses))
+        return self
+
+    def order(self, column: str, desc: bool = False):
+        self.order_by.append((column, desc))
+        return self
+
+    def limit(self, count: int):
+        self.limit_count = count
+        return self
+
+    def range(self, start: int, end: int):
+        self.offset = start
+        self.limit_count = end - start + 1
+        return self
+
+    def update(self, values: Dict[str, Any]):
+        self.update_values = values
+        return self
+
+    def delete(self):
+        self.delete_rows = True
+        return self
+
+    def insert(self, data: Any):
+        self.insert_rows = data if isinstance(data, list) else [data]
+        return self
+
+    def upsert(self, data: Any, on_conflict: str = ""):
+        self.insert_rows = data if isinstance(data, list) else [data]
+        self.on_conflict = [c.strip() for c in on_conflict.split(",")] if on_conflict else ["id"]
+        return self
+
+    def execute(self) -> FakeResult:
+        self.db.query_count += 1
+        rows = self.db.tables.setdefault(self.table_name, [])
+
+        if self.insert_rows is not None:
+            inserted = []
+            for row in self.insert_rows:
+                row = dict(row)
+                existing = None
+                if self.on_conflict:
+                    key = [row.get(c) for c in self.on_conflict]
+                    existing = next((r for r in rows if [r.get(c) for c in self.on_conflict] == key), None)
+                if existing is not None:
+                    existing.update(row)
+                    inserted.append(copy.deepcopy(existing))
+                    continue
+                row.setdefault("id", self.db.next_id(self.table_name))
+                row.setdefault("created_at", datetime.now(timezone.utc).isoformat())
+                rows.append(row)
+                inserted.append(copy.deepcopy(row))
+            return FakeResult(inserted)
+
+        matched = [row for row in rows if all(f(row) for f in self.filters)]
+        if self.update_values is not None:
+            for row in matched:
+                row.update(self.update_values)
+            return FakeResult(copy.deepcopy(matched))
+        if self.delete_rows:
+            rows[:] = [row for row in rows if not all(f(row) for f in self.filters)]
+            return FakeResult(copy.deepcopy(matched))
+
+        for column, desc in reversed(self.order_by):
+            matched.sort(key=lambda row: (row.get(column) is None, row.get(column)), reverse=desc)
+        if self.limit_count is not None:
+            matched = matched[self.offset:self.offset + self.limit_count]
+
+        # Return copies, like a real network client would
+        if self.columns:
+            return FakeResult([{c: row.get(c) for c in self.columns} for row in matched])
+        return FakeResult(copy.deepcopy(matched))
+
+
+class FakeBucket:
+    def __init__(self, storage: "FakeStorage", bucket: str):
+        self.storage = storage
+        self.bucket = bucket
+
+    def create_signed_urls(self, paths: List[str], expires_in: int) -> List[Dict[str, Any]]:
+        """Same shape as storage3: a relative signedURL whose token carries the expiry"""
+        self.storage.sign_calls += 1
+        token = jwt.encode({"exp": int(time.time()) + expires_in}, "fake-storage")
+        return [{"path": path, "signedURL": f"/object/sign/{self.bucket}/{quote(path)}?token={token}", "error": None}
+                for path in paths]
+
+
+class FakeStorage:
+    def __init__(self):
+        self.sign_calls = 0
+
+    def from_(self, bucket: str) -> FakeBucket:
+        return FakeBucket(self, bucket)
+
+
+class FakeSupabase:
+    """Drop-in replacement for `app.services.supabase_client.supabase` (and `supabase_admin`)"""
+
+    def __init__(self, tables: Dict[str, List[Dict[str, Any]]]):
+        self.tables = tables
+        self.storage = FakeStorage()
+        self.query_count = 0
+        self._ids = {name: max((r.get("id", 0) for r in rows), default=0) for name, rows in tables.items()}
+
+    def next_id(self, table: str) -> int:
+        self._ids[table] = self._ids.get(table, 0) + 1
+        return self._ids[table]
+
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery(self, name)
+
+
+def _like_regex(pattern: str, flags: int = 0) -> "re.Pattern":
+    """LIKE pattern ('*' or '%' any run, '_' one char, backslash escapes) as a regex"""
+    parts, escaped = [], False
+    for char in pattern:
+        if escaped:
+            parts.append(re.escape(char))
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        elif char in "*%":
+            parts.append(".*")
+        elif char == "_":
+            parts.append(".")
+        else:
+            parts.append(re.escape(char))
+    return re.compile("".join(parts), flags | re.DOTALL)
+
+
+def _parse_literal(value: str) -> Any:
+    if value in ("true", "false"):
+        return value == "true"
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+
+def build_catalog(products_per_category: int = 4, accessories_per_product: int = 4, seed: int = 42) -> Dict[str, List[Dict[str, Any]]]:
+    """Generate a synthetic catalog shaped like the production tables"""
+    rng = random.Random(seed)
+    tables: Dict[str, List[Dict[str, Any]]] = {
+        "categories": [], "products": [], "product_variants": [],
+        "configuration_categories": [], "configuration_options": [],
+        "accessories": [], "product_features": [], "visual_assets": [],
+        "user_configurations": [], "compatibility_rules": [],
+    }
+    ids = {name: 0 for name in tables}
+
+    def add(table: str, row: Dict[str, Any]) -> Dict[str, Any]:
+        ids[table] += 1
+        row["id"] = ids[table]
+        tables[table].append(row)
+        return row
+
+    for cert in ("RoHS", "CE"):
+        add("visual_assets", {
+            "product_id": None, "is_global": True, "asset_type": "certification",
+            "asset_category": "certification", "file_name": f"{cert}.png",
+            "file_url": f"https://example.invalid/{cert}.png", "display_order": 0,
+        })
+
+    for c_index, category_name in enumerate(CATEGORY_NAMES):
+        category = add("categories", {
+            "name": category_name, "slug": category_name.lower().replace(" ", "-"),
+            "category_image_url": None, "display_order": c_index, "is_active": True,
+        })
+        for p_index in range(products_per_category):
+            code = f"LY-{category_name[:2].upper()}-{p_index:03d}"
+            product = add("products", {
+                "category_id": category["id"], "name": f"{category_name} {p_index}",
+                "base_part_code": code, "description": f"Synthetic {category_name.lower()} fixture",
+                "product_image_url": f"https://example.invalid/{code}.png",
+                "dimension_image_url": f"https://example.invalid/{code}-dim.png",
+                "d1_mm": rng.randint(40, 120), "h_mm": rng.randint(40, 120),
+                "d2_mm": rng.randint(40, 120), "cutout_mm": rng.randint(40, 120),
+                "is_active": True, "created_at": "2025-06-01T00:00:00+00:00",
+            })
+            variant_ids = []
+            for v_index, watts in enumerate((6, 9, 12, 18)):
+                output = watts * rng.randint(90, 120)
+                variant_ids.append(add("product_variants", {
+                    "product_id": product["id"], "variant_name": f"{watts}W",
+                    "part_code_suffix": f"{watts}W", "system_output": output,
+                    "system_power": watts, "efficiency": output // watts,
+                    "specifications": {}, "base_price": float(20 + watts * 3),
+                    "display_order": v_index, "is_active": True,
+                })["id"])
+            option_ids = {}
+            for o_index, (cat_name, section, position, labels) in enumerate(OPTION_CATEGORIES):
+                config_category = add("configuration_categories", {
+                    "product_id": product["id"], "section_name": section, "section_label": section.title(),
+                    "category_name": cat_name, "category_label": cat_name,
+                    "part_code_position": position, "is_required": True, "display_order": o_index,
+                })
+                for l_index, label in enumerate(labels):
+                    option_ids[(cat_name, l_index)] = add("configuration_options", {
+                        "category_id": config_category["id"], "option_value": label,
+                        "option_label": label, "part_code_suffix": label.split()[0].replace("°", ""),
+                        "price_modifier": float(l_index * 2), "is_default": l_index == 0,
+                        "display_order": l_index,
+                        "option_image_url": f"https://example.invalid/beam-{l_index}.png" if cat_name == "Beam Angle" else None,
+                    })["id"]
+            # No narrow beam on the 18W engine; IP65 only with DALI control
+            add("compatibility_rules", {
+                "product_id": product["id"], "rule_type": "excludes",
+                "if_variant_id": variant_ids[-1], "if_option_id": None,
+                "then_variant_id": None, "then_option_id": option_ids[("Beam Angle", 0)],
+            })
+            add("compatibility_rules", {
+                "product_id": product["id"], "rule_type": "requires",
+                "if_variant_id": None, "if_option_id": option_ids[("IP Rating", 3)],
+                "then_variant_id": None, "then_option_id": option_ids[("Control Type", 2)],
+            })
+            for a_index in range(accessories_per_product):
+                add("accessories", {
+                    "product_id": product["id"], "name": f"Accessory {a_index}",
+                    "part_code": f"{code}-ACC{a_index}", "description": None,
+                    "price": float(5 + a_index), "accessory_category": "General",
+                    "image_url": None, "is_active": True, "display_order": a_index,
+                })
+            add("product_features", {
+                "product_id": product["id"], "feature_type": "material", "feature_label": "Material",
+                "feature_value": "Die Cast Aluminium", "is_configurable": False, "display_order": 0,
+            })
+            add("visual_assets", {
+                "product_id": product["id"], "is_global": False, "asset_type": "image",
+                "asset_category": "product", "file_name": f"{code}.png",
+                "file_url": f"https://example.invalid/{code}.png", "display_order": 1,
+            })
+    return tables
+
+
+def build_datasheet_request(tables: Dict[str, List[Dict[str, Any]]], product_id: int, accessory_count: int = 2) -> Dict[str, Any]:
+    """Build a /generate-datasheet payload the way DetailedProductConfigurator does"""
+    product = next(p for p in tables["products"] if p["id"] == product_id)
+    variants = [v for v in tables["product_variants"] if v["product_id"] == product_id]
+    categories = [c for c in tables["configuration_categories"] if c["product_id"] == product_id]
+
+    selected_options = {}
+    for category in categories:
+        options = [o for o in tables["configuration_options"] if o["category_id"] == category["id"]]
+        default = next((o for o in options if o["is_default"]), options[0])
+        selected_options[category["category_name"]] = {
+            "option_label": default["option_label"],
+            "price_modifier": default["price_modifier"],
+            "part_code_suffix": default["part_code_suffix"],
+            "option_image_url": default.get("option_image_url") or "",
+        }
+
+    accessories = [
+        {"id": i, "name": f"Accessory {i}", "description": None,
+         "part_code": f"{product['base_part_code']}-ACC{i}", "image_url": "", "price": 5.0}
+        for i in range(accessory_count)
+    ]
+
+    return {
+        "product_name": product["name"],
+        "base_part_code": product["base_part_code"],
+        "final_part_code": f"{product['base_part_code']}-{variants[0]['part_code_suffix']}",
+        "product_features": [f for f in tables["product_features"] if f["product_id"] == product_id],
+        "variants": variants,
+        "selected_variant_id": variants[0]["id"],
+        "selected_variant_index": 0,
+        "selected_options": selected_options,
+        "accessories": accessories,
+        "visual_assets": {},
+        "product": product,
+    }
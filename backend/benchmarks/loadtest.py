@@ -0,0 +1,260 @@
+# backend/benchmarks/loadtest.py
+"""Replay DetailedProductConfigurator traffic against a running API.
+
+Each virtual user behaves like one configurator session: load the product
+details, change a handful of options (every change fires a price and a
+part-code update), pause for a think time between clicks, then sometimes
+download the datasheet and sometimes save the configuration.
+
+    python -m benchmarks.stub_server --render-delay-ms 800 &
+    python -m benchmarks.loadtest --users 50 --duration 60 --think-time 1.5
+
+Reports throughput, p50/p95/p99 latency and error rate per endpoint, and can
+write the same numbers to JSON with --output. Admission rejections (429 and
+503) are counted separately from errors. Each virtual user sends its own
+X-Forwarded-For address, so a server that trusts one proxy hop
+(stub_server --admission) rate-limits them as separate clients.
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import sys
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+
+class Recorder:
+    """Collects latency samples and failures per logical endpoint"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.rejected: Dict[str, Dict[int, int]] = defaultdict(lambda: {429: 0, 503: 0})
+        self.error_samples: Dict[str, str] = {}
+
+    async def call(self, client: httpx.AsyncClient, name: str, method: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+            failed = response.status_code >= 400
+            if response.status_code in (429, 503):
+                # Turned away by admission control, not broken
+                self.latencies[name].append(time.perf_counter() - start)
+                self.rejected[name][response.status_code] += 1
+                return None
+            if failed:
+                self.error_samples.setdefault(name, f"HTTP {response.status_code}: {response.text[:200]}")
+        except httpx.HTTPError as e:
+            response, failed = None, True
+            self.error_samples.setdefault(name, f"{type(e).__name__}: {e}")
+        self.latencies[name].append(time.perf_counter() - start)
+        if failed:
+            self.errors[name] += 1
+            return None
+        return response
+
+    def report(self, elapsed: float) -> Dict[str, Any]:
+        endpoints = {}
+        for name in sorted(self.latencies):
+            samples = sorted(self.latencies[name])
+            endpoints[name] = {
+                "requests": len(samples),
+                "errors": self.errors[name],
+                "error_rate": round(self.errors[name] / len(samples), 4),
+                "rejected_429": self.rejected[name][429],
+                "rejected_503": self.rejected[name][503],
+                "throughput_rps": round(len(samples) / elapsed, 2),
+                "p50_ms": round(percentile(samples, 50) * 1000, 2),
+                "p95_ms": round(percentile(samples, 95) * 1000, 2),
+                "p99_ms": round(percentile(samples, 99) * 1000, 2),
+                "max_ms": round(samples[-1] * 1000, 2),
+            }
+        total = sum(len(s) for s in self.latencies.values())
+        total_errors = sum(self.errors.values())
+        return {
+            "elapsed_s": round(elapsed, 2),
+            "requests": total,
+            "errors": total_errors,
+            "error_rate": round(total_errors / total, 4) if total else 0.0,
+            "rejected_429": sum(counts[429] for counts in self.rejected.values()),
+            "rejected_503": sum(counts[503] for counts in self.rejected.values()),
+            "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+            "endpoints": endpoints,
+            "error_samples": self.error_samples,
+        }
+
+
+def percentile(sorted_samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_samples:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_samples)))
+    return sorted_samples[min(rank, len(sorted_samples)) - 1]
+
+
+def datasheet_payload(details: Dict[str, Any], variant: Dict[str, Any], selected: Dict[str, Dict[str, Any]], accessories: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Same shape the configurator posts to /generate-datasheet"""
+    product = details["product"]
+    return {
+        "product_name": product["name"],
+        "base_part_code": product["base_part_code"],
+        "final_part_code": "-".join([product["base_part_code"], variant["part_code_suffix"]] +
+                                    [o["part_code_suffix"] for o in selected.values() if o.get("part_code_suffix")]),
+        "product_features": details.get("features", []),
+        "variants": details["variants"],
+        "selected_variant_id": variant["id"],
+        "selected_options": {name: {
+            "option_label": o["option_label"], "price_modifier": o["price_modifier"],
+            "part_code_suffix": o["part_code_suffix"], "option_image_url": o.get("option_image_url") or "",
+        } for name, o in selected.items()},
+        "accessories": accessories,
+        "visual_assets": {},
+        "product": product,
+    }
+
+
+async def user_session(client: httpx.AsyncClient, recorder: Recorder, product_ids: List[int], args, rng: random.Random,
+                       headers: Dict[str, str]):
+    details_response = await recorder.call(client, "product-details", "GET",
+                                           f"/api/products/product-details/{rng.choice(product_ids)}", headers=headers)
+    if details_response is None:
+        return
+    details = details_response.json()
+    if not details.get("variants"):
+        return
+
+    variant = details["variants"][0]
+    selected: Dict[str, Dict[str, Any]] = {}
+    for category in details.get("configuration_categories", []):
+        options = category.get("options") or []
+        default = next((o for o in options if o.get("is_default")), options[0] if options else None)
+        if default:
+            selected[category["category_name"]] = default
+    accessories: List[Dict[str, Any]] = []
+
+    for _ in range(rng.randint(args.min_changes, args.max_changes)):
+        await asyncio.sleep(rng.expovariate(1 / args.think_time) if args.think_time > 0 else 0)
+
+        # One click in the configurator: a variant, option or accessory change
+        choice = rng.random()
+        categories = [c for c in details.get("configuration_categories", []) if c.get("options")]
+        if choice < 0.15:
+            variant = rng.choice(details["variants"])
+        elif choice < 0.9 and categories:
+            category = rng.choice(categories)
+            selected[category["category_name"]] = rng.choice(category["options"])
+        elif details.get("accessories"):
+            accessory = rng.choice(details["accessories"])
+            if accessory in accessories:
+                accessories.remove(accessory)
+            else:
+                accessories.append(accessory)
+
+        config = {
+            "product_id": details["product"]["id"],
+            "variant_id": variant["id"],
+            "selected_options": {name: o["id"] for name, o in selected.items()},
+            "selected_accessories": [a["id"] for a in accessories],
+            "configuration_name": None,
+            "notes": None,
+        }
+        await asyncio.gather(
+            recorder.call(client, "calculate-price", "POST", "/api/products/configure/calculate-price", json=config,
+                          headers=headers),
+            recorder.call(client, "generate-part-code", "POST", "/api/products/configure/generate-part-code", json=config,
+                          headers=headers),
+        )
+
+    if rng.random() < args.datasheet_ratio:
+        await asyncio.sleep(rng.expovariate(1 / args.think_time) if args.think_time > 0 else 0)
+        await recorder.call(client, "generate-datasheet", "POST", "/api/products/generate-datasheet",
+                            json=datasheet_payload(details, variant, selected, accessories), headers=headers)
+    if rng.random() < args.save_ratio:
+        await recorder.call(client, "configure-save", "POST", "/api/products/configure/save", headers=headers, json={
+            "product_id": details["product"]["id"], "variant_id": variant["id"],
+            "selected_options": {name: o["id"] for name, o in selected.items()},
+            "selected_accessories": [a["id"] for a in accessories],
+            "configuration_name": f"{details['product']['name']} Configuration", "notes": None,
+        })
+
+
+async def virtual_user(user_index: int, client: httpx.AsyncClient, recorder: Recorder, product_ids: List[int], args, deadline: float):
+    rng = random.Random(args.seed + user_index)
+    headers = {"X-Forwarded-For": f"10.0.{user_index // 256}.{user_index % 256}"}
+    # Stagger the start so all users don't arrive in the same millisecond
+    await asyncio.sleep(args.ramp_up * user_index / max(args.users, 1))
+    while time.monotonic() < deadline:
+        await user_session(client, recorder, product_ids, args, rng, headers)
+
+
+async def discover_products(client: httpx.AsyncClient) -> List[int]:
+    categories = (await client.get("/api/products/categories")).json()
+    product_ids = []
+    for category in categories:
+        response = await client.get(f"/api/products/categories/{category['slug']}/products")
+        product_ids.extend(p["id"] for p in response.json())
+    return product_ids
+
+
+async def run(args) -> Dict[str, Any]:
+    limits = httpx.Limits(max_connections=args.users * 2, max_keepalive_connections=args.users * 2)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        product_ids = await discover_products(client)
+        if not product_ids:
+            raise SystemExit("No products found - is the API running with a populated catalog?")
+
+        recorder = Recorder()
+        start = time.monotonic()
+        deadline = start + args.duration
+        await asyncio.gather(*(virtual_user(i, client, recorder, product_ids, args, deadline) for i in range(args.users)))
+        report = recorder.report(time.monotonic() - start)
+
+    report["config"] = {k: v for k, v in vars(args).items() if k != "output"}
+    return report
+
+
+def print_report(report: Dict[str, Any]):
+    print(f"{'endpoint':22s} {'reqs':>7s} {'err%':>7s} {'429':>6s} {'503':>6s} {'rps':>8s} "
+          f"{'p50ms':>9s} {'p95ms':>9s} {'p99ms':>9s}")
+    for name, stats in report["endpoints"].items():
+        print(f"{name:22s} {stats['requests']:>7d} {stats['error_rate'] * 100:>6.2f}% {stats['rejected_429']:>6d} "
+              f"{stats['rejected_503']:>6d} {stats['throughput_rps']:>8.2f} "
+              f"{stats['p50_ms']:>9.1f} {stats['p95_ms']:>9.1f} {stats['p99_ms']:>9.1f}")
+    print(f"total {report['requests']} requests in {report['elapsed_s']}s "
+          f"({report['throughput_rps']} rps, {report['error_rate'] * 100:.2f}% errors, "
+          f"{report['rejected_429']} x 429, {report['rejected_503']} x 503)")
+    for name, sample in report["error_samples"].items():
+        print(f"  first {name} error: {sample}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Configurator traffic replay")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds")
+    parser.add_argument("--ramp-up", type=float, default=5.0, help="seconds to start all users")
+    parser.add_argument("--think-time", type=float, default=1.0, help="mean seconds between clicks")
+    parser.add_argument("--min-changes", type=int, default=3)
+    parser.add_argument("--max-changes", type=int, default=10)
+    parser.add_argument("--datasheet-ratio", type=float, default=0.3, help="share of sessions that download")
+    parser.add_argument("--save-ratio", type=float, default=0.1, help="share of sessions that save")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the report as JSON")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run(args))
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+# backend/benchmarks/stub_server.py
+"""Run the real FastAPI app against the in-memory catalog instead of Supabase.
+
+    python -m benchmarks.stub_server --port 8000
+    python -m benchmarks.stub_server --render-delay-ms 800   # no Java needed
+    python -m benchmarks.stub_server --admission             # keep rate limits and the render pool
+
+Every route module that imported `supabase` gets the fake client, and asset
+URLs are signed by its fake storage, so the request handling, validation and
+HTML building are the production code paths; only the database, storage (and
+optionally the PDF engine) are replaced.
+
+Admission control is off unless --admission is given: every load-test user
+connects from 127.0.0.1 and would share one client's rate limit. With it, one
+proxy hop is trusted, so each user's X-Forwarded-For counts as its own client.
+"""
+import argparse
+import asyncio
+import time
+from io import BytesIO
+
+import uvicorn
+
+from benchmarks.fake_supabase import FakeSupabase, build_catalog
+
+# Smallest structurally valid PDF, returned when the Java engine is simulated
+PLACEHOLDER_PDF = (
+    b"%PDF-1.4\n1 0 obj<</Type/Catalog/Pages 2 0 R>>endobj\n"
+    b"2 0 obj<</Type/Pages/Kids[3 0 R]/Count 1>>endobj\n"
+    b"3 0 obj<</Type/Page/Parent 2 0 R/MediaBox[0 0 595 842]>>endobj\n"
+    b"trailer<</Root 1 0 R>>\n%%EOF\n"
+)
+
+
+def install_fake_data_source(products_per_category: int) -> FakeSupabase:
+    from app.api.routes import auth, products
+    from app.services.asset_urls import asset_urls
+
+    fake = FakeSupabase(build_catalog(products_per_category=products_per_category))
+    for module in (auth, products):
+        module.supabase = fake
+    asset_urls.client = fake
+    return fake
+
+
+def simulate_renderer(delay_ms: int):
+    """Replace the Java render with a fixed delay, keeping the HTML build real"""
+    from app.services.pdf_generator import DatasheetGenerator
+
+    def generate_datasheet(self, product_data):
+        self._create_phos_style_html(product_data)
+        time.sleep(delay_ms / 1000)
+        return BytesIO(PLACEHOLDER_PDF)
+
+    async def open_pdf_stream(self, html_content, chunk_size=64 * 1024):
+        await asyncio.sleep(delay_ms / 1000)
+
+        async def chunks():
+            yield PLACEHOLDER_PDF
+
+        return chunks()
+
+    DatasheetGenerator.generate_datasheet = generate_datasheet
+    DatasheetGenerator.open_pdf_stream = open_pdf_stream
+
+    from app.core.config import settings
+    settings.warmup_render_check = False  # The warm-up render would still start Java
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lylux API with an in-memory data source")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--products-per-category", type=int, default=4)
+    parser.add_argument("--render-delay-ms", type=int, help="simulate the PDF engine instead of running Java")
+    parser.add_argument("--admission", action="store_true",
+                        help="keep admission control, with each X-Forwarded-For address as a client")
+    args = parser.parse_args()
+
+    from app.core.config import settings
+    settings.admission_enabled = args.admission
+    if args.admission:
+        settings.admission_trusted_proxy_hops = 1
+
+    fake = install_fake_data_source(args.products_per_category)
+    if args.render_delay_ms is not None:
+        simulate_renderer(args.render_delay_ms)
+
+    from app.main import app, warmup
+    warmup.client = fake  # /ready and the warm-up indexes use the same catalog as the routes
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
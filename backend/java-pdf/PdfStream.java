@@ -0,0 +1,86 @@
+// backend/java-pdf/PdfStream.java
+// Reads an HTML document from stdin and writes the Flying Saucer PDF to stdout.
+// Usage: java -cp <flying saucer jars>:<classes dir> PdfStream <fonts dir> [--png <width px>]
+// With --png the first A4 page is rasterized with Java2DRenderer instead (reduced
+// fidelity preview: no running header/footer, AWT fonts).
+// All logging goes to stderr so stdout carries nothing but PDF bytes.
+import org.xhtmlrenderer.pdf.ITextRenderer;
+import org.xhtmlrenderer.resource.XMLResource;
+import org.xhtmlrenderer.swing.Java2DRenderer;
+
+import javax.imageio.ImageIO;
+import java.awt.image.BufferedImage;
+import java.io.BufferedOutputStream;
+import java.io.ByteArrayInputStream;
+import java.io.ByteArrayOutputStream;
+import java.io.File;
+import java.io.InputStream;
+import java.io.OutputStream;
+
+class PdfStream {
+    private static final String[] FONT_FILES = {"YuGothR.ttc", "YuGothB.ttc", "YuGothM.ttc", "YuGothL.ttc"};
+
+    public static void main(String[] args) {
+        try {
+            String htmlContent = readAll(System.in);
+
+            if (args.length > 2 && "--png".equals(args[1])) {
+                writePreview(htmlContent, Integer.parseInt(args[2]));
+                return;
+            }
+
+            ITextRenderer renderer = new ITextRenderer();
+
+            if (args.length > 0) {
+                for (String fontFile : FONT_FILES) {
+                    File font = new File(args[0], fontFile);
+                    if (font.exists()) {
+                        try {
+                            renderer.getFontResolver().addFont(font.getAbsolutePath(), true);
+                        } catch (Exception fontError) {
+                            System.err.println("Font registration failed for " + fontFile + ": " + fontError.getMessage());
+                        }
+                    }
+                }
+            }
+
+            // Enable high quality rendering
+            renderer.getSharedContext().setPrint(true);
+            renderer.getSharedContext().setInteractive(false);
+            renderer.getSharedContext().getTextRenderer().setSmoothingThreshold(0);
+
+            renderer.setDocumentFromString(htmlContent);
+            renderer.layout();
+
+            OutputStream out = new BufferedOutputStream(System.out, 64 * 1024);
+            renderer.createPDF(out);
+            out.flush();
+        } catch (Exception e) {
+            System.err.println("PDF_ERROR: " + e.getMessage());
+            e.printStackTrace();
+            System.exit(1);
+        }
+    }
+
+    private static void writePreview(String htmlContent, int width) throws Exception {
+        System.setProperty("java.awt.headless", "true");
+        int height = Math.round(width * 297f / 210f);
+        Java2DRenderer renderer = new Java2DRenderer(
+                XMLResource.load(new ByteArrayInputStream(htmlContent.getBytes("UTF-8"))).getDocument(), width, height);
+        BufferedImage image = renderer.getImage();
+
+        OutputStream out = new BufferedOutputStream(System.out, 64 * 1024);
+        ImageIO.write(image, "png", out);
+        out.flush();
+    }
+
+    private static String readAll(InputStream in) throws Exception {
+        ByteArrayOutputStream buffer = new ByteArrayOutputStream();
+        byte[] chunk = new byte[64 * 1024];
+        int read;
+        while ((read = in.read(chunk)) != -1) {
+            buffer.write(chunk, 0, read);
+        }
+        return buffer.toString("UTF-8");
+    }
+}